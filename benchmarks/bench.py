@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import timeit
+from typing import Callable, Dict, List, NamedTuple, Tuple
+from unittest.mock import Mock
+
+from blessed.keyboard import Keystroke
+
+from harmonikey_mmmity.gamemodes import Gamemode
+from harmonikey_mmmity.statistics import FileStatistics
+from harmonikey_mmmity.telemetry import EventSink
+from harmonikey_mmmity.terminal import VirtualTerminal
+from harmonikey_mmmity.text_generator import RandomTextGenerator, \
+                                             FileTextGenerator, TextgenType
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+# Baseline results for every benchmark, time per operation
+# in units of calibration loop, so they do not depend on machine
+
+THRESHOLD = 2.0
+# Benchmark fails if it is this many times slower than baseline,
+# calibrated times of unchanged code still vary by up to 1.5 times
+
+REPEATS = 9
+# Every benchmark is repeated and the best time is taken
+
+
+class Benchmark(NamedTuple):
+    '''
+    One benchmark with its parameter, e. g. vocabulary size.
+    run(fixtures, param) prepares data and returns function
+    which does `ops` operations, its time is measured.
+    '''
+    name: str
+    param: int
+    ops: int
+    run: Callable[[str, int], Callable[[], None]]
+
+    def key(self) -> str:
+        '''
+        Returns name with parameter, e. g. add_file[1000].
+        '''
+        return f'{self.name}[{self.param}]'
+
+
+def random_word(rng: random.Random) -> str:
+    '''
+    Returns random lowercase word of 2 to 10 letters.
+    '''
+    return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+
+
+def write_vocab(fixtures: str, size: int) -> str:
+    '''
+    Writes vocabulary of size random words, one per line.
+    '''
+    path = os.path.join(fixtures, f'vocab_{size}.txt')
+    rng = random.Random(size)
+    with open(path, 'w') as vocab_file:
+        for _ in range(size):
+            vocab_file.write(random_word(rng) + '\n')
+    return path
+
+
+def write_text(fixtures: str, size: int) -> str:
+    '''
+    Writes text of about size bytes, random words in lines.
+    '''
+    path = os.path.join(fixtures, f'text_{size}.txt')
+    rng = random.Random(size)
+    written = 0
+    with open(path, 'w') as text_file:
+        while written < size:
+            line = ' '.join(random_word(rng) for _ in range(12)) + '\n'
+            text_file.write(line)
+            written += len(line)
+    return path
+
+
+def write_stats(fixtures: str, rows: int) -> str:
+    '''
+    Writes stats file with rows runs of 100 users on 50 texts.
+    '''
+    path = os.path.join(fixtures, f'stats_{rows}.csv')
+    rng = random.Random(rows)
+    with open(path, 'w') as stats_file:
+        for _ in range(rows):
+            words = rng.randint(10, 200)
+            stats_file.write(';'.join(map(str, [
+                f'user{rng.randrange(100)}',
+                f'RANDOM.assets/vocabs/vocab{rng.randrange(50)}.txt',
+                str(Gamemode.FIX_ERRORS), words, words * 5,
+                rng.randint(10, 120) * 1000000000, 0.0,
+                rng.randrange(20), 1700000000 + rng.randrange(10 ** 7),
+            ])) + '\n')
+    return path
+
+
+def bench_next_word(fixtures: str, vocab_size: int) -> Callable[[], None]:
+    generator = RandomTextGenerator(write_vocab(fixtures, vocab_size), 4)
+
+    def run():
+        for _ in range(10000):
+            generator.next_word()
+    return run
+
+
+def bench_file_startup(fixtures: str, size: int) -> Callable[[], None]:
+    path = write_text(fixtures, size)
+
+    def run():
+        FileTextGenerator(path)
+    return run
+
+
+def bench_add_file(fixtures: str, rows: int) -> Callable[[], None]:
+    path = write_stats(fixtures, rows)
+
+    def run():
+        FileStatistics().add_file(path)
+    return run
+
+
+def bench_user_best_stats(fixtures: str, rows: int) -> Callable[[], None]:
+    stats = FileStatistics()
+    stats.add_file(write_stats(fixtures, rows))
+
+    def run():
+        for user in stats.by_user.keys():
+            stats.user_best_stats(user)
+    return run
+
+
+def bench_render(fixtures: str, width: int) -> Callable[[], None]:
+    from harmonikey_mmmity.state import Training
+    program = Mock()
+    program.term = VirtualTerminal(width, 40)
+    # Output is interpreted by virtual screen, like real terminal would
+    program.event_sink = EventSink()
+    # Mock sink would record every event and slow benchmark down
+    training = Training(program, Gamemode.FIX_ERRORS,
+                        write_text(fixtures, 100000), 'user',
+                        TextgenType.FILE, 0.0)
+
+    def run():
+        for _ in range(100):
+            overseer = training.text_overseer
+            word = overseer.separator + overseer.current_word
+            training.handle_keys([Keystroke(char) for char in word])
+            training.visualize()
+            # One full redraw per typed word
+    return run
+
+
+BENCHMARKS: List[Benchmark] = \
+    [Benchmark('random_next_word', size, 10000, bench_next_word)
+     for size in (1000, 10000, 100000)] + \
+    [Benchmark('file_startup', size, 1, bench_file_startup)
+     for size in (10000, 100000, 1000000)] + \
+    [Benchmark('add_file', rows, 1, bench_add_file)
+     for rows in (1000, 10000, 100000)] + \
+    [Benchmark('user_best_stats', rows, 100, bench_user_best_stats)
+     for rows in (1000, 10000, 100000)] + \
+    [Benchmark('training_render', width, 100, bench_render)
+     for width in (80, 200, 400)]
+
+
+def calibration_loop():
+    '''
+    Fixed pure-Python workload with dicts, strings and lists,
+    like code of benchmarks. Times are divided by its time,
+    so baseline from one machine or load fits another.
+    '''
+    counts = dict()
+    words = []
+    for index in range(2000):
+        word = str(index * 7919 % 1000)
+        counts[word] = counts.get(word, 0) + 1
+        words.append(word.upper())
+    ' '.join(words).split()
+
+
+def measure(benchmark: Benchmark, fixtures: str,
+            calibration: Tuple[timeit.Timer, int],
+            repeats: int = REPEATS) -> Tuple[float, float]:
+    '''
+    Returns best time in seconds per operation and the same
+    time in units of calibration loop.
+    Every sample calls run() as many times as needed to take
+    at least 0.2 seconds (timeit autorange), so fast benchmarks
+    are not dominated by timer resolution and noise.
+    Calibration loop is timed between samples, so both best
+    times are taken under the same load of machine.
+    '''
+    timer = timeit.Timer(benchmark.run(fixtures, benchmark.param))
+    number, _ = timer.autorange()
+    calibration_timer, calibration_number = calibration
+    best = float('inf')
+    best_calibration = float('inf')
+    for _ in range(repeats):
+        best = min(best, timer.timeit(number) / number)
+        best_calibration = min(
+            best_calibration,
+            calibration_timer.timeit(calibration_number) / calibration_number
+        )
+    seconds = best / benchmark.ops
+    return seconds, seconds / best_calibration
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float],
+            threshold: float) -> List[str]:
+    '''
+    Returns keys of benchmarks which are more than
+    threshold times slower than baseline, both in calibration units.
+    Benchmarks without baseline are not compared.
+    '''
+    return [key for key, units in results.items()
+            if key in baseline and units > baseline[key] * threshold]
+
+
+def main(argv: List[str] = None) -> int:
+    '''
+    Runs benchmarks and compares them with baseline.
+    Returns 1 if any of them regressed.
+    '''
+    parser = argparse.ArgumentParser(
+        description='Run harmonikey benchmarks and compare with baseline.'
+    )
+    parser.add_argument('-k', '--filter', default='',
+                        help='run only benchmarks containing this string')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='allowed slowdown relative to baseline')
+    parser.add_argument('--repeats', type=int, default=REPEATS,
+                        help='number of repeats of every benchmark')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='path of baseline json')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='save results as new baseline')
+    args = parser.parse_args(argv)
+
+    baseline = dict()
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = dict()
+    calibration_timer = timeit.Timer(calibration_loop)
+    calibration = (calibration_timer,
+                   max(1, calibration_timer.autorange()[0] // 4))
+    # About 0.05 seconds, it is timed after every sample
+    fixtures = tempfile.mkdtemp(prefix='harmonikey_bench')
+    try:
+        for benchmark in BENCHMARKS:
+            key = benchmark.key()
+            if args.filter not in key:
+                continue
+            seconds, results[key] = measure(benchmark, fixtures,
+                                            calibration, args.repeats)
+            line = f'{key:<32} {seconds * 1e6:>12.3f} us/op'
+            if key in baseline:
+                line += f'  x{results[key] / baseline[key]:.2f} of baseline'
+            print(line)
+    finally:
+        shutil.rmtree(fixtures)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=4, sort_keys=True)
+        return 0
+
+    regressed = compare(results, baseline, args.threshold)
+    for key in regressed:
+        print(f'Regression: {key} is more than {args.threshold} times '
+              'slower than baseline', file=sys.stderr)
+    return 1 if len(regressed) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import argparse
+import csv
+import glob
+import heapq
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple, Iterable
+
+from harmonikey_mmmity.statistics import FileStatistics
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    '''
+    Returns nearest-rank percentile of already sorted values.
+    Returns 0.0 if there are no values.
+    '''
+    if len(sorted_values) == 0:
+        return 0.0
+    rank = int(percent / 100.0 * len(sorted_values) + 0.5)
+    rank = min(max(rank, 1), len(sorted_values))
+    return sorted_values[rank - 1]
+
+
+class Aggregate:
+    '''
+    Partial aggregate of one or several stats files.
+    Is computed for every file separately and then merged, so
+    files can be processed in parallel.
+    Contains:
+        best - best entry by wpm for every (user, text_tag)
+        counts - number of runs for every (user, text_tag)
+        wpms - sorted wpm of all runs for every text_tag
+        files - number of successfully loaded files
+        errors - list of (filename, message) for files that failed
+    '''
+    def __init__(self):
+        '''
+        Initializes all containers with empty ones.
+        '''
+        self.best: Dict[Tuple[str, str], FileStatistics.Entry] = dict()
+        self.counts: Dict[Tuple[str, str], int] = dict()
+        self.wpms: Dict[str, List[float]] = dict()
+        self.files: int = 0
+        self.errors: List[Tuple[str, str]] = []
+
+    @classmethod
+    def from_file(cls, filename: str):
+        '''
+        Loads filename with FileStatistics.add_file
+        and returns its partial aggregate.
+        Malformed or missing files are recorded in errors
+        instead of raising, so one bad file does not stop the run.
+        '''
+        aggregate = cls()
+        fs = FileStatistics()
+        try:
+            fs.add_file(filename)
+            for text_tag, runs in fs.by_text_tag.items():
+                aggregate.wpms[text_tag] = sorted(entry.wpm for entry in runs)
+        except (OSError, UnicodeDecodeError) as error:
+            aggregate.errors.append((filename, str(error)))
+            return aggregate
+        except TypeError:
+            aggregate.errors.append((filename, 'Wrong file format'))
+            return aggregate
+
+        for user in fs.by_user.keys():
+            for text_tag, entry in fs.user_best_stats(user).items():
+                aggregate.best[(user, text_tag)] = entry
+        for entry in fs.entries:
+            key = (entry.user, entry.text_tag)
+            aggregate.counts[key] = aggregate.counts.get(key, 0) + 1
+        aggregate.files = 1
+        return aggregate
+
+    def merge(self, other) -> None:
+        '''
+        Merges other partial aggregate into self.
+        '''
+        for key, entry in other.best.items():
+            if key not in self.best.keys() or \
+               entry.wpm > self.best[key].wpm:
+                self.best[key] = entry
+
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+
+        for text_tag, wpms in other.wpms.items():
+            if text_tag not in self.wpms.keys():
+                self.wpms[text_tag] = wpms
+            else:
+                self.wpms[text_tag] = list(heapq.merge(self.wpms[text_tag],
+                                                       wpms))
+            # Both lists are sorted, so merging keeps them sorted
+
+        self.files += other.files
+        self.errors += other.errors
+
+    def leaderboard(self, text_tag: str) -> List[FileStatistics.Entry]:
+        '''
+        Returns best entries of every user on text_tag
+        sorted by decreasing wpm.
+        '''
+        entries = [entry for (_, tag), entry in self.best.items()
+                   if tag == text_tag]
+        entries.sort(key=lambda entry: -entry.wpm)
+        return entries
+
+
+def find_files(patterns: Iterable[str]) -> List[str]:
+    '''
+    Expands directories and glob patterns into sorted list of files.
+    Directories are searched recursively for *.csv files.
+    '''
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '**', '*.csv')
+        for filename in glob.glob(pattern, recursive=True):
+            if os.path.isfile(filename):
+                files.add(filename)
+    return sorted(files)
+
+
+def aggregate_files(files: List[str], jobs: int = 0) -> Aggregate:
+    '''
+    Loads all files with a process pool and merges partial aggregates.
+    If jobs is 1, everything is loaded in current process.
+    If jobs is 0, number of workers is chosen by ProcessPoolExecutor.
+    '''
+    result = Aggregate()
+    if jobs == 1 or len(files) <= 1:
+        for filename in files:
+            result.merge(Aggregate.from_file(filename))
+        return result
+
+    with ProcessPoolExecutor(max_workers=jobs or None) as executor:
+        for partial in executor.map(Aggregate.from_file, files):
+            result.merge(partial)
+    return result
+
+
+def print_leaderboards(aggregate: Aggregate, top: int, out) -> None:
+    '''
+    Prints leaderboard of best users for every text_tag
+    together with wpm percentiles.
+    '''
+    for text_tag in sorted(aggregate.wpms.keys()):
+        wpms = aggregate.wpms[text_tag]
+        print(f'{text_tag}: {len(wpms)} runs, '
+              f'p50 {percentile(wpms, 50):.2f} wpm, '
+              f'p90 {percentile(wpms, 90):.2f} wpm, '
+              f'p99 {percentile(wpms, 99):.2f} wpm', file=out)
+        for place, entry in enumerate(aggregate.leaderboard(text_tag)[:top]):
+            runs = aggregate.counts[(entry.user, entry.text_tag)]
+            print(f'{place + 1:>4}. {entry.user}: '
+                  f'{entry.wpm:.2f} wpm, '
+                  f'{entry.error_count} errors, {runs} runs', file=out)
+        print(file=out)
+
+
+def write_csv(aggregate: Aggregate, out) -> None:
+    '''
+    Writes best entry of every user on every text_tag as csv.
+    Delimiter is ';', same as in stats files.
+    '''
+    writer = csv.writer(out, delimiter=';', lineterminator='\n')
+    writer.writerow(['user', 'text_tag', 'runs', 'best_wpm', 'best_time',
+                     'best_errors', 'text_p50_wpm', 'text_p90_wpm'])
+    for (user, text_tag), entry in sorted(aggregate.best.items()):
+        wpms = aggregate.wpms[text_tag]
+        writer.writerow([
+            user,
+            text_tag,
+            aggregate.counts[(user, text_tag)],
+            format(entry.wpm, '.2f'),
+            entry.time,
+            entry.error_count,
+            format(percentile(wpms, 50), '.2f'),
+            format(percentile(wpms, 90), '.2f'),
+        ])
+
+
+def main(argv: List[str] = None) -> int:
+    '''
+    Command-line entry point for aggregating many stats files.
+    '''
+    parser = argparse.ArgumentParser(
+        description='Aggregate harmonikey stats files '
+                    'into leaderboards or csv.'
+    )
+    parser.add_argument('paths', nargs='+',
+                        help='stats files, directories or glob patterns')
+    parser.add_argument('--csv', action='store_true',
+                        help='print csv instead of leaderboards')
+    parser.add_argument('--top', type=int, default=10,
+                        help='number of users in every leaderboard')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='number of worker processes (0 for automatic)')
+    args = parser.parse_args(argv)
+
+    files = find_files(args.paths)
+    if len(files) == 0:
+        print('No stats files found', file=sys.stderr)
+        return 1
+
+    aggregate = aggregate_files(files, args.jobs)
+    for filename, message in aggregate.errors:
+        print(f'Skipped {filename}: {message}', file=sys.stderr)
+
+    if args.csv:
+        write_csv(aggregate, sys.stdout)
+    else:
+        print_leaderboards(aggregate, args.top, sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
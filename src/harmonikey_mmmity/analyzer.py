@@ -0,0 +1,351 @@
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Tuple
+
+from harmonikey_mmmity.library import Library
+from harmonikey_mmmity.storage import load_json, save_json
+
+
+class TextProfile(NamedTuple):
+    '''
+    Typing-related features of one text or vocabulary file.
+    char_frequencies are shares of non-whitespace characters,
+    bigram_counts count pairs of adjacent characters inside words
+    (lowercase), punctuation_density is share of punctuation
+    and symbols among non-whitespace characters.
+    size and mtime are of analyzed version of file.
+    '''
+    path: str
+    size: int
+    mtime: int
+    word_count: int
+    avg_word_length: float
+    punctuation_density: float
+    char_frequencies: Dict[str, float]
+    bigram_counts: Dict[str, int]
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        '''
+        Restores profile saved with _asdict().
+        Raises KeyError, TypeError or ValueError if data is malformed.
+        '''
+        if not isinstance(data['path'], str) or \
+           not isinstance(data['char_frequencies'], dict) or \
+           not isinstance(data['bigram_counts'], dict):
+            raise TypeError('Malformed profile')
+        return cls(
+            path=data['path'],
+            size=int(data['size']),
+            mtime=int(data['mtime']),
+            word_count=int(data['word_count']),
+            avg_word_length=float(data['avg_word_length']),
+            punctuation_density=float(data['punctuation_density']),
+            char_frequencies={str(char): float(share) for char, share
+                              in data['char_frequencies'].items()},
+            bigram_counts={str(bigram): int(count) for bigram, count
+                           in data['bigram_counts'].items()},
+        )
+
+
+def profile_file(full_path: str, path: str, size: int,
+                 mtime: int) -> TextProfile:
+    '''
+    Reads file at full_path line by line and returns its TextProfile.
+    Is run in worker processes, so it is a module-level function.
+    Returns None if file can not be read.
+    '''
+    word_count = 0
+    letter_count = 0
+    punctuation_count = 0
+    char_counts: Dict[str, int] = dict()
+    bigram_counts: Dict[str, int] = dict()
+    try:
+        with open(full_path, 'r', errors='replace') as text_file:
+            for line in text_file:
+                for word in line.split():
+                    word_count += 1
+                    letter_count += len(word)
+                    for char in word:
+                        char_counts[char] = char_counts.get(char, 0) + 1
+                    lower = word.lower()
+                    for index in range(len(lower) - 1):
+                        bigram = lower[index:index + 2]
+                        bigram_counts[bigram] = \
+                            bigram_counts.get(bigram, 0) + 1
+    except OSError:
+        return None
+
+    for char, count in char_counts.items():
+        if unicodedata.category(char)[0] in 'PS':
+            punctuation_count += count
+    # Punctuation and symbols (e. g. +, $) need Shift or reaching keys
+
+    return TextProfile(
+        path=path,
+        size=size,
+        mtime=mtime,
+        word_count=word_count,
+        avg_word_length=letter_count / word_count if word_count > 0 else 0.0,
+        punctuation_density=punctuation_count / letter_count
+        if letter_count > 0 else 0.0,
+        char_frequencies={char: round(count / letter_count, 6)
+                          for char, count in char_counts.items()},
+        bigram_counts=bigram_counts,
+    )
+
+
+class TextAnalyzer:
+    '''
+    Index of TextProfiles of texts and vocabularies in Library,
+    cached in INDEX file. Like library manifest, only files whose
+    size or mtime has changed are analyzed again, and they are
+    analyzed in parallel by pool of processes.
+    Bigram rarity of file is mean surprisal of its bigrams against
+    bigrams of all indexed files, from 0 (only common ones) to 1.
+    Speed factor of file says how much more typing effort one word
+    of it takes than an average word of indexed files,
+    normalized wpm is wpm multiplied by it, so results
+    on hard and easy texts can be compared.
+    Every method can be called from any thread: files are analyzed
+    without holding locks, they are only taken to load index once
+    and to swap in new dicts, which are never changed in place,
+    so readers are not blocked by refresh().
+    '''
+    DIRECTORIES = ['assets/texts', 'assets/vocabs']
+    INDEX = 'assets/.analysis.json'
+
+    POOL_MIN_FILES = 2
+    # Fewer changed files are analyzed in this process,
+    # starting pool would take longer
+
+    PUNCTUATION_WEIGHT = 2.0
+    RARITY_WEIGHT = 0.5
+    # How much harder character becomes with punctuation
+    # density and bigram rarity of its text
+
+    def __init__(self, root: str = '.', max_workers: int = None):
+        '''
+        Initializes empty analyzer, index is loaded on first use.
+        root is directory in which assets are located,
+        max_workers limits pool (number of CPUs by default).
+        '''
+        self.root: str = root
+        self.max_workers: int = max_workers
+        self.profiles: Dict[str, TextProfile] = dict()
+        self.__rarities: Dict[str, float] = dict()
+        self.__factors: Dict[str, float] = dict()
+        # Derived from all profiles at once, are replaced together
+        self.__lock = threading.Lock()
+        self.__load_lock = threading.Lock()
+        # Guard replacing of dicts and loading of index, which is
+        # small, so no one waits for long
+        self.__loaded: bool = False
+
+    def __index_path(self) -> str:
+        return os.path.join(self.root, self.INDEX)
+
+    def __load(self):
+        '''
+        Loads profiles from index file once, ignores malformed ones.
+        '''
+        with self.__load_lock:
+            if self.__loaded:
+                return
+            self.__loaded = True
+            index = load_json(self.__index_path(), dict())
+            if not isinstance(index, dict):
+                return
+            profiles = dict()
+            for path, fields in index.items():
+                try:
+                    profiles[path] = TextProfile.from_dict(fields)
+                except (KeyError, TypeError, ValueError):
+                    continue
+            self.__update(profiles)
+
+    def __update(self, profiles: Dict[str, TextProfile]):
+        '''
+        Replaces profiles and recomputes rarities and speed factors,
+        which depend on all files. New dicts are built first,
+        then swapped in under lock.
+        '''
+        reference: Dict[str, int] = dict()
+        for profile in profiles.values():
+            for bigram, count in profile.bigram_counts.items():
+                reference[bigram] = reference.get(bigram, 0) + count
+        total = sum(reference.values())
+        scale = math.log2(len(reference)) if len(reference) > 1 else 0.0
+
+        rarities = dict()
+        for path, profile in profiles.items():
+            count_sum = sum(profile.bigram_counts.values())
+            if count_sum == 0 or scale == 0.0:
+                rarities[path] = 0.0
+                continue
+            surprisal = 0.0
+            for bigram, count in profile.bigram_counts.items():
+                surprisal -= count * math.log2(reference[bigram] / total)
+            rarities[path] = min(1.0, surprisal / count_sum / scale)
+
+        costs = {path: self.__word_cost(profile, rarities[path])
+                 for path, profile in profiles.items()
+                 if profile.word_count > 0}
+        mean_cost = sum(costs.values()) / len(costs) if len(costs) > 0 \
+            else 0.0
+        factors = {path: cost / mean_cost for path, cost in costs.items()}
+
+        with self.__lock:
+            self.profiles = profiles
+            self.__rarities = rarities
+            self.__factors = factors
+
+    def __word_cost(self, profile: TextProfile, rarity: float) -> float:
+        '''
+        Returns relative effort of typing one word with separator.
+        '''
+        char_cost = 1.0 + self.PUNCTUATION_WEIGHT * \
+            profile.punctuation_density + self.RARITY_WEIGHT * rarity
+        return (profile.avg_word_length + 1.0) * char_cost
+
+    def __analyze(self, files: List[Tuple[str, str, int, int]]) \
+            -> List[TextProfile]:
+        '''
+        Returns profiles of files given as (full_path, path, size, mtime),
+        None for unreadable ones. Uses pool of processes
+        if there are enough files, falls back to this process
+        if pool can not be started.
+        '''
+        if len(files) >= self.POOL_MIN_FILES:
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                ) as pool:
+                    return list(pool.map(profile_file, *zip(*files)))
+            except (OSError, NotImplementedError, BrokenProcessPool):
+                pass
+            # Spawn is used because program has threads,
+            # fork of threaded process may deadlock
+        return [profile_file(*file) for file in files]
+
+    def refresh(self, library: Library) -> int:
+        '''
+        Analyzes new and changed texts and vocabularies of refreshed
+        library, forgets deleted ones and saves index if anything changed.
+        Returns number of analyzed files.
+        '''
+        self.__load()
+        old_profiles = self.profiles
+        # Snapshot, dict is replaced but never changed in place
+        profiles = dict()
+        changed_files = []
+        for path, item in library.items.items():
+            if library.directory_of(path) not in self.DIRECTORIES:
+                continue
+            profile = old_profiles.get(path)
+            if profile is not None and profile.size == item.size and \
+               profile.mtime == item.mtime:
+                profiles[path] = profile
+                continue
+            changed_files.append((os.path.join(library.root, path), path,
+                                  item.size, item.mtime))
+
+        analyzed = 0
+        for profile in self.__analyze(changed_files):
+            if profile is not None:
+                profiles[profile.path] = profile
+                analyzed += 1
+        # Readers are not blocked while files are analyzed
+
+        if analyzed == 0 and profiles.keys() == old_profiles.keys():
+            return 0
+        self.__update(profiles)
+        self.save()
+        return analyzed
+
+    def save(self):
+        '''
+        Saves index. Does nothing if assets directory does not exist,
+        index is only a cache.
+        '''
+        index = {path: profile._asdict()
+                 for path, profile in self.profiles.items()}
+        try:
+            save_json(self.__index_path(), index)
+        except OSError:
+            pass
+
+    def get(self, path: str) -> TextProfile:
+        '''
+        Returns profile by path like assets/texts/text.txt, or None.
+        '''
+        self.__load()
+        return self.profiles.get(os.path.normpath(path))
+
+    def bigram_rarity(self, path: str) -> float:
+        '''
+        Returns bigram rarity of file, 0.0 if it is not indexed.
+        '''
+        self.__load()
+        return self.__rarities.get(os.path.normpath(path), 0.0)
+
+    def speed_factor(self, path: str) -> float:
+        '''
+        Returns how many times harder a word of file is to type
+        than average word, 1.0 if file is not indexed.
+        '''
+        self.__load()
+        return self.__factors.get(os.path.normpath(path), 1.0)
+
+    def normalize_wpm(self, wpm: float, path: str) -> float:
+        '''
+        Returns wpm on file converted to wpm on average text.
+        '''
+        return wpm * self.speed_factor(path)
+
+
+def main(argv: List[str] = None) -> int:
+    '''
+    Command-line entry point: analyzes assets and prints
+    profiles, hardest files first.
+    '''
+    parser = argparse.ArgumentParser(
+        description='Analyze difficulty of harmonikey texts and vocabularies.'
+    )
+    parser.add_argument('--root', default='.',
+                        help='directory in which assets are located')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes')
+    args = parser.parse_args(argv)
+
+    library = Library(args.root)
+    library.refresh()
+    analyzer = TextAnalyzer(args.root, args.workers)
+    analyzed = analyzer.refresh(library)
+    print(f'Analyzed {analyzed} files', file=sys.stderr)
+
+    paths = sorted(analyzer.profiles.keys(),
+                   key=lambda path: -analyzer.speed_factor(path))
+    for path in paths:
+        profile = analyzer.profiles[path]
+        top_chars = sorted(profile.char_frequencies.items(),
+                           key=lambda pair: -pair[1])[:5]
+        print(f'{path}: x{format(analyzer.speed_factor(path), '.2f')} wpm, '
+              f'{profile.word_count} words, '
+              f'avg length {format(profile.avg_word_length, '.2f')}, '
+              f'punctuation {format(profile.punctuation_density, '.3f')}, '
+              f'bigram rarity {format(analyzer.bigram_rarity(path), '.3f')}, '
+              f'top chars {''.join(char for char, _ in top_chars)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+from typing import NamedTuple, Dict
+
+from harmonikey_mmmity.storage import load_json, save_json
+
+
+class Checkpoint(NamedTuple):
+    '''
+    Saved progress of unfinished training on text file.
+    word_index is index of the next word to type in the whole text,
+    offset is byte offset of this word in file.
+    Other fields are partial statistics, elapsed is in nanoseconds.
+    '''
+    user: str
+    text_tag: str
+    word_index: int
+    offset: int
+    word_count: int
+    character_count: int
+    error_count: int
+    elapsed: int
+
+
+class CheckpointStore:
+    '''
+    Small local store of checkpoints in json file,
+    at most one checkpoint for every (user, text_tag).
+    '''
+    PATH = 'stats/checkpoints.json'
+
+    def __init__(self, path: str = PATH):
+        '''
+        Loads all checkpoints from path.
+        '''
+        self.path: str = path
+        self.checkpoints: Dict[str, Checkpoint] = dict()
+        data = load_json(self.path, dict())
+        if isinstance(data, dict):
+            for key, fields in data.items():
+                try:
+                    self.checkpoints[key] = Checkpoint(**fields)
+                except TypeError:
+                    continue
+
+    @staticmethod
+    def __key(user: str, text_tag: str) -> str:
+        return user + ';' + text_tag
+
+    def get(self, user: str, text_tag: str) -> Checkpoint:
+        '''
+        Returns checkpoint for user on text_tag, or None.
+        '''
+        return self.checkpoints.get(self.__key(user, text_tag))
+
+    def put(self, checkpoint: Checkpoint) -> None:
+        '''
+        Saves checkpoint, replacing previous one for same user and text.
+        '''
+        key = self.__key(checkpoint.user, checkpoint.text_tag)
+        self.checkpoints[key] = checkpoint
+        self.__save()
+
+    def remove(self, user: str, text_tag: str) -> None:
+        '''
+        Removes checkpoint for user on text_tag if there is one.
+        '''
+        if self.checkpoints.pop(self.__key(user, text_tag), None) is not None:
+            self.__save()
+
+    def __save(self):
+        save_json(self.path, {key: checkpoint._asdict() for key, checkpoint
+                              in self.checkpoints.items()})
@@ -9,3 +9,24 @@ class WrongCharacter(Exception):
     Is thrown by TextOverseer when wrong character is provided
     if gamemode is DIE_ERRORS
     '''
+
+
+class EmptyVocabulary(Exception):
+    '''
+    Is thrown by RandomTextGenerator when vocabulary
+    or its filtered part has no words.
+    '''
+
+
+class TextSourceError(Exception):
+    '''
+    Is thrown by TextSourceRegistry when text source is unknown
+    or its plugin can not be loaded.
+    '''
+
+
+class RaceError(Exception):
+    '''
+    Is thrown by RaceClient when race server can not be reached
+    or closes connection before race.
+    '''
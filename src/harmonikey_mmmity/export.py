@@ -0,0 +1,330 @@
+import argparse
+import json
+import os
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple
+
+from harmonikey_mmmity.statistics import FileStatistics, Statistics
+from harmonikey_mmmity.aggregate import find_files
+
+
+MAGIC = b'HKCOLS01'
+# First bytes of every exported file, includes format version
+
+CHUNK_MAGIC = b'CHNK'
+END_MAGIC = b'END\0'
+
+
+class Column(NamedTuple):
+    '''
+    One column of exported file.
+    typecode is array module typecode of stored values,
+    type is its name in file header for readers in other languages.
+    If dictionary is True, column stores indices in column's dictionary
+    instead of strings.
+    '''
+    name: str
+    typecode: str
+    type: str
+    dictionary: bool = False
+
+
+COLUMNS = [
+    Column('user', 'I', 'uint32', True),
+    Column('text_tag', 'I', 'uint32', True),
+    Column('mode', 'I', 'uint32', True),
+    Column('word_count', 'I', 'uint32'),
+    Column('character_count', 'I', 'uint32'),
+    Column('time', 'q', 'int64'),
+    Column('timeout', 'd', 'float64'),
+    Column('error_count', 'I', 'uint32'),
+    Column('wpm', 'd', 'float64'),
+    Column('cpm', 'd', 'float64'),
+    Column('accuracy', 'd', 'float64'),
+    Column('timestamp', 'q', 'int64'),
+]
+
+
+def _to_little_endian(values: array) -> bytes:
+    '''
+    Returns raw bytes of values in little-endian byte order.
+    '''
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    '''
+    Returns array from raw little-endian bytes.
+    '''
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+class ColumnarWriter:
+    '''
+    Streams FileStatistics entries into dependency-free columnar file.
+    File layout (all integers little-endian):
+        MAGIC, uint32 header length, json header with column schema
+        chunks: CHUNK_MAGIC, uint32 number of rows,
+            for every dictionary column: uint32 number of new strings,
+                every string as uint32 length and utf-8 bytes,
+            for every column: raw values of all rows
+        END_MAGIC, uint64 total number of rows
+    Dictionaries are shared by all chunks, every chunk only contains
+    strings which were not seen before, so values of dictionary column
+    are indices in concatenation of all its deltas.
+    At most chunk_size rows are kept in memory.
+    '''
+    CHUNK_SIZE = 65536
+
+    def __init__(self, out: BinaryIO, chunk_size: int = CHUNK_SIZE):
+        '''
+        Writes file header to out.
+        '''
+        self.out: BinaryIO = out
+        self.chunk_size: int = chunk_size
+        self.rows: int = 0
+        self.__chunk_rows: int = 0
+        self.__values: Dict[str, array] = dict()
+        self.__indices: Dict[str, Dict[str, int]] = dict()
+        # Index of every string already in dictionary of column
+        self.__new_strings: Dict[str, List[str]] = dict()
+        # Strings added to dictionaries since last chunk
+        for column in COLUMNS:
+            self.__values[column.name] = array(column.typecode)
+            if column.dictionary:
+                self.__indices[column.name] = dict()
+                self.__new_strings[column.name] = []
+
+        header = json.dumps({
+            'columns': [{'name': column.name,
+                         'type': column.type,
+                         'dictionary': column.dictionary}
+                        for column in COLUMNS],
+        }).encode()
+        self.out.write(MAGIC)
+        self.out.write(struct.pack('<I', len(header)))
+        self.out.write(header)
+
+    def __encode(self, name: str, value: str) -> int:
+        '''
+        Returns index of value in dictionary of column name,
+        adds value to dictionary if it is new.
+        '''
+        indices = self.__indices[name]
+        index = indices.get(value)
+        if index is None:
+            index = len(indices)
+            indices[value] = index
+            self.__new_strings[name].append(value)
+        return index
+
+    def write(self, entry: FileStatistics.Entry):
+        '''
+        Adds entry, writes chunk if it is full.
+        '''
+        for column in COLUMNS:
+            value = getattr(entry, column.name)
+            if column.dictionary:
+                value = self.__encode(column.name, value)
+            self.__values[column.name].append(value)
+        self.__chunk_rows += 1
+        if self.__chunk_rows == self.chunk_size:
+            self.flush()
+
+    def write_all(self, entries: Iterable[FileStatistics.Entry]):
+        '''
+        Adds all entries.
+        '''
+        for entry in entries:
+            self.write(entry)
+
+    def flush(self):
+        '''
+        Writes all buffered rows as one chunk.
+        '''
+        if self.__chunk_rows == 0:
+            return
+        self.out.write(CHUNK_MAGIC)
+        self.out.write(struct.pack('<I', self.__chunk_rows))
+        for column in COLUMNS:
+            if not column.dictionary:
+                continue
+            new_strings = self.__new_strings[column.name]
+            self.out.write(struct.pack('<I', len(new_strings)))
+            for string in new_strings:
+                encoded = string.encode()
+                self.out.write(struct.pack('<I', len(encoded)))
+                self.out.write(encoded)
+            new_strings.clear()
+
+        for column in COLUMNS:
+            values = self.__values[column.name]
+            self.out.write(_to_little_endian(values))
+            self.__values[column.name] = array(column.typecode)
+
+        self.rows += self.__chunk_rows
+        self.__chunk_rows = 0
+
+    def close(self):
+        '''
+        Writes last chunk and end of file. Does not close out.
+        '''
+        self.flush()
+        self.out.write(END_MAGIC)
+        self.out.write(struct.pack('<Q', self.rows))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+
+class ColumnarReader:
+    '''
+    Reads files written by ColumnarWriter chunk by chunk.
+    Dictionaries are filled while reading, so after a chunk
+    is read, all its indices can be decoded with dictionaries.
+    Raises ValueError if file is malformed.
+    '''
+    def __init__(self, in_file: BinaryIO):
+        '''
+        Reads file header.
+        '''
+        self.in_file: BinaryIO = in_file
+        if self.__read(len(MAGIC)) != MAGIC:
+            raise ValueError('Not a harmonikey columnar file')
+        header_length, = struct.unpack('<I', self.__read(4))
+        header = json.loads(self.__read(header_length))
+        names = [column['name'] for column in header['columns']]
+        if names != [column.name for column in COLUMNS]:
+            raise ValueError('Unknown columns')
+        self.dictionaries: Dict[str, List[str]] = {
+            column.name: [] for column in COLUMNS if column.dictionary
+        }
+        self.rows: int = 0
+
+    def __read(self, size: int) -> bytes:
+        data = self.in_file.read(size)
+        if len(data) != size:
+            raise ValueError('Unexpected end of file')
+        return data
+
+    def chunks(self) -> Iterator[Dict[str, array]]:
+        '''
+        Yields columns of every chunk as {column name: array}.
+        Dictionary columns contain indices in self.dictionaries.
+        '''
+        while True:
+            magic = self.__read(4)
+            if magic == END_MAGIC:
+                rows, = struct.unpack('<Q', self.__read(8))
+                if rows != self.rows:
+                    raise ValueError('Wrong number of rows')
+                return
+            if magic != CHUNK_MAGIC:
+                raise ValueError('Malformed chunk')
+
+            chunk_rows, = struct.unpack('<I', self.__read(4))
+            for column in COLUMNS:
+                if not column.dictionary:
+                    continue
+                new_count, = struct.unpack('<I', self.__read(4))
+                for _ in range(new_count):
+                    length, = struct.unpack('<I', self.__read(4))
+                    self.dictionaries[column.name].append(
+                        self.__read(length).decode()
+                    )
+
+            chunk = dict()
+            for column in COLUMNS:
+                itemsize = array(column.typecode).itemsize
+                chunk[column.name] = _from_little_endian(
+                    column.typecode, self.__read(itemsize * chunk_rows)
+                )
+            self.rows += chunk_rows
+            yield chunk
+
+    def entries(self) -> Iterator[FileStatistics.Entry]:
+        '''
+        Yields all rows decoded back into entries.
+        '''
+        for chunk in self.chunks():
+            for row in range(len(chunk[COLUMNS[0].name])):
+                fields = dict()
+                for column in COLUMNS:
+                    value = chunk[column.name][row]
+                    if column.dictionary:
+                        value = self.dictionaries[column.name][value]
+                    fields[column.name] = value
+                fields['seconds'] = \
+                    fields['time'] / Statistics.NANOSECONDS_IN_SECOND
+                yield FileStatistics.Entry(**fields)
+
+
+def export_files(files: List[str], path: str,
+                 chunk_size: int = ColumnarWriter.CHUNK_SIZE) -> int:
+    '''
+    Streams entries of all stats files into columnar file at path.
+    File is written to temporary file first and replaces path
+    only if all files were exported.
+    Returns number of exported rows.
+    Raises TypeError if one of files is malformed, OSError if
+    it can not be read.
+    '''
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as out_file:
+            with ColumnarWriter(out_file, chunk_size) as writer:
+                for filename in files:
+                    writer.write_all(FileStatistics.iter_file(filename))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return writer.rows
+
+
+def main(argv: List[str] = None) -> int:
+    '''
+    Command-line entry point for exporting stats files.
+    '''
+    parser = argparse.ArgumentParser(
+        description='Export harmonikey stats files into columnar file.'
+    )
+    parser.add_argument('paths', nargs='+',
+                        help='stats files, directories or glob patterns')
+    parser.add_argument('-o', '--output', required=True,
+                        help='path of exported file')
+    parser.add_argument('--chunk-size', type=int,
+                        default=ColumnarWriter.CHUNK_SIZE,
+                        help='number of rows in every chunk')
+    args = parser.parse_args(argv)
+
+    files = find_files(args.paths)
+    if len(files) == 0:
+        print('No stats files found', file=sys.stderr)
+        return 1
+
+    try:
+        rows = export_files(files, args.output, args.chunk_size)
+    except (OSError, UnicodeDecodeError, TypeError) as error:
+        print(f'Export failed: {error}', file=sys.stderr)
+        return 1
+    print(f'Exported {rows} rows from {len(files)} files', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
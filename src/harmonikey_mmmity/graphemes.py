@@ -0,0 +1,134 @@
+import unicodedata
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+
+from wcwidth import wcwidth
+
+
+ZWJ = '\u200d'
+# Zero width joiner, glues emoji into one cluster
+
+EMOJI_PRESENTATION = '\ufe0f'
+# Variation selector that makes previous character a wide emoji
+
+
+def is_extend(char: str) -> bool:
+    '''
+    Returns True if char is attached to previous character:
+    combining marks, variation selectors, emoji modifiers, tags and ZWJ.
+    '''
+    code = ord(char)
+    return unicodedata.category(char) in ('Mn', 'Me', 'Mc') or \
+        char == ZWJ or \
+        0xFE00 <= code <= 0xFE0F or \
+        0x1F3FB <= code <= 0x1F3FF or \
+        0xE0020 <= code <= 0xE007F or \
+        0xE0100 <= code <= 0xE01EF
+
+
+def is_regional_indicator(char: str) -> bool:
+    '''
+    Returns True if char is one of two letters of a flag emoji.
+    '''
+    return 0x1F1E6 <= ord(char) <= 0x1F1FF
+
+
+def cluster_width(cluster: str) -> int:
+    '''
+    Returns number of terminal cells taken by one grapheme cluster.
+    '''
+    width = max(0, wcwidth(cluster[0]))
+    if EMOJI_PRESENTATION in cluster or is_regional_indicator(cluster[0]):
+        width = 2
+    return width
+
+
+class GraphemeWord(NamedTuple):
+    '''
+    Word split into grapheme clusters.
+    boundaries[i] is index of cluster i in text (code points),
+    boundaries[-1] == len(text).
+    widths[i] is display width of cluster i, width is their sum.
+    '''
+    text: str
+    clusters: Tuple[str, ...]
+    boundaries: Tuple[int, ...]
+    widths: Tuple[int, ...]
+    width: int
+
+
+@lru_cache(maxsize=8192)
+def analyze_word(text: str) -> GraphemeWord:
+    '''
+    Returns GraphemeWord for text.
+    Results are cached, so every word is analyzed only once
+    and not on every key press.
+    '''
+    boundaries = [0]
+    pos = 0
+    while pos < len(text):
+        char = text[pos]
+        pos += 1
+        if char == '\r' and pos < len(text) and text[pos] == '\n':
+            pos += 1
+        elif is_regional_indicator(char) and pos < len(text) and \
+                is_regional_indicator(text[pos]):
+            pos += 1
+            # Flag is a pair of regional indicators
+
+        while pos < len(text) and is_extend(text[pos]):
+            if text[pos] == ZWJ and pos + 1 < len(text):
+                pos += 2
+                # Character after ZWJ is glued to the cluster
+            else:
+                pos += 1
+        boundaries.append(pos)
+
+    clusters = tuple(text[boundaries[i]:boundaries[i + 1]]
+                     for i in range(len(boundaries) - 1))
+    widths = tuple(map(cluster_width, clusters))
+    return GraphemeWord(
+        text=text,
+        clusters=clusters,
+        boundaries=tuple(boundaries),
+        widths=widths,
+        width=sum(widths),
+    )
+
+
+def split_graphemes(text: str) -> Tuple[str, ...]:
+    '''
+    Splits text into grapheme clusters, i. e. what user sees
+    as one character: base character with combining marks,
+    emoji ZWJ sequences, flags, CR LF.
+    This is a simplified version of Unicode extended grapheme clusters.
+    '''
+    return analyze_word(text).clusters
+
+
+def display_width(text: str) -> int:
+    '''
+    Returns number of terminal cells taken by text.
+    '''
+    return analyze_word(text).width
+
+
+def same_grapheme(typed: str, expected: str) -> bool:
+    '''
+    Returns True if typed is the same grapheme as expected,
+    e. g. precomposed letter and letter with combining mark.
+    '''
+    return typed == expected or \
+        unicodedata.normalize('NFC', typed) == \
+        unicodedata.normalize('NFC', expected)
+
+
+def is_grapheme_prefix(typed: str, expected: str) -> bool:
+    '''
+    Returns True if typed can be continued to expected grapheme,
+    e. g. letter without combining mark yet.
+    '''
+    return expected.startswith(typed) or \
+        unicodedata.normalize('NFD', expected).startswith(
+            unicodedata.normalize('NFD', typed)
+        )
@@ -0,0 +1,253 @@
+import os
+from typing import NamedTuple, List, Dict, Tuple
+
+from harmonikey_mmmity.storage import load_json, save_json
+
+
+class LibraryItem(NamedTuple):
+    '''
+    Metadata of one text or vocabulary file.
+    path is relative to library root, e. g. assets/texts/text.txt
+    name is relative to its directory, e. g. text.txt
+    '''
+    path: str
+    name: str
+    size: int
+    mtime: int
+    word_count: int
+    avg_word_length: float
+    difficulty: float
+
+
+def estimate_difficulty(word_count: int, letter_count: int,
+                        symbol_count: int, upper_count: int) -> float:
+    '''
+    Returns rough difficulty estimate of text from 0 (easy) to 1 (hard).
+    Long words, punctuation, digits and capital letters make text harder.
+    letter_count is number of non-whitespace characters,
+    symbol_count and upper_count are counted among them.
+    '''
+    if word_count == 0 or letter_count == 0:
+        return 0.0
+    avg_word_length = letter_count / word_count
+    length_score = min(1.0, max(0.0, (avg_word_length - 3.0) / 7.0))
+    symbol_score = min(1.0, 5.0 * symbol_count / letter_count)
+    upper_score = min(1.0, 5.0 * upper_count / letter_count)
+    return 0.5 * length_score + 0.3 * symbol_score + 0.2 * upper_score
+
+
+def analyze_file(full_path: str, path: str, name: str,
+                 stat: os.stat_result) -> LibraryItem:
+    '''
+    Reads file at full_path line by line and returns its LibraryItem.
+    '''
+    word_count = 0
+    letter_count = 0
+    symbol_count = 0
+    upper_count = 0
+    with open(full_path, 'r', errors='replace') as text_file:
+        for line in text_file:
+            for word in line.split():
+                word_count += 1
+                letter_count += len(word)
+                for char in word:
+                    if not char.isalpha():
+                        symbol_count += 1
+                    elif char.isupper():
+                        upper_count += 1
+
+    avg_word_length = letter_count / word_count if word_count > 0 else 0.0
+    return LibraryItem(
+        path=path,
+        name=name,
+        size=stat.st_size,
+        mtime=stat.st_mtime_ns,
+        word_count=word_count,
+        avg_word_length=avg_word_length,
+        difficulty=estimate_difficulty(word_count, letter_count,
+                                       symbol_count, upper_count),
+    )
+
+
+def fuzzy_score(query: str, name: str) -> int:
+    '''
+    Returns score of name for fuzzy search query, bigger is better.
+    All query characters must be found in name in the same order,
+    otherwise returns -1. Consecutive matches and matches
+    at the start of name are preferred. Both should be lowercase.
+    '''
+    score = 0
+    pos = 0
+    prev_match = -2
+    for char in query:
+        pos = name.find(char, pos)
+        if pos == -1:
+            return -1
+        score += 1
+        if pos == prev_match + 1:
+            score += 2
+        if pos == 0:
+            score += 3
+        prev_match = pos
+        pos += 1
+    return score
+
+
+class Library:
+    '''
+    Index of all texts, vocabularies and code samples
+    in assets directories.
+    Metadata of every file is cached in manifest file and is updated
+    only for files whose size or mtime has changed, so refresh()
+    costs one directory scan. Searching does not touch the disk at all.
+    '''
+    DIRECTORIES = ['assets/texts', 'assets/vocabs', 'assets/code']
+    MANIFEST = 'assets/.library.json'
+
+    def __init__(self, root: str = '.'):
+        '''
+        Initializes empty library, files are indexed by refresh().
+        root is directory in which assets are located.
+        '''
+        self.root: str = root
+        self.items: Dict[str, LibraryItem] = dict()
+        self.__by_directory: Dict[str, List[Tuple[str, LibraryItem]]] = dict()
+        # Lowercase names with items for every directory, for search
+        self.__loaded: bool = False
+
+    def __manifest_path(self) -> str:
+        return os.path.join(self.root, self.MANIFEST)
+
+    def __load_manifest(self):
+        '''
+        Loads items from manifest file, ignores malformed ones.
+        '''
+        self.__loaded = True
+        manifest = load_json(self.__manifest_path(), dict())
+        if not isinstance(manifest, dict):
+            return
+        for path, fields in manifest.items():
+            try:
+                self.items[path] = LibraryItem(**fields)
+            except TypeError:
+                continue
+
+    def __scan(self, directory: str) -> Dict[str, Tuple[str, os.stat_result]]:
+        '''
+        Returns {path: (name, stat)} for all files in directory recursively.
+        Hidden files are skipped.
+        '''
+        out = dict()
+        stack = [os.path.join(self.root, directory)]
+        while len(stack) > 0:
+            current = stack.pop()
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    path = os.path.relpath(entry.path, self.root)
+                    name = os.path.relpath(entry.path,
+                                           os.path.join(self.root, directory))
+                    out[path] = (name, entry.stat())
+        return out
+
+    def refresh(self) -> int:
+        '''
+        Scans assets directories, reanalyzes new and changed files,
+        forgets deleted ones and saves manifest if anything changed.
+        Returns number of analyzed files.
+        '''
+        if not self.__loaded:
+            self.__load_manifest()
+
+        analyzed = 0
+        changed = False
+        found = dict()
+        for directory in self.DIRECTORIES:
+            found[directory] = self.__scan(directory)
+
+        all_paths = set()
+        for directory, files in found.items():
+            for path, (name, stat) in files.items():
+                all_paths.add(path)
+                item = self.items.get(path)
+                if item is not None and item.size == stat.st_size and \
+                   item.mtime == stat.st_mtime_ns:
+                    continue
+                try:
+                    self.items[path] = analyze_file(
+                        os.path.join(self.root, path), path, name, stat
+                    )
+                except OSError:
+                    continue
+                analyzed += 1
+                changed = True
+
+        for path in list(self.items.keys()):
+            if path not in all_paths:
+                del self.items[path]
+                changed = True
+
+        self.__by_directory.clear()
+        for path, item in self.items.items():
+            directory = self.directory_of(path)
+            if directory not in self.__by_directory:
+                self.__by_directory[directory] = []
+            self.__by_directory[directory].append((item.name.lower(), item))
+        for items in self.__by_directory.values():
+            items.sort(key=lambda pair: pair[0])
+
+        if changed:
+            self.save()
+        return analyzed
+
+    def save(self):
+        '''
+        Saves manifest. Does nothing if assets directory does not exist,
+        manifest is only a cache.
+        '''
+        manifest = {path: item._asdict() for path, item in self.items.items()}
+        try:
+            save_json(self.__manifest_path(), manifest)
+        except OSError:
+            pass
+
+    def directory_of(self, path: str) -> str:
+        '''
+        Returns assets directory containing path, or empty string.
+        '''
+        for directory in self.DIRECTORIES:
+            if path.startswith(directory + '/'):
+                return directory
+        return ''
+
+    def get(self, path: str) -> LibraryItem:
+        '''
+        Returns item by path like assets/texts/text.txt, or None.
+        '''
+        return self.items.get(os.path.normpath(path))
+
+    def search(self, directory: str, query: str,
+               limit: int = 10) -> List[LibraryItem]:
+        '''
+        Returns up to limit items from directory which fuzzy match query,
+        best matches first. If query is empty, returns first items by name.
+        '''
+        items = self.__by_directory.get(directory, [])
+        query = query.lower()
+        if query == '':
+            return [item for _, item in items[:limit]]
+
+        scored = []
+        for lower_name, item in items:
+            score = fuzzy_score(query, lower_name)
+            if score >= 0:
+                scored.append((-score, len(lower_name), lower_name, item))
+        scored.sort(key=lambda scored_item: scored_item[:3])
+        return [scored_item[3] for scored_item in scored[:limit]]
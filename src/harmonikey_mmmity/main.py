@@ -1,29 +1,41 @@
 from harmonikey_mmmity.program import Program
-from blessed import Terminal
 import harmonikey_mmmity.state
 
-def main():
+MAX_KEY_BATCH = 256
+# Maximum number of keys handled between two renders
 
-    term = Terminal()
+def main():
 
     program = Program()
+    term = program.term
     program.state.visualize()
 
     with term.cbreak(), term.hidden_cursor():
         # Makes terminal catch all keyboard keys without printing them
 
         while True:
-            key = term.inkey(timeout=0.05)
-            # Reloads terminal every 0.05 s
-            # to update timer
-
-            if key != '':
-                program.state.handle_key(key)
+            key = term.inkey(timeout=program.state.tick_timeout())
+            # Reloads terminal every tick to update timer,
+            # state can ask for earlier tick, e.g. at training deadline
+
+            keys = []
+            while key != '':
+                keys.append(key)
+                if len(keys) == MAX_KEY_BATCH:
+                    break
+                key = term.inkey(timeout=0)
+            # Takes all keys that are already pending (fast typing, paste),
+            # so they are handled together and rendered once
+
+            if len(keys) > 0:
+                program.state.handle_keys(keys)
 
             program.state.tick()
             program.state.visualize()
+            term.flush()
             if isinstance(program.state, harmonikey_mmmity.state.Exit):
                 break
+    program.event_sink.close()
     print('done')
 
 if __name__ == '__main__':
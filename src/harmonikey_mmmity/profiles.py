@@ -0,0 +1,200 @@
+import os
+from typing import Dict, NamedTuple
+
+from harmonikey_mmmity.statistics import FileStatistics, Statistics
+from harmonikey_mmmity.storage import load_json, save_json
+
+
+class PersonalBest(NamedTuple):
+    '''
+    Best run of user on one text_tag by wpm.
+    '''
+    wpm: float
+    cpm: float
+    accuracy: float
+    timestamp: int
+
+
+class Profile:
+    '''
+    Settings of user from the last started training
+    and personal bests on every text_tag.
+    text_type is name of text source, last_text is filename
+    inside its directory, gamemode is name of Gamemode,
+    vocab_filter is word filter as user typed it.
+    '''
+    def __init__(self, user: str, text_type: str = '', last_text: str = '',
+                 gamemode: str = '', timeout: float = 0.0,
+                 vocab_filter: str = ''):
+        self.user: str = user
+        self.text_type: str = text_type
+        self.last_text: str = last_text
+        self.gamemode: str = gamemode
+        self.timeout: float = timeout
+        self.vocab_filter: str = vocab_filter
+        self.bests: Dict[str, PersonalBest] = dict()
+
+    def to_dict(self) -> dict:
+        '''
+        Returns profile as dictionary for saving,
+        from_dict() restores it.
+        '''
+        return {
+            'text_type': self.text_type,
+            'last_text': self.last_text,
+            'gamemode': self.gamemode,
+            'timeout': self.timeout,
+            'vocab_filter': self.vocab_filter,
+            'bests': {text_tag: list(best)
+                      for text_tag, best in self.bests.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, user: str, data: dict):
+        '''
+        Raises KeyError, TypeError or ValueError if data is malformed.
+        '''
+        profile = cls(user, str(data['text_type']), str(data['last_text']),
+                      str(data['gamemode']), float(data['timeout']),
+                      str(data.get('vocab_filter', '')))
+        # Profiles saved before filters were added have no vocab_filter
+        for text_tag, fields in data['bests'].items():
+            profile.bests[text_tag] = PersonalBest(*fields)
+        return profile
+
+
+class ProfileStore:
+    '''
+    Profiles of all users in json file, loaded once at startup.
+    Personal bests are cached here, so result of finished training
+    is compared with them in O(1) instead of reading stats file.
+    If profiles file does not exist yet, bests are collected
+    once from stats file.
+    '''
+    PATH = 'stats/profiles.json'
+    STATS_PATH = 'stats/stats.csv'
+
+    def __init__(self, path: str = PATH, stats_path: str = STATS_PATH):
+        '''
+        Loads all profiles from path.
+        Malformed profiles are skipped.
+        '''
+        self.path: str = path
+        self.profiles: Dict[str, Profile] = dict()
+        self.last_user: str = ''
+        # User of the last started training, is shown in BeforeTraining
+
+        if not os.path.exists(self.path):
+            self.__collect_bests(stats_path)
+            return
+
+        data = load_json(self.path, dict())
+        if not isinstance(data, dict):
+            return
+        self.last_user = str(data.get('last_user', ''))
+        profiles = data.get('profiles', dict())
+        if not isinstance(profiles, dict):
+            return
+        for user, fields in profiles.items():
+            try:
+                self.profiles[user] = Profile.from_dict(user, fields)
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    def __collect_bests(self, stats_path: str):
+        '''
+        Fills bests from stats file, if it exists and is valid,
+        and saves them.
+        '''
+        try:
+            for entry in FileStatistics.iter_file(stats_path):
+                self.__add_entry(entry)
+        except (OSError, UnicodeDecodeError, TypeError):
+            self.profiles.clear()
+            return
+        try:
+            self.__save()
+        except OSError:
+            pass
+        # Next start will not read stats file again
+
+    def __profile(self, user: str) -> Profile:
+        '''
+        Returns profile of user, creates it if needed.
+        '''
+        if user not in self.profiles:
+            self.profiles[user] = Profile(user)
+        return self.profiles[user]
+
+    def get(self, user: str) -> Profile:
+        '''
+        Returns profile of user, or None.
+        '''
+        return self.profiles.get(user)
+
+    def last_profile(self) -> Profile:
+        '''
+        Returns profile of the last user, or None.
+        '''
+        return self.profiles.get(self.last_user)
+
+    def best(self, user: str, text_tag: str) -> PersonalBest:
+        '''
+        Returns personal best of user on text_tag, or None.
+        '''
+        profile = self.profiles.get(user)
+        if profile is None:
+            return None
+        return profile.bests.get(text_tag)
+
+    def update_settings(self, user: str, text_type: str, last_text: str,
+                        gamemode: str, timeout: float,
+                        vocab_filter: str = '') -> None:
+        '''
+        Remembers parameters of training which user starts
+        and makes user the last one.
+        '''
+        profile = self.__profile(user)
+        profile.text_type = text_type
+        profile.last_text = last_text
+        profile.gamemode = gamemode
+        profile.timeout = timeout
+        profile.vocab_filter = vocab_filter
+        self.last_user = user
+        self.__save()
+
+    def __add_entry(self, entry: FileStatistics.Entry) -> bool:
+        '''
+        Updates best of entry's user and text_tag.
+        Returns True if entry is a new personal best.
+        '''
+        bests = self.__profile(entry.user).bests
+        best = bests.get(entry.text_tag)
+        if best is not None and best.wpm >= entry.wpm:
+            return False
+        bests[entry.text_tag] = PersonalBest(entry.wpm, entry.cpm,
+                                             entry.accuracy, entry.timestamp)
+        return True
+
+    def add_result(self, stats: Statistics) -> bool:
+        '''
+        Adds result of finished training.
+        Returns True if it is a new personal best on its text_tag,
+        profiles are saved only then.
+        '''
+        try:
+            entry = FileStatistics.Entry.from_row(str(stats).split(';'))
+        except ValueError:
+            return False
+        # Result is compared exactly as it is saved in stats file
+        if not self.__add_entry(entry):
+            return False
+        self.__save()
+        return True
+
+    def __save(self):
+        save_json(self.path, {
+            'last_user': self.last_user,
+            'profiles': {user: profile.to_dict()
+                         for user, profile in self.profiles.items()},
+        })
@@ -1,9 +1,37 @@
-from blessed import Terminal
+from harmonikey_mmmity.terminal import Screen, get_terminal, set_terminal
+from harmonikey_mmmity.library import Library
+from harmonikey_mmmity.analyzer import TextAnalyzer
+from harmonikey_mmmity.checkpoints import CheckpointStore
+from harmonikey_mmmity.profiles import ProfileStore
+from harmonikey_mmmity.rollups import Rollups
+from harmonikey_mmmity.sketches import SketchStore
+from harmonikey_mmmity.telemetry import create_sink
 
 class Program:
 
-    def __init__(self):
-        self.term = Terminal()
+    def __init__(self, term: Screen = None):
+        '''
+        term is terminal to draw on, real one by default.
+        Given terminal (e. g. VirtualTerminal) is shared with widgets.
+        '''
+        if term is not None:
+            set_terminal(term)
+        self.term: Screen = get_terminal()
+        self.library = Library()
+        # Index of texts and vocabularies, is shared by all states
+        self.analyzer = TextAnalyzer()
+        # Difficulty profiles of texts, for normalized wpm
+        self.checkpoints = CheckpointStore()
+        # Saved progress of paused trainings on text files
+        self.profiles = ProfileStore()
+        # Settings and personal bests of users, loaded once
+        self.sketches = SketchStore('stats/stats.csv')
+        # Distributions of results, for percentiles after training
+        self.rollups = Rollups('stats/stats.csv')
+        # Daily, weekly and monthly results, for progress in stats
+        self.event_sink = create_sink()
+        # Receiver of training events, ignores them unless
+        # HARMONIKEY_EVENTS environment variable is set
 
         import harmonikey_mmmity.state
         self.state = harmonikey_mmmity.state.MainMenu(self)
@@ -0,0 +1,517 @@
+import argparse
+import asyncio
+import random
+import struct
+import sys
+import threading
+import time
+from enum import IntEnum
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from harmonikey_mmmity.exceptions import RaceError
+
+
+PORT = 7788
+# Default port of race server
+
+HEADER = struct.Struct('<BH')
+# Every message starts with its type and length of payload
+
+WELCOME = struct.Struct('<HI')
+# Racer id and seed, followed by text type and filename
+# separated by zero byte
+
+RACER_ID = struct.Struct('<H')
+START = struct.Struct('<I')
+# Milliseconds until start
+
+PROGRESS = struct.Struct('<HH')
+# Words and characters typed since previous progress message
+
+UPDATE_ENTRY = struct.Struct('<HIIB')
+# Racer id, total words, total characters, finished flag
+
+MAX_PAYLOAD = 65535
+MAX_RACER_ID = 65535
+# Racer ids are packed as uint16
+MAX_DELTA = 65535
+NAME_LIMIT = 64
+# Names are cut to this number of bytes
+
+MAX_UPDATE_ENTRIES = (MAX_PAYLOAD - RACER_ID.size) // UPDATE_ENTRY.size
+
+
+class Message(IntEnum):
+    '''
+    Types of messages.
+    Client sends HELLO with its name, then PROGRESS and FINISH.
+    Server answers with WELCOME, then sends JOINED and LEFT
+    when racers come and go, START when race is scheduled
+    and UPDATE with progress of racers changed since last UPDATE.
+    Instead of WELCOME server sends REJECTED with reason
+    and disconnects if racer can not join.
+    '''
+    HELLO = 1
+    WELCOME = 2
+    JOINED = 3
+    LEFT = 4
+    START = 5
+    PROGRESS = 6
+    FINISH = 7
+    UPDATE = 8
+    REJECTED = 9
+
+
+class RaceText(NamedTuple):
+    '''
+    Text shared by all racers: text source name, filename
+    with source directory, and seed for seedable sources.
+    '''
+    text_type: str
+    filename: str
+    seed: int
+
+
+class Racer(NamedTuple):
+    '''
+    Progress of one racer.
+    '''
+    id: int
+    name: str
+    words: int = 0
+    characters: int = 0
+    finished: bool = False
+
+
+def pack(message: Message, payload: bytes = b'') -> bytes:
+    return HEADER.pack(message, len(payload)) + payload
+
+
+def pack_updates(racers: Iterable[Racer]) -> bytes:
+    '''
+    Returns UPDATE messages with progress of racers,
+    several ones if they do not fit into one.
+    '''
+    racers = list(racers)
+    data = b''
+    for start in range(0, len(racers), MAX_UPDATE_ENTRIES):
+        chunk = racers[start:start + MAX_UPDATE_ENTRIES]
+        payload = RACER_ID.pack(len(chunk))
+        payload += b''.join(
+            UPDATE_ENTRY.pack(racer.id, racer.words, racer.characters,
+                              racer.finished)
+            for racer in chunk
+        )
+        data += pack(Message.UPDATE, payload)
+    return data
+
+
+def unpack_updates(payload: bytes) -> Iterable[Tuple[int, int, int, bool]]:
+    '''
+    Yields (racer id, words, characters, finished) from UPDATE payload.
+    '''
+    count, = RACER_ID.unpack_from(payload)
+    for index in range(count):
+        racer_id, words, characters, finished = UPDATE_ENTRY.unpack_from(
+            payload, RACER_ID.size + index * UPDATE_ENTRY.size
+        )
+        yield racer_id, words, characters, bool(finished)
+
+
+async def read_message(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    '''
+    Returns type and payload of next message.
+    Raises asyncio.IncompleteReadError when connection is closed.
+    '''
+    kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return kind, await reader.readexactly(length)
+
+
+class RaceServer:
+    '''
+    Asyncio server which relays progress of racers on one text.
+    Race starts countdown seconds after min_racers have joined,
+    racers joining later start right away.
+    Progress is not sent on every PROGRESS message: changed racers
+    are collected and every BROADCAST_INTERVAL one packed UPDATE
+    is written to all racers, so traffic does not grow
+    with typing speed. Racers whose socket buffers more than
+    MAX_BUFFERED bytes are too slow to read and are disconnected,
+    so they do not hold back the others.
+    Ids of racers who left unfinished are given to new racers,
+    when all MAX_RACER_ID + 1 ids are taken new racers are rejected.
+    '''
+    BROADCAST_INTERVAL = 0.1
+    MAX_BUFFERED = 1 << 20
+
+    def __init__(self, text: RaceText, min_racers: int = 2,
+                 countdown: float = 3.0):
+        self.text: RaceText = text
+        self.min_racers: int = min_racers
+        self.countdown: float = countdown
+        self.racers: Dict[int, Racer] = dict()
+        # Finished racers stay here after they disconnect
+        self.start_at: float = None
+        # Loop time when race starts, None until scheduled
+        self.port: int = 0
+        self.__writers: Dict[int, asyncio.StreamWriter] = dict()
+        self.__changed: Set[int] = set()
+        self.__next_id: int = 0
+        self.__free_ids: List[int] = []
+        # Ids of racers who left unfinished
+        self.__server: asyncio.Server = None
+        self.__broadcaster: asyncio.Task = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = PORT):
+        '''
+        Starts listening, port 0 picks a free one, it is saved in port.
+        '''
+        self.__server = await asyncio.start_server(self.__handle, host, port)
+        self.port = self.__server.sockets[0].getsockname()[1]
+        self.__broadcaster = asyncio.create_task(self.__broadcast_loop())
+
+    async def close(self):
+        self.__broadcaster.cancel()
+        self.__server.close()
+        for writer in list(self.__writers.values()):
+            writer.close()
+        await self.__server.wait_closed()
+
+    def __write(self, racer_id: int, data: bytes):
+        '''
+        Writes data to racer, disconnects racers which do not read.
+        '''
+        writer = self.__writers.get(racer_id)
+        if writer is None or writer.is_closing():
+            return
+        # Lost connection is removed when its handler sees end of stream
+        if writer.transport.get_write_buffer_size() > self.MAX_BUFFERED:
+            writer.close()
+            return
+        writer.write(data)
+
+    def __write_all(self, data: bytes):
+        for racer_id in list(self.__writers):
+            self.__write(racer_id, data)
+
+    def __start_message(self) -> bytes:
+        loop_time = asyncio.get_running_loop().time()
+        milliseconds = max(0, int(1000 * (self.start_at - loop_time)))
+        return pack(Message.START, START.pack(milliseconds))
+
+    def __join(self, name: str, writer: asyncio.StreamWriter) -> Racer:
+        '''
+        Adds racer, tells it about the race and the others,
+        and tells the others about it.
+        Returns None and rejects racer if there is no free id.
+        '''
+        if self.__free_ids:
+            racer = Racer(self.__free_ids.pop(), name)
+        elif self.__next_id <= MAX_RACER_ID:
+            racer = Racer(self.__next_id, name)
+            self.__next_id += 1
+        else:
+            writer.write(pack(Message.REJECTED, b'Race is full'))
+            return None
+
+        welcome = WELCOME.pack(racer.id, self.text.seed)
+        welcome += (self.text.text_type + '\0' + self.text.filename).encode()
+        data = pack(Message.WELCOME, welcome)
+        for other in self.racers.values():
+            data += pack(Message.JOINED, RACER_ID.pack(other.id) +
+                         other.name.encode())
+        data += pack_updates(other for other in self.racers.values()
+                             if other.characters > 0 or other.finished)
+        # Progress of racers who already started typing
+        self.__write_all(pack(Message.JOINED, RACER_ID.pack(racer.id) +
+                              name.encode()))
+
+        self.racers[racer.id] = racer
+        self.__writers[racer.id] = writer
+        writer.write(data + pack(Message.JOINED, RACER_ID.pack(racer.id) +
+                                 name.encode()))
+
+        if self.start_at is not None:
+            writer.write(self.__start_message())
+        elif len(self.__writers) >= self.min_racers:
+            self.start_at = asyncio.get_running_loop().time() + self.countdown
+            self.__write_all(self.__start_message())
+        return racer
+
+    def __leave(self, racer_id: int):
+        '''
+        Removes connection of racer. Unfinished racers leave the race.
+        '''
+        self.__writers.pop(racer_id, None)
+        if self.racers[racer_id].finished:
+            return
+        del self.racers[racer_id]
+        self.__changed.discard(racer_id)
+        self.__free_ids.append(racer_id)
+        self.__write_all(pack(Message.LEFT, RACER_ID.pack(racer_id)))
+
+    async def __handle(self, reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter):
+        racer_id = None
+        try:
+            kind, payload = await read_message(reader)
+            if kind != Message.HELLO:
+                return
+            name = payload[:NAME_LIMIT].decode(errors='replace')
+            racer = self.__join(name, writer)
+            if racer is None:
+                return
+            racer_id = racer.id
+            while True:
+                kind, payload = await read_message(reader)
+                racer = self.racers[racer_id]
+                if kind == Message.PROGRESS:
+                    words, characters = PROGRESS.unpack(payload)
+                    racer = racer._replace(
+                        words=racer.words + words,
+                        characters=racer.characters + characters
+                    )
+                elif kind == Message.FINISH:
+                    racer = racer._replace(finished=True)
+                else:
+                    continue
+                self.racers[racer_id] = racer
+                self.__changed.add(racer_id)
+        except (asyncio.IncompleteReadError, ConnectionError, struct.error):
+            pass
+        finally:
+            writer.close()
+            if racer_id is not None:
+                self.__leave(racer_id)
+
+    def broadcast(self):
+        '''
+        Sends progress of racers changed since last broadcast
+        to everyone as one message.
+        '''
+        if len(self.__changed) == 0:
+            return
+        changed = [self.racers[racer_id] for racer_id in sorted(self.__changed)]
+        self.__changed.clear()
+        self.__write_all(pack_updates(changed))
+        # Message is packed once for all racers
+
+    async def __broadcast_loop(self):
+        while True:
+            await asyncio.sleep(self.BROADCAST_INTERVAL)
+            self.broadcast()
+
+
+class RaceClient:
+    '''
+    Connection of one racer to RaceServer.
+    Runs its own event loop (asyncio.run) in background thread, so training
+    only calls report() with its totals and reads standings().
+    Totals are sent as deltas at most every SEND_INTERVAL,
+    however often report() is called.
+    '''
+    SEND_INTERVAL = 0.1
+    CONNECT_TIMEOUT = 5.0
+
+    def __init__(self, host: str, port: int, name: str):
+        self.host: str = host
+        self.port: int = port
+        self.name: str = name
+        self.racer_id: int = None
+        self.text: RaceText = None
+        self.start_time: float = None
+        # time.monotonic() of race start, None until scheduled
+        self.closed: bool = False
+        self.__racers: Dict[int, Racer] = dict()
+        self.__lock = threading.Lock()
+        # Racers are changed by loop thread and read by training
+        self.__typed: Tuple[int, int] = (0, 0)
+        self.__sent: Tuple[int, int] = (0, 0)
+        self.__finishing: bool = False
+        self.__welcomed = threading.Event()
+        self.__error: str = ''
+        self.__loop: asyncio.AbstractEventLoop = None
+        self.__task: asyncio.Task = None
+        # Are set by loop thread when it starts
+
+    def connect(self, timeout: float = CONNECT_TIMEOUT):
+        '''
+        Connects to server and waits for text of the race.
+        Raises RaceError if it fails.
+        '''
+        threading.Thread(target=asyncio.run, args=(self.__run(),),
+                         daemon=True).start()
+        # Loop is closed by asyncio.run when connection ends
+        if not self.__welcomed.wait(timeout):
+            self.close()
+            raise RaceError('Race server does not answer')
+        if self.text is None:
+            raise RaceError(self.__error or 'Race server closed connection')
+
+    def close(self):
+        '''
+        Disconnects, can be called from any thread.
+        '''
+        if self.__task is None or self.closed:
+            return
+        try:
+            self.__loop.call_soon_threadsafe(self.__task.cancel)
+        except RuntimeError:
+            pass
+        # Loop could have been closed just now
+
+    def report(self, words: int, characters: int):
+        '''
+        Sets total number of words and characters typed by user.
+        '''
+        self.__typed = (words, characters)
+
+    def finish(self):
+        '''
+        Sends last progress and finish, then disconnects.
+        '''
+        self.__finishing = True
+
+    def seconds_to_start(self) -> float:
+        '''
+        Returns seconds left until start, 0.0 after it,
+        or None if race is not scheduled yet.
+        '''
+        if self.start_time is None:
+            return None
+        return max(0.0, self.start_time - time.monotonic())
+
+    def standings(self) -> List[Racer]:
+        '''
+        Returns racers sorted by typed characters, finished first.
+        '''
+        with self.__lock:
+            racers = list(self.__racers.values())
+        return sorted(racers, key=lambda racer: (not racer.finished,
+                                                 -racer.characters))
+
+    async def __run(self):
+        self.__loop = asyncio.get_running_loop()
+        self.__task = asyncio.current_task()
+        writer = None
+        try:
+            reader, writer = await asyncio.open_connection(self.host,
+                                                           self.port)
+            writer.write(pack(Message.HELLO,
+                              self.name.encode()[:NAME_LIMIT]))
+            sender = asyncio.create_task(self.__send_loop(writer))
+            try:
+                while True:
+                    self.__receive(*await read_message(reader))
+            finally:
+                sender.cancel()
+        except OSError as error:
+            self.__error = f'Can not connect to race server: {error}'
+        except (asyncio.IncompleteReadError, asyncio.CancelledError,
+                struct.error, UnicodeDecodeError):
+            pass
+        finally:
+            if writer is not None:
+                writer.close()
+            self.closed = True
+            self.__welcomed.set()
+
+    def __send_progress(self, writer: asyncio.StreamWriter):
+        '''
+        Writes what was typed since last progress message.
+        '''
+        words = min(self.__typed[0] - self.__sent[0], MAX_DELTA)
+        characters = min(self.__typed[1] - self.__sent[1], MAX_DELTA)
+        if words <= 0 and characters <= 0:
+            return
+        words, characters = max(words, 0), max(characters, 0)
+        writer.write(pack(Message.PROGRESS, PROGRESS.pack(words, characters)))
+        self.__sent = (self.__sent[0] + words, self.__sent[1] + characters)
+
+    async def __send_loop(self, writer: asyncio.StreamWriter):
+        while True:
+            await asyncio.sleep(self.SEND_INTERVAL)
+            self.__send_progress(writer)
+            if self.__finishing and self.__sent == self.__typed:
+                writer.write(pack(Message.FINISH))
+                await writer.drain()
+                self.__task.cancel()
+                return
+            await writer.drain()
+
+    def __receive(self, kind: int, payload: bytes):
+        with self.__lock:
+            match kind:
+                case Message.WELCOME:
+                    self.racer_id, seed = WELCOME.unpack_from(payload)
+                    text_type, filename = \
+                        payload[WELCOME.size:].decode().split('\0', 1)
+                    self.text = RaceText(text_type, filename, seed)
+                    self.__welcomed.set()
+                case Message.REJECTED:
+                    reason = payload.decode(errors='replace')
+                    self.__error = f'Race server rejected: {reason}'
+                case Message.JOINED:
+                    racer_id, = RACER_ID.unpack_from(payload)
+                    name = payload[RACER_ID.size:].decode(errors='replace')
+                    self.__racers[racer_id] = Racer(racer_id, name)
+                case Message.LEFT:
+                    racer_id, = RACER_ID.unpack(payload)
+                    self.__racers.pop(racer_id, None)
+                case Message.START:
+                    milliseconds, = START.unpack(payload)
+                    self.start_time = time.monotonic() + milliseconds / 1000
+                case Message.UPDATE:
+                    for racer_id, words, characters, finished in \
+                            unpack_updates(payload):
+                        if racer_id in self.__racers:
+                            self.__racers[racer_id] = \
+                                self.__racers[racer_id]._replace(
+                                    words=words, characters=characters,
+                                    finished=finished
+                                )
+
+
+async def serve(text: RaceText, host: str, port: int,
+                min_racers: int, countdown: float):
+    server = RaceServer(text, min_racers, countdown)
+    await server.start(host, port)
+    print(f'Race on {text.filename} is waiting for racers on port {server.port}')
+    await asyncio.Event().wait()
+    # Server works until interrupted
+
+
+def main(argv: List[str] = None) -> int:
+    '''
+    Command-line entry point for running race server.
+    '''
+    parser = argparse.ArgumentParser(
+        description='Run harmonikey race server.'
+    )
+    parser.add_argument('text',
+                        help='file of the race, with assets directory, '
+                             'e. g. assets/vocabs/top1000_english.txt')
+    parser.add_argument('--type', default='FILE',
+                        help='text source, FILE by default')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed of random texts, random by default')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--racers', type=int, default=2,
+                        help='number of racers to start countdown')
+    parser.add_argument('--countdown', type=float, default=3.0,
+                        help='seconds before start')
+    args = parser.parse_args(argv)
+
+    seed = args.seed if args.seed is not None else random.getrandbits(32)
+    text = RaceText(args.type, args.text, seed)
+    try:
+        asyncio.run(serve(text, args.host, args.port,
+                          args.racers, args.countdown))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
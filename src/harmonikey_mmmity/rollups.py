@@ -0,0 +1,241 @@
+import datetime
+import os
+from typing import Dict, List, Tuple
+
+from harmonikey_mmmity.statistics import FileStatistics
+from harmonikey_mmmity.storage import load_json, save_json
+
+
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+
+def sparkline(values: List[float], low: float = None) -> str:
+    '''
+    Returns values drawn as one line of block characters,
+    scaled from low (minimum of values by default) to maximum of values.
+    '''
+    if len(values) == 0:
+        return ''
+    if low is None:
+        low = min(values)
+    high = max(values)
+    if high <= low:
+        return SPARK_CHARS[0] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (high - low)
+    return ''.join(SPARK_CHARS[round((value - low) * scale)]
+                   for value in values)
+
+
+def period_key(timestamp: int, period: str) -> str:
+    '''
+    Returns key of day, week or month containing timestamp (local time):
+    2024-03-15, 2024-W11 (ISO week) or 2024-03.
+    Keys of same period sort in chronological order.
+    '''
+    date = datetime.date.fromtimestamp(timestamp)
+    match period:
+        case 'day':
+            return date.isoformat()
+        case 'week':
+            year, week, _ = date.isocalendar()
+            return f'{year:04}-W{week:02}'
+        case 'month':
+            return f'{date.year:04}-{date.month:02}'
+        case _:
+            raise ValueError("Unknown period")
+
+
+def read_appended(stats_path: str,
+                  offset: int) -> Tuple[List[FileStatistics.Entry], int]:
+    '''
+    Returns entries of complete rows of stats file after byte offset
+    and offset right after the last complete row.
+    Malformed rows are skipped, unfinished last row is left
+    for the next call.
+    Raises OSError if stats file can not be read.
+    '''
+    with open(stats_path, 'rb') as stats_file:
+        stats_file.seek(offset)
+        data = stats_file.read()
+    end = data.rfind(b'\n') + 1
+
+    entries = []
+    for line in data[:end].decode(errors='replace').splitlines():
+        try:
+            entries.append(FileStatistics.Entry.from_row(line.split(';')))
+        except (IndexError, ValueError):
+            continue
+    return entries, offset + end
+
+
+class Bucket:
+    '''
+    Rollup of all runs of one user on one text during one period.
+    '''
+    def __init__(self, count: int = 0, wpm_sum: float = 0.0,
+                 best_wpm: float = 0.0, character_count: int = 0,
+                 error_count: int = 0):
+        self.count: int = count
+        self.wpm_sum: float = wpm_sum
+        self.best_wpm: float = best_wpm
+        self.character_count: int = character_count
+        self.error_count: int = error_count
+
+    def add(self, entry: FileStatistics.Entry):
+        '''
+        Adds one run to bucket.
+        '''
+        self.count += 1
+        self.wpm_sum += entry.wpm
+        self.best_wpm = max(self.best_wpm, entry.wpm)
+        self.character_count += entry.character_count
+        self.error_count += entry.error_count
+
+    def merge(self, other):
+        '''
+        Adds all runs of other bucket.
+        '''
+        self.count += other.count
+        self.wpm_sum += other.wpm_sum
+        self.best_wpm = max(self.best_wpm, other.best_wpm)
+        self.character_count += other.character_count
+        self.error_count += other.error_count
+
+    def mean_wpm(self) -> float:
+        '''
+        Returns mean wpm of runs in bucket.
+        '''
+        return self.wpm_sum / self.count if self.count > 0 else 0.0
+
+    def error_rate(self) -> float:
+        '''
+        Returns share of wrong characters among all typed.
+        '''
+        typed_count = self.character_count + self.error_count
+        return self.error_count / typed_count if typed_count > 0 else 0.0
+
+    def to_list(self) -> list:
+        '''
+        Returns fields as list for saving, Bucket(*fields) restores it.
+        '''
+        return [self.count, self.wpm_sum, self.best_wpm,
+                self.character_count, self.error_count]
+
+
+class Rollups:
+    '''
+    Daily, weekly and monthly rollups of stats file
+    for every user and text_tag.
+    Rollups are saved next to stats file together with
+    number of bytes of stats file already counted, so update()
+    only reads rows appended since last time.
+    Rows without timestamp are skipped.
+    '''
+    PERIODS = ('day', 'week', 'month')
+
+    def __init__(self, stats_path: str, path: str = None):
+        '''
+        Loads saved rollups of stats_path.
+        By default they are saved in stats/stats.rollups.json
+        for stats/stats.csv.
+        '''
+        self.stats_path: str = stats_path
+        self.path: str = path or \
+            os.path.splitext(stats_path)[0] + '.rollups.json'
+        self.offset: int = 0
+        # Number of bytes of stats file already added to rollups
+        self.buckets: Dict[str, Dict[Tuple[str, str, str], Bucket]] = \
+            {period: dict() for period in self.PERIODS}
+        # (user, text_tag, period key) -> Bucket for every period
+        self.__load()
+
+    def __clear(self):
+        self.offset = 0
+        for buckets in self.buckets.values():
+            buckets.clear()
+
+    def __load(self):
+        '''
+        Loads rollups from self.path, starts from scratch
+        if they are missing or malformed.
+        '''
+        data = load_json(self.path, dict())
+        try:
+            self.offset = int(data['offset'])
+            for period in self.PERIODS:
+                for key, fields in data['buckets'][period].items():
+                    user, text_tag, period_id = key.split(';')
+                    self.buckets[period][(user, text_tag, period_id)] = \
+                        Bucket(*fields)
+        except (KeyError, TypeError, ValueError):
+            self.__clear()
+
+    def save(self):
+        '''
+        Saves rollups. They are only a cache, so errors are ignored.
+        '''
+        data = {
+            'offset': self.offset,
+            'buckets': {
+                period: {';'.join(key): bucket.to_list()
+                         for key, bucket in buckets.items()}
+                for period, buckets in self.buckets.items()
+            },
+        }
+        try:
+            save_json(self.path, data)
+        except OSError:
+            pass
+
+    def add(self, entry: FileStatistics.Entry):
+        '''
+        Adds entry to rollups of every period.
+        '''
+        if entry.timestamp == 0:
+            return
+        for period in self.PERIODS:
+            key = (entry.user, entry.text_tag,
+                   period_key(entry.timestamp, period))
+            if key not in self.buckets[period]:
+                self.buckets[period][key] = Bucket()
+            self.buckets[period][key].add(entry)
+
+    def update(self) -> int:
+        '''
+        Adds rows appended to stats file since last update and saves
+        rollups. If stats file got shorter, it was rewritten,
+        and rollups are rebuilt. Malformed rows are skipped.
+        Unfinished last row is left for the next update.
+        Returns number of read rows.
+        Raises OSError if stats file can not be read.
+        '''
+        if os.path.getsize(self.stats_path) < self.offset:
+            self.__clear()
+
+        entries, offset = read_appended(self.stats_path, self.offset)
+        if offset == self.offset:
+            return 0
+        for entry in entries:
+            self.add(entry)
+
+        self.offset = offset
+        self.save()
+        return len(entries)
+
+    def series(self, user: str, text_tag: str,
+               period: str) -> List[Tuple[str, Bucket]]:
+        '''
+        Returns (period key, Bucket) of user on text_tag
+        in chronological order.
+        If text_tag is empty, runs on all texts are merged.
+        '''
+        merged: Dict[str, Bucket] = dict()
+        for (bucket_user, bucket_tag, key), bucket in \
+                self.buckets[period].items():
+            if bucket_user != user or \
+               (text_tag != '' and bucket_tag != text_tag):
+                continue
+            if key not in merged:
+                merged[key] = Bucket()
+            merged[key].merge(bucket)
+        return sorted(merged.items())
@@ -0,0 +1,269 @@
+import bisect
+import math
+import os
+from typing import Dict, List, Tuple
+
+from harmonikey_mmmity.statistics import FileStatistics
+from harmonikey_mmmity.storage import load_json, save_json
+from harmonikey_mmmity.rollups import read_appended
+
+
+class QuantileSketch:
+    '''
+    Mergeable streaming quantile sketch in the style of KLL.
+    Values are kept in levels of compactors, every value on level h
+    stands for 2 ** h original values. When a level is full,
+    it is sorted and every second value is promoted to the next level.
+    Lower levels get smaller capacities, so memory is O(k log(n / k)),
+    and rank error is about 1 / k.
+    Which half of the pairs is promoted alternates on every level,
+    so sketches are deterministic and can be compared in tests.
+    '''
+    K = 200
+    # Capacity of the top level
+
+    CAPACITY_DECAY = 2 / 3
+    # Every level below top is this much smaller
+
+    def __init__(self, k: int = K):
+        self.k: int = k
+        self.count: int = 0
+        self.levels: List[List[float]] = [[]]
+        self.flips: List[int] = [0]
+        # Which half of pairs was promoted last time on every level
+
+    def __capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * self.CAPACITY_DECAY ** depth))
+
+    def __compact(self, level: int):
+        '''
+        Promotes half of values of level to the next one.
+        If number of values is odd, the largest one stays.
+        '''
+        if level + 1 == len(self.levels):
+            self.levels.append([])
+            self.flips.append(0)
+        values = sorted(self.levels[level])
+        kept = values[len(values) - len(values) % 2:]
+        self.levels[level + 1].extend(
+            values[self.flips[level]:len(values) - len(kept):2]
+        )
+        self.flips[level] ^= 1
+        self.levels[level] = kept
+
+    def __compress(self):
+        '''
+        Compacts all levels which are over capacity.
+        '''
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) >= self.__capacity(level):
+                self.__compact(level)
+            level += 1
+
+    def add(self, value: float):
+        self.levels[0].append(value)
+        self.count += 1
+        if len(self.levels[0]) >= self.__capacity(0):
+            self.__compress()
+
+    def merge(self, other):
+        '''
+        Adds all values summarized by other sketch.
+        '''
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+            self.flips.append(0)
+        for level, values in enumerate(other.levels):
+            self.levels[level].extend(values)
+        self.count += other.count
+        self.__compress()
+
+    def __weighted(self) -> Tuple[List[float], List[int]]:
+        '''
+        Returns sorted values and cumulative weights.
+        '''
+        pairs = sorted((value, 1 << level)
+                       for level, values in enumerate(self.levels)
+                       for value in values)
+        values = [value for value, _ in pairs]
+        cumulative = []
+        total = 0
+        for _, weight in pairs:
+            total += weight
+            cumulative.append(total)
+        return values, cumulative
+
+    def rank(self, value: float) -> float:
+        '''
+        Returns approximate share of values which are not greater
+        than value, 0.0 for empty sketch.
+        '''
+        values, cumulative = self.__weighted()
+        if len(values) == 0:
+            return 0.0
+        position = bisect.bisect_right(values, value)
+        if position == 0:
+            return 0.0
+        return cumulative[position - 1] / cumulative[-1]
+
+    def quantile(self, q: float) -> float:
+        '''
+        Returns approximate value with share q of values below it,
+        e. g. median for 0.5. Returns 0.0 for empty sketch.
+        '''
+        values, cumulative = self.__weighted()
+        if len(values) == 0:
+            return 0.0
+        target = q * cumulative[-1]
+        position = bisect.bisect_left(cumulative, target)
+        return values[min(position, len(values) - 1)]
+
+    def to_dict(self) -> dict:
+        '''
+        Returns sketch as dictionary for saving,
+        from_dict() restores it.
+        '''
+        return {'k': self.k, 'count': self.count,
+                'levels': self.levels, 'flips': self.flips}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        '''
+        Raises KeyError, TypeError or ValueError if data is malformed.
+        '''
+        sketch = cls(int(data['k']))
+        sketch.count = int(data['count'])
+        sketch.levels = [[float(value) for value in values]
+                         for values in data['levels']]
+        sketch.flips = [int(flip) for flip in data['flips']]
+        if len(sketch.levels) != len(sketch.flips):
+            raise ValueError('Malformed sketch')
+        return sketch
+
+
+class RunSketches:
+    '''
+    Distributions of wpm and error rate of runs.
+    '''
+    def __init__(self, wpm: QuantileSketch = None,
+                 error_rate: QuantileSketch = None):
+        self.wpm: QuantileSketch = wpm or QuantileSketch()
+        self.error_rate: QuantileSketch = error_rate or QuantileSketch()
+
+    def add(self, entry: FileStatistics.Entry):
+        self.wpm.add(entry.wpm)
+        typed_count = entry.character_count + entry.error_count
+        self.error_rate.add(entry.error_count / typed_count
+                            if typed_count > 0 else 0.0)
+
+    def merge(self, other):
+        self.wpm.merge(other.wpm)
+        self.error_rate.merge(other.error_rate)
+
+
+class SketchStore:
+    '''
+    Quantile sketches of runs of every user on every text_tag.
+    Like Rollups, they are saved next to stats file together with
+    number of bytes of stats file already counted, so update()
+    only reads rows appended since last time.
+    Distributions of all users on a text are merged from their sketches.
+    '''
+    def __init__(self, stats_path: str, path: str = None):
+        '''
+        Loads saved sketches of stats_path.
+        By default they are saved in stats/stats.sketches.json
+        for stats/stats.csv.
+        '''
+        self.stats_path: str = stats_path
+        self.path: str = path or \
+            os.path.splitext(stats_path)[0] + '.sketches.json'
+        self.offset: int = 0
+        # Number of bytes of stats file already added to sketches
+        self.sketches: Dict[Tuple[str, str], RunSketches] = dict()
+        self.__load()
+
+    def __clear(self):
+        self.offset = 0
+        self.sketches.clear()
+
+    def __load(self):
+        '''
+        Loads sketches from self.path, starts from scratch
+        if they are missing or malformed.
+        '''
+        data = load_json(self.path, dict())
+        try:
+            self.offset = int(data['offset'])
+            for key, fields in data['sketches'].items():
+                user, text_tag = key.split(';', 1)
+                self.sketches[(user, text_tag)] = RunSketches(
+                    QuantileSketch.from_dict(fields['wpm']),
+                    QuantileSketch.from_dict(fields['error_rate']),
+                )
+        except (KeyError, TypeError, ValueError):
+            self.__clear()
+
+    def save(self):
+        '''
+        Saves sketches. They are only a cache, so errors are ignored.
+        '''
+        data = {
+            'offset': self.offset,
+            'sketches': {
+                ';'.join(key): {'wpm': sketches.wpm.to_dict(),
+                                'error_rate': sketches.error_rate.to_dict()}
+                for key, sketches in self.sketches.items()
+            },
+        }
+        try:
+            save_json(self.path, data)
+        except OSError:
+            pass
+
+    def add(self, entry: FileStatistics.Entry):
+        key = (entry.user, entry.text_tag)
+        if key not in self.sketches:
+            self.sketches[key] = RunSketches()
+        self.sketches[key].add(entry)
+
+    def update(self) -> int:
+        '''
+        Adds rows appended to stats file since last update and saves
+        sketches. If stats file got shorter, sketches are rebuilt.
+        Returns number of added rows.
+        Raises OSError if stats file can not be read.
+        '''
+        if os.path.getsize(self.stats_path) < self.offset:
+            self.__clear()
+
+        entries, offset = read_appended(self.stats_path, self.offset)
+        if offset == self.offset:
+            return 0
+        for entry in entries:
+            self.add(entry)
+
+        self.offset = offset
+        self.save()
+        return len(entries)
+
+    def get(self, user: str, text_tag: str) -> RunSketches:
+        '''
+        Returns sketches of user on text_tag, or None.
+        '''
+        return self.sketches.get((user, text_tag))
+
+    def merged(self, text_tag: str) -> RunSketches:
+        '''
+        Returns sketches of all users on text_tag merged, or None.
+        '''
+        merged = None
+        for (_, sketch_tag), sketches in self.sketches.items():
+            if sketch_tag != text_tag:
+                continue
+            if merged is None:
+                merged = RunSketches()
+            merged.merge(sketches)
+        return merged
@@ -1,12 +1,28 @@
+import bisect
+import math
+import os
+import time
+from array import array
 from abc import ABC, abstractmethod
 from harmonikey_mmmity.gamemodes import Gamemode
-from harmonikey_mmmity.statistics import Statistics, FileStatistics
+from harmonikey_mmmity.statistics import Statistics, FileStatistics, \
+                                         KeyStatistics, RollingRate
 from blessed.keyboard import Keystroke
-from harmonikey_mmmity.text_generator import FileTextGenerator, \
-                               RandomTextGenerator, TextgenType
+from harmonikey_mmmity.text_generator import TextgenType
+from harmonikey_mmmity.text_sources import TextSource, get_registry
 from harmonikey_mmmity.program import Program
 from harmonikey_mmmity.exceptions import *
-from harmonikey_mmmity.widgets import Widget, Button, TextInput, Switch, NumberInput
+from harmonikey_mmmity.widgets import Widget, Button, TextInput, Switch, \
+                                      NumberInput, ScrollList
+from harmonikey_mmmity.library import LibraryItem
+from harmonikey_mmmity.checkpoints import Checkpoint
+from harmonikey_mmmity.profiles import Profile
+from harmonikey_mmmity.graphemes import split_graphemes
+from harmonikey_mmmity.rollups import Rollups, sparkline
+from harmonikey_mmmity.telemetry import EventSink
+from harmonikey_mmmity.tasks import Task, TaskCancelled
+from harmonikey_mmmity.race import RaceClient, PORT as RACE_PORT
+from harmonikey_mmmity.vocab import VocabFilter
 from typing import List, Tuple
 
 
@@ -15,6 +31,9 @@ class State(ABC):
     Abstract class, represents current state of program.
     Is inherited by classes Training, AfterTraining, MainMenu, BeforeTraining
     '''
+    TICK_INTERVAL = 0.05
+    # Default time in seconds between program ticks
+
     def __init__(self, program: Program):
         '''
         Contains program to which is bound.
@@ -33,6 +52,18 @@ class State(ABC):
         Handles pressed key.
         '''
 
+    def handle_keys(self, keys: List[Keystroke]):
+        '''
+        Handles several keys pressed since last tick, in order.
+        If state was switched by one of them, the rest
+        are redirected to the new state.
+        '''
+        for index, key in enumerate(keys):
+            if self.program.state is not self:
+                self.program.state.handle_keys(keys[index:])
+                return
+            self.handle_key(key)
+
     @abstractmethod
     def tick(self):
         '''
@@ -45,6 +76,13 @@ class State(ABC):
         '''
         self.program.state = state
 
+    def tick_timeout(self) -> float:
+        '''
+        Returns how long (in seconds) program may wait for a key
+        before calling tick() again.
+        '''
+        return self.TICK_INTERVAL
+
 
 class Exit(State):
     '''
@@ -58,7 +96,7 @@ class Exit(State):
         Clears everything before exiting.
         '''
         term = self.program.term
-        print(term.home + term.clear)
+        term.write(term.home + term.clear)
 
     def handle_key(self, key: Keystroke):
         pass
@@ -73,37 +111,99 @@ class Training(State):
     Attributes are:
         gamemode - gamemode of the training
         statistics - Statistics class for counting current stats
+        key_stats - KeyStatistics with per-character errors and latency
+        source - TextSource which created text generator
+        events - EventSink of program for telemetry
         text_overseer - TextOverseer for controlling typing
+        race - RaceClient if training is a race, otherwise None
+        vocab_filter - VocabFilter of vocabulary, or None
+    Training on resumable source (text file) can be paused with Escape,
+    its progress is then saved to program.checkpoints and can be resumed.
     '''
+    LIVE_WINDOWS = (5, 10)
+    # Windows (in seconds) of live wpm and cpm in timer line
+
+    CODE_LINES = 11
+    # Number of lines shown around cursor on multiline sources
+
+    TAB_WIDTH = 4
+    # Tabs in code are drawn as this many spaces
+
+    VISIBLE_WHITESPACE = {'\n': '⏎', '\t': '→'}
+    # How newlines and tabs are drawn outside of code
+
+    RACE_STANDINGS = 5
+    # Number of racers shown in race line
+
+    STATUS_ROW = 1
+    RACE_ROW = 0
+    # Rows of status bar (timer and live rates) and of race line
+
+    TIMER_DIGITS = 2
+    # Digits of timer after point. Status bar is redrawn only when
+    # its text changes, so with fewer digits it is redrawn
+    # and program wakes up less often
+
     def __init__(self, program: Program,
                  gamemode: Gamemode, train_filename: str, user: str,
-                 textgen_type: TextgenType, timeout: float):
+                 textgen_type: str | TextgenType, timeout: float,
+                 resume: Checkpoint = None, race: RaceClient = None,
+                 vocab_filter: VocabFilter = None):
         '''
         Initializes stats, overseer.
+        textgen_type is name of text source in registry,
+        built-in ones can also be given as TextgenType.
+        If resume is given, text file is read from saved position
+        and statistics continue saved ones.
+        If race is given, progress is reported to it, and seedable
+        sources use seed of the race, so all racers get the same text.
+        vocab_filter is used by filterable sources.
+        Raises TextSourceError if text source can not be loaded.
         '''
         super().__init__(program)
         self.__updated_since = False
         # Variable to redraw everything when necessary, not every tick
+        self.__status: str = None
+        self.__status_at: str = None
+        self.__status_width: int = 0
+        self.__timer_width: int = 0
+        self.__race_line: str = None
+        # Last drawn status bar and race line, cursor sequence
+        # of status bar, widths of its longest text and of timer
 
         self.timeout: float = timeout
         self.gamemode: Gamemode = gamemode
         self.user: str = user
-        if textgen_type == TextgenType.RANDOM:
-            self.statistics = Statistics(
-                user=self.user,
-                text_tag='RANDOM.' + train_filename,
-                mode=gamemode,
-                timeout=self.timeout,
-            )
-            textgen = RandomTextGenerator(train_filename, 4)
-        else:
-            self.statistics = Statistics(
-                user=self.user,
-                text_tag=train_filename,
-                mode=gamemode,
-                timeout=self.timeout
-            )
-            textgen = FileTextGenerator(train_filename)
+        self.key_stats: KeyStatistics = KeyStatistics()
+        self.events: EventSink = program.event_sink \
+            if program is not None else EventSink()
+        self.source: TextSource = get_registry().get(textgen_type)
+        self.textgen_type: str = self.source.name
+        self.race: RaceClient = race
+        self.vocab_filter: VocabFilter = vocab_filter
+        options = dict()
+        if race is not None and self.source.seedable:
+            options['seed'] = race.text.seed
+        if vocab_filter is not None and self.source.filterable:
+            options['vocab_filter'] = vocab_filter
+        # Sources get only options they declare, so plugins
+        # with plain create() keep working
+        textgen = self.source.create(train_filename, self.key_stats,
+                                     resume, **options)
+
+        self.statistics = Statistics(
+            user=self.user,
+            text_tag=self.source.text_tag(train_filename),
+            mode=gamemode,
+            timeout=self.timeout,
+            events=self.events,
+        )
+        if resume is not None:
+            self.statistics.resume(resume.word_count, resume.character_count,
+                                   resume.error_count, resume.elapsed)
+        self.events.emit('start', user=user, text_tag=self.statistics.text_tag,
+                         mode=gamemode.name, timeout=timeout,
+                         resumed=resume is not None)
 
         from harmonikey_mmmity.text_overseer import TextOverseer
         self.text_overseer = TextOverseer(textgen, self)
@@ -112,72 +212,254 @@ class Training(State):
         '''
         Is called when training was forcefully stopped
         due to making an error when gamemode is NO_ERRORS.
-        Does not save stats, just exits
+        Does not save stats, just exits, race is left.
         '''
         self.statistics.freeze()
-        self.switch(AfterTraining(self.program, self.statistics, True))
+        self.__emit_finish('early_finish')
+        if self.race is not None:
+            self.race.close()
+        # Eliminated racer leaves the race, it has not finished
+        self.switch(AfterTraining(self.program, self.statistics, True,
+                                  vocab_filter=self.vocab_filter))
+
+    def __finish_race(self):
+        '''
+        Sends final progress to race, if training is a race.
+        '''
+        if self.race is not None:
+            self.race.report(self.statistics.word_count,
+                             self.statistics.character_count)
+            self.race.finish()
+
+    def __emit_finish(self, event: str):
+        '''
+        Sends final statistics to events.
+        '''
+        if not self.events.enabled:
+            return
+        self.events.emit(event, word_count=self.statistics.word_count,
+                         character_count=self.statistics.character_count,
+                         error_count=self.statistics.error_count,
+                         elapsed=self.statistics.get_elapsed_s(),
+                         wpm=self.statistics.get_wpm())
 
     def __finish(self):
         '''
         Is called when training was stopped
         due to finishing text file or timer expiring.
-        Saves stats to stats file.
+        Saves stats to stats file in background task,
+        AfterTraining is shown right away and waits for it.
         '''
         self.statistics.freeze()
+        self.__emit_finish('finish')
+        self.__finish_race()
+        saving = Task(self.__save_results).start()
+        self.switch(AfterTraining(self.program, self.statistics, False,
+                                  saving, self.vocab_filter))
+
+    def __save_results(self, task: Task) -> bool:
+        '''
+        Saves stats to stats file, removes checkpoint and updates
+        profiles, sketches and rollups. Is run in background thread.
+        Returns True if result is a new personal best.
+        '''
         self.statistics.save_to_file('stats/stats.csv')
-        self.switch(AfterTraining(self.program, self.statistics, False))
+        if self.source.resumable:
+            self.program.checkpoints.remove(self.user,
+                                            self.statistics.text_tag)
+        new_best = self.program.profiles.add_result(self.statistics)
+        try:
+            self.program.sketches.update()
+            self.program.rollups.update()
+        except OSError:
+            pass
+        # Only rows appended since last update are read
+        return new_best
+
+    def __pause(self):
+        '''
+        Is called when Escape is pressed.
+        Training on resumable source is saved to checkpoint
+        and program returns to main menu.
+        Endless trainings on random words are just finished.
+        '''
+        if not self.source.resumable:
+            self.__finish()
+            return
+
+        self.statistics.freeze()
+        self.__emit_finish('pause')
+        if self.race is not None:
+            self.race.close()
+        # Paused racer leaves the race
+        word_index, offset = self.text_overseer.textgen.position()
+        self.program.checkpoints.put(Checkpoint(
+            user=self.user,
+            text_tag=self.statistics.text_tag,
+            word_index=word_index,
+            offset=offset,
+            word_count=self.statistics.word_count,
+            character_count=self.statistics.character_count,
+            error_count=self.statistics.error_count,
+            elapsed=self.statistics.frozen_timer - self.statistics.start_timer,
+        ))
+        self.switch(MainMenu(self.program))
 
     def handle_key(self, key: Keystroke):
         '''
         Redirects key to text_overseer.
         Catches all exceptions from it.
+        Keys pressed after time is up are not counted.
+        Escape pauses training.
         '''
+        self.handle_keys([key])
+
+    def handle_keys(self, keys: List[Keystroke]):
+        '''
+        Sends all keys up to Escape to text_overseer at once,
+        time is checked once per batch.
+        Keys left in batch after training is finished are dropped,
+        they were typed past the end of text, not for the next screen.
+        '''
+        if self.__check_time():
+            return
+        chars = keys
+        escape = False
+        for index, key in enumerate(keys):
+            if key.name == 'KEY_ESCAPE':
+                chars = keys[:index]
+                escape = True
+                break
         try:
-            self.text_overseer.handle_char(key)
+            self.text_overseer.handle_chars(chars)
             self.__updated_since = False
             # We try to redraw words only after user pressed a key
         except WrongCharacter:
             self.__early_finish()
+            return
         except EndOfFile:
             self.__finish()
+            return
+        if escape:
+            self.__pause()
 
     def visualize(self):
+        redrawn = False
         if not self.__updated_since:
             # We try not to revisualize everthing if not necessary
             self.__updated_since = True
-            self.__visualize_words()
+            redrawn = True
+            if self.source.multiline:
+                self.__visualize_code()
+            else:
+                self.__visualize_words()
         self.__visualize_timer()
-        # Although we need to redraw timer every tick so it is relevant
+        # Timer is checked every tick, but drawn only when it changes
+        if self.race is not None:
+            self.__visualize_race(redrawn)
 
-    def __visualize_timer(self):
+    def __visualize_race(self, force: bool = False):
         '''
-        Only resets timer in the left top corner.
+        Draws leading racers in RACE_ROW, only if standings
+        changed or force is True (screen was cleared).
+        '''
+        term = self.program.term
+        line = ''
+        for place, racer in enumerate(self.race.standings(), 1):
+            if place > self.RACE_STANDINGS:
+                break
+            entry = f'{place}. {racer.name} {racer.words} words'
+            if racer.finished:
+                entry += ' ✓'
+            if racer.id == self.race.racer_id:
+                entry = term.bold(entry)
+            line += entry + '   '
+        if line == self.__race_line and not force:
+            return
+        self.__race_line = line
+        term.write(term.move_xy(0, self.RACE_ROW) + line + term.clear_eol)
+
+    def __visualize_timer(self, force: bool = False):
+        '''
+        Draws status bar: timer and live rates in STATUS_ROW.
+        It is written only if its text changed since last time,
+        or if force is True (screen was cleared). Text is written
+        in place: from cursor sequence computed once, with fields
+        of fixed width, padded to the longest text drawn,
+        so the line does not need to be cleared.
         '''
         term = self.program.term
         # Terminal object that prints special characters
-        print(term.home)
+        if self.__status_at is None:
+            self.__status_at = term.move_xy(0, self.STATUS_ROW)
+            self.__timer_width = len(format(self.timeout,
+                                            f'.{self.TIMER_DIGITS}f'))
+            # Computed once, at first draw
 
-        elapsed_str = format(self.statistics.get_elapsed_s(), '.2f')
+        elapsed_str = format(self.statistics.get_elapsed_s(),
+                             f'{self.__timer_width}.{self.TIMER_DIGITS}f')
 
         if self.timeout != 0.0:
-            elapsed_str += ' / ' + format(self.timeout, '.2f')
+            elapsed_str += ' / ' + format(self.timeout,
+                                          f'.{self.TIMER_DIGITS}f')
+
+        live_str = ''
+        for window in self.LIVE_WINDOWS:
+            wpm, cpm = self.statistics.get_live_rates(window)
+            live_str += f'{window} s: {format(wpm, '3.0f')} wpm '
+            live_str += f'{format(cpm, '4.0f')} cpm   '
+        live_str += sparkline(self.statistics.get_live_history(), 0.0)
+        # Live rates use fixed number of buckets, so this costs
+        # the same at any moment of training
+
+        status = elapsed_str + ' s   ' + live_str
+        if status == self.__status and not force:
+            return
+        self.__status = status
+        padding = ' ' * max(0, self.__status_width - len(status))
+        self.__status_width = max(self.__status_width, len(status))
+        # Spaces overwrite the rest of longer previous text
 
-        print(term.white(elapsed_str) + ' s')
+        term.write(self.__status_at + term.white(elapsed_str) + ' s   ' +
+                   live_str + padding)
 
-    def __check_time(self):
+    def __check_time(self) -> bool:
         '''
         If time is up, finish training.
+        Returns True if training was finished.
+        Recorded time is clamped to deadline by Statistics.freeze().
         '''
-        if self.timeout != 0:
-            if self.statistics.get_elapsed_s() > self.timeout:
-                self.__finish()
+        if self.statistics.is_time_up():
+            self.__finish()
+            return True
+        return False
 
     def tick(self):
         '''
         Only asks timer if time is up.
+        Reports progress to race, it is sent at capped rate anyway.
         '''
+        if self.race is not None:
+            self.race.report(self.statistics.word_count,
+                             self.statistics.character_count)
         self.__check_time()
 
+    def tick_timeout(self) -> float:
+        '''
+        Wakes program up exactly at deadline if it comes before next tick.
+        If timer shows fewer digits, sleeps until its shown value
+        changes (but live rates are still updated every RollingRate
+        bucket), so idle training does not wake up for nothing.
+        Races are ticked every TICK_INTERVAL for fresh standings.
+        '''
+        timeout = self.TICK_INTERVAL
+        if self.race is None:
+            step = 10.0 ** -self.TIMER_DIGITS
+            until_step = step - self.statistics.get_elapsed_s() % step
+            bucket = RollingRate.BUCKET_NS / Statistics.NANOSECONDS_IN_SECOND
+            timeout = max(timeout, min(until_step, bucket))
+        return min(timeout, self.statistics.get_time_left_s())
+
     def __visualize_words(self):
         '''
         Visualizes training state.
@@ -185,33 +467,43 @@ class Training(State):
         term = self.program.term
         # Terminal object that prints special characters
 
-        print(term.home + term.clear)
+        term.write(term.home + term.clear)
         # Moves cursor clears
 
-        self.__visualize_timer()
-        print(term.white(str(self.statistics.word_count) + ' words'))
+        self.__visualize_timer(force=True)
+        term.write(term.white(str(self.statistics.word_count) + ' words'))
         # Prints elapsed time and number of words typed
 
-        words_before = self.text_overseer.textgen.words_before(2)
-        words_before_text = term.gold3(' '.join(words_before))
+        overseer = self.text_overseer
+        gap = self.__shown_whitespace(self.source.separator.value)
+        # Separator between words which are not typed now
+
+        words_before = overseer.textgen.words_before(2)
+        words_before_text = term.gold3(gap.join(words_before))
         # To display two words before the current one
         # Is slightly dimmer than current word's color
 
-        words_after = self.text_overseer.textgen.words_after(2)
-        words_after_text = term.mistyrose4(' '.join(words_after))
+        words_after = overseer.textgen.words_after(2)
+        words_after_text = term.mistyrose4(gap.join(words_after))
         # To display two words after the current one
         # Is slightly dimmer than current word's color
 
-        current_inputed = self.text_overseer.input
-        current_error = self.text_overseer.error
-        current_word = self.text_overseer.current_word
-        current_left = current_word[len(current_inputed) + len(current_error):]
+        separator = self.__shown_whitespace(overseer.separator)
+        current_inputed = separator[:overseer.separator_typed] + \
+            overseer.input
+        current_error = overseer.error
+        left_clusters = list(separator[overseer.separator_typed:]) + \
+            list(overseer.word.clusters[overseer.typed_clusters:])
+        left_clusters = left_clusters[len(split_graphemes(current_error)):]
+        # Separator is shown before current word
         # We want to display error characters atop untyped ones
+        # Characters are grapheme clusters, not code points
 
         next_char = ''
-        if current_error == '':
-            next_char = current_left[0]
-            current_left = current_left[1:]
+        if current_error == '' and len(left_clusters) > 0:
+            next_char = left_clusters[0]
+            left_clusters = left_clusters[1:]
+        current_left = ''.join(left_clusters)
         # If there is no error, we want to highlight current character
 
         word_center_text = \
@@ -226,12 +518,79 @@ class Training(State):
         # print(type(term.width))
         center_position = term.width // 2
         start_position = max(0, center_position -
-                             len(self.text_overseer.current_word) // 2 -
+                             (len(separator) + overseer.word.width) // 2 -
                              term.length(words_before_text))
         # We want current word to be at the very center
+        # Its display width is precomputed, wide characters take two cells
+
+        output = words_before_text + word_center_text + gap + words_after_text
+        term.write(term.move_xy(start_position, term.height // 2) + output)
+
+    def __shown_whitespace(self, text: str) -> str:
+        '''
+        Returns text with newlines and tabs replaced
+        by visible characters.
+        '''
+        for char, shown in self.VISIBLE_WHITESPACE.items():
+            text = text.replace(char, shown)
+        return text
 
-        output = words_before_text + word_center_text + ' ' + words_after_text
-        print(term.move_xy(start_position, term.height // 2) + output)
+    def __visualize_code(self):
+        '''
+        Visualizes training on multiline source: CODE_LINES lines
+        of text around cursor, with the line of cursor at the center.
+        Only visible lines are drawn, so it costs the same
+        at any position in file.
+        '''
+        term = self.program.term
+        textgen = self.text_overseer.textgen
+
+        term.write(term.home + term.clear)
+        self.__visualize_timer(force=True)
+        term.write(term.white(str(self.statistics.word_count) + ' words'))
+
+        overseer = self.text_overseer
+        cursor = textgen.current_end() - len(overseer.current_word)
+        if overseer.separator_typed < len(overseer.separator):
+            cursor -= len(overseer.separator) - overseer.separator_typed
+        else:
+            cursor += len(overseer.input)
+        # Current word ends at current_end() in text,
+        # cursor is either in separator before it or inside it
+        error = self.__shown_whitespace(overseer.error)
+
+        cursor_line = textgen.line_of(cursor)
+        first_line = max(0, cursor_line - self.CODE_LINES // 2)
+        last_line = min(len(textgen.line_starts),
+                        first_line + self.CODE_LINES)
+        top = term.height // 2 - (cursor_line - first_line)
+        tab = ' ' * self.TAB_WIDTH
+
+        for line in range(first_line, last_line):
+            start, end = textgen.line_bounds(line)
+            typed_end = min(max(cursor, start), end)
+            output = term.mistyrose4(f'{line + 1:>4} ')
+            output += term.gold(textgen.data[start:typed_end]
+                                .replace('\t', tab))
+            # Already typed characters are gold
+
+            if line == cursor_line:
+                output += term.tomato2(error)
+                # Wrong characters are red, they are inserted at cursor
+                next_char = textgen.data[cursor] \
+                    if cursor < end else ' '
+                # Newline at the end of line is shown as highlighted space
+                if error == '':
+                    output += term.mistyrose3_on_white(
+                        next_char.replace('\t', tab)
+                    )
+                    typed_end = min(cursor + 1, end)
+                # If there is no error, we want to highlight current character
+
+            output += term.mistyrose3(textgen.data[typed_end:end]
+                                      .replace('\t', tab))
+            # Untyped characters are gray
+            term.write(term.move_xy(0, top + line - first_line) + output)
 
 
 class AfterTraining(State):
@@ -242,23 +601,36 @@ class AfterTraining(State):
     Also has statistics from training
     and boolean 'is_early', which is True if training
     ended prematurely (due to error if mode was DIE_ERRORS).
+    'saving' is Task which saves results in background,
+    personal best and percentiles are shown when it is done.
+    'new_best' is True if result is user's new personal best
+    on this text, otherwise previous best is shown.
+    'vocab_filter' of training is used again on restart.
     '''
     def __main_menu(self):
         '''
         Is called when 'Main menu' button is pressed.
         '''
+        self.__wait_saving()
         self.switch(MainMenu(self.program))
 
+    def __wait_saving(self):
+        '''
+        Waits until results are saved, so next state
+        does not use stores while they are written.
+        '''
+        if self.saving is not None:
+            self.saving.wait()
+            self.tick()
+
     def __restart(self):
         '''
         Is called when 'Restart' button is pressed.
         Restarts training with same parameters.
         '''
-        textgen_type = TextgenType.FILE
-        filename = self.stats.text_tag
-        if self.stats.text_tag.startswith('RANDOM'):
-            textgen_type = TextgenType.RANDOM
-            filename = self.stats.text_tag[self.stats.text_tag.find('.') + 1:]
+        self.__wait_saving()
+        textgen_type, filename = \
+            get_registry().parse_text_tag(self.stats.text_tag)
 
         new_training = Training(
             program=self.program,
@@ -266,18 +638,24 @@ class AfterTraining(State):
             user=self.stats.user,
             train_filename=filename,
             textgen_type=textgen_type,
-            timeout=self.stats.timeout
+            timeout=self.stats.timeout,
+            vocab_filter=self.vocab_filter
         )
 
         self.switch(new_training)
 
-    def __init__(self, program: Program, stats: Statistics, is_early: bool):
+    def __init__(self, program: Program, stats: Statistics, is_early: bool,
+                 saving: Task = None, vocab_filter: VocabFilter = None):
         '''
         Initializes all parameters
         '''
         super().__init__(program)
         self.stats: Statistics = stats
         self.is_early: bool = is_early
+        self.saving: Task = saving
+        self.vocab_filter: VocabFilter = vocab_filter
+        self.new_best: bool = False
+        self.save_error: str = ''
         self.widgets: List[Widget] = [
             Button(self.__restart, 'Restart'),
             Button(self.__main_menu, 'Main menu')
@@ -326,6 +704,22 @@ class AfterTraining(State):
             elapsed = term.bold(format(self.stats.get_elapsed_s(), '.2f'))
             text_to_print += term.center(elapsed + ' seconds')
 
+            if self.save_error != '':
+                text_to_print += '\n' + term.center(
+                    term.red(term.bold(self.save_error))
+                )
+            elif self.saving is not None:
+                text_to_print += '\n' + term.center('Saving results...')
+            elif not self.is_early:
+                text_to_print += '\n' + self.__best_text()
+                text_to_print += '\n' + self.__distribution_text()
+
+            if self.stats.is_time_up():
+                overshoot = format(self.stats.get_overshoot_ms(), '.2f')
+                text_to_print += '\n' + term.center(
+                    f'Timer stopped {overshoot} ms after time limit'
+                )
+
             widgets_str = ''
             if self.active_widget == 0:
                 widgets_str += term.ljust(self.widgets[0].visualize_str(True))
@@ -334,10 +728,50 @@ class AfterTraining(State):
                 widgets_str += term.ljust(self.widgets[0].visualize_str(False))
                 widgets_str += term.rjust(self.widgets[1].visualize_str(True))
 
-            print(term.clear + term.move_y(term.height // 2 - y_offset))
-            print(text_to_print)
-            print(term.move_y(term.height - 2))
-            print(widgets_str)
+            term.write(term.clear + term.move_y(term.height // 2 - y_offset))
+            term.write(text_to_print)
+            term.write(term.move_y(term.height - 2))
+            term.write(widgets_str)
+
+    def __best_text(self) -> str:
+        '''
+        Returns centered line about personal best.
+        Best is taken from cached profiles, not from stats file.
+        '''
+        term = self.program.term
+        if self.new_best:
+            return term.center(term.bold(term.gold('New personal best!')))
+        best = self.program.profiles.best(self.stats.user,
+                                          self.stats.text_tag)
+        if best is None:
+            return ''
+        return term.center('Personal best: ' +
+                           term.bold(format(best.wpm, '.2f')) + ' wpm')
+
+    def __distribution_text(self) -> str:
+        '''
+        Returns centered lines with percentile of this run among
+        user's runs on this text, and wpm and error rate quantiles
+        of all users on it. Quantiles come from sketches.
+        '''
+        term = self.program.term
+        out = ''
+        user = self.program.sketches.get(self.stats.user,
+                                         self.stats.text_tag)
+        if user is not None:
+            percentile = 100 * user.wpm.rank(self.stats.get_wpm())
+            out += term.center('Percentile among your runs: ' +
+                               term.bold(format(percentile, '.0f')))
+        everyone = self.program.sketches.merged(self.stats.text_tag)
+        if everyone is not None:
+            line = 'All runs: p50 '
+            line += term.bold(format(everyone.wpm.quantile(0.5), '.2f'))
+            line += ' wpm, p90 '
+            line += term.bold(format(everyone.wpm.quantile(0.9), '.2f'))
+            line += ' wpm, median error rate '
+            line += term.bold(format(everyone.error_rate.quantile(0.5), '.1%'))
+            out += '\n' + term.center(line)
+        return out
 
     def handle_key(self, key: Keystroke):
         '''
@@ -358,50 +792,309 @@ class AfterTraining(State):
         self.__updated_since = False
 
     def tick(self):
-        pass
+        '''
+        Shows personal best and percentiles when results are saved.
+        '''
+        if self.saving is None or not self.saving.done:
+            return
+        try:
+            self.new_best = self.saving.result()
+        except OSError:
+            self.save_error = 'Could not save results'
+        self.saving = None
+        self.__updated_since = False
+
+
+class RaceLobby(State):
+    '''
+    State where racer waits for race to start.
+    Shows text of the race, joined racers and countdown.
+    When countdown ends, switches to Training on text of the race
+    with gamemode and timeout chosen in BeforeTraining.
+    Escape leaves the race.
+    '''
+    def __init__(self, program: Program, race: RaceClient,
+                 gamemode: Gamemode, timeout: float):
+        super().__init__(program)
+        self.race: RaceClient = race
+        self.gamemode: Gamemode = gamemode
+        self.timeout: float = timeout
+        self.error: str = ''
+        self.__shown: Tuple = None
+        # What was drawn last time, screen is redrawn only if it changes
+
+    def visualize(self):
+        '''
+        Prints racers and countdown in center of screen.
+        '''
+        names = tuple(racer.name for racer in self.race.standings())
+        left = self.race.seconds_to_start()
+        countdown = None if left is None else math.ceil(left)
+        shown = (names, countdown, self.error)
+        if shown == self.__shown:
+            return
+        self.__shown = shown
+
+        term = self.program.term
+        lines = [
+            'Race on ' + term.bold(self.race.text.filename),
+            'Racers: ' + ', '.join(names),
+        ]
+        if self.error != '':
+            lines.append(term.bold(term.red(self.error)))
+        elif countdown is None:
+            lines.append('Waiting for racers...')
+        else:
+            lines.append('Start in ' + term.bold(str(countdown)))
+        lines.append('Escape to leave')
+
+        term.write(term.clear + term.move_y(term.height // 2 - len(lines)))
+        for line in lines:
+            term.write(term.center(line))
+
+    def handle_key(self, key: Keystroke):
+        '''
+        Escape leaves race and returns to main menu.
+        '''
+        if key.name == 'KEY_ESCAPE':
+            self.race.close()
+            self.switch(MainMenu(self.program))
+
+    def tick(self):
+        '''
+        Starts training when countdown ends.
+        '''
+        if self.error != '':
+            return
+        left = self.race.seconds_to_start()
+        if left is None or left > 0:
+            if self.race.closed:
+                self.error = 'Race server closed connection'
+            return
+
+        filename = self.race.text.filename
+        try:
+            training = Training(
+                program=self.program,
+                gamemode=self.gamemode,
+                train_filename=filename,
+                user=self.race.name,
+                textgen_type=self.race.text.text_type,
+                timeout=self.timeout,
+                race=self.race,
+            )
+        except (FileNotFoundError, IsADirectoryError):
+            self.error = f'File {filename} not found'
+        except EndOfFile:
+            self.error = f'File {filename} has no words'
+        except TextSourceError as error:
+            self.error = str(error)
+        if self.error != '':
+            self.race.close()
+            return
+        self.switch(training)
+
+    def tick_timeout(self) -> float:
+        '''
+        Wakes program up exactly at start.
+        '''
+        left = self.race.seconds_to_start()
+        if left is None:
+            return self.TICK_INTERVAL
+        return min(self.TICK_INTERVAL, left)
 
 
 class BeforeTraining(State):
     '''
     State where training configuration is carried out
     Has two textInputs for player name and text file path
-    Has two switches for choosing Gamemode and TextgenType
-    Has two buttons: begin training and return to main menu
+    Has two switches for choosing Gamemode and text source,
+    the latter lists all sources in registry, including plugins
+    Has input for race server: if it is filled, Begin joins the race
+    there instead, and the server chooses the text
+    Has input for word filter of vocabularies, see VocabFilter.parse()
+    Has three buttons: begin training, continue saved training
+    and return to main menu
     Widgets are composed in grid, can be navigated left-right and top-bottom.
+    Below the widgets shows files from program.library which fuzzy match
+    text file input, Tab picks them one by one, with speed factors
+    from program.analyzer, which is refreshed in background.
     '''
     MAX_SWITCH_WIDTH = 25
     # Is used for rjusting switches in visualize()
 
-    def __begin_training(self):
+    MAX_SUGGESTIONS = 5
+    # Number of library files shown below text file input
+
+    def __source(self) -> TextSource:
+        '''
+        Returns selected text source, plugin is loaded on first selection.
+        Raises TextSourceError if it can not be loaded.
+        '''
+        return get_registry().get(self.textgentype_switch.get_current_option())
+
+    def __directory(self) -> str:
+        '''
+        Returns assets directory for selected text source,
+        or empty string if it can not be loaded.
+        Source is only looked up when selection changes.
+        '''
+        option = self.textgentype_switch.get_current_option()
+        if self.__directory_of[0] != option:
+            try:
+                directory = self.__source().directory
+            except TextSourceError:
+                directory = ''
+            self.__directory_of = (option, directory)
+        return self.__directory_of[1]
+
+    def __begin_training(self, resume_progress: bool = False):
         '''
         Switches program to new training with inputted parameters.
+        Files missing in library are reported without opening them,
+        library is refreshed once before that in case file is new.
+        Files of plugins outside library directories are not checked.
+        If resume_progress is True, continues saved training on text file.
         '''
-        match self.textgentype_switch.get_current_option():
-            case TextgenType.FILE:
-                filename = 'assets/texts/' + self.text_filepath.input
-            case TextgenType.RANDOM:
-                filename = 'assets/vocabs/' + self.text_filepath.input
-            case _:
-                raise TypeError("Unknown TextgenType")
+        if self.race_server.input != '' and not resume_progress:
+            self.__join_race()
+            return
+
+        try:
+            source = self.__source()
+        except TextSourceError as error:
+            self.prev_error = str(error)
+            return
+
+        filename = source.directory + '/' + self.text_filepath.input
+        if self.program.library.directory_of(filename) != '' and \
+           self.program.library.get(filename) is None:
+            self.program.library.refresh()
+            if self.program.library.get(filename) is None:
+                self.prev_error = f'File {filename} not found'
+                return
+
+        vocab_filter = None
+        if self.word_filter.input.strip() != '':
+            try:
+                vocab_filter = VocabFilter.parse(self.word_filter.input)
+            except ValueError as error:
+                self.prev_error = str(error)
+                return
+
+        checkpoint = None
+        if resume_progress:
+            if not source.resumable:
+                self.prev_error = 'Only text files can be continued'
+                return
+            checkpoint = self.program.checkpoints.get(
+                self.player_name.input, source.text_tag(filename)
+            )
+            # Is saved under text_tag, which has prefix for plugins
+            if checkpoint is None:
+                self.prev_error = f'No saved progress on {filename}'
+                return
+
         try:
             training = Training(
                 program=self.program,
                 gamemode=self.gamemode_switch.get_current_option(),
                 user=self.player_name.input,
                 train_filename=filename,
-                textgen_type=self.textgentype_switch.get_current_option(),
+                textgen_type=source.name,
                 timeout=self.timeout.int_input(),
+                resume=checkpoint,
+                vocab_filter=vocab_filter,
             )
         except (FileNotFoundError, IsADirectoryError):
             self.prev_error = f'File {filename} not found'
             return
+        except EndOfFile:
+            self.prev_error = f'File {filename} has no more words'
+            return
+        except EmptyVocabulary:
+            self.prev_error = f'No words in {filename} match filter'
+            return
 
+        self.program.profiles.update_settings(
+            user=self.player_name.input,
+            text_type=source.name,
+            last_text=self.text_filepath.input,
+            gamemode=self.gamemode_switch.get_current_option().name,
+            timeout=self.timeout.int_input(),
+            vocab_filter=self.word_filter.input,
+        )
         self.switch(training)
 
+    def __join_race(self):
+        '''
+        Starts connecting to race server from input in background,
+        tick() switches to RaceLobby when server answers.
+        Address is host:port, default port is used if it is missing.
+        '''
+        if self.joining is not None:
+            return
+        host, _, port = self.race_server.input.partition(':')
+        if port == '':
+            port = str(RACE_PORT)
+        if not port.isdigit():
+            self.prev_error = 'Race server should be host:port'
+            return
+
+        self.prev_error = ''
+        race = RaceClient(host, int(port), self.player_name.input)
+        self.joining = Task(self.__connect, race).start()
+        # Unreachable server would block keys for CONNECT_TIMEOUT
+
+    def __connect(self, task: Task, race: RaceClient) -> RaceClient:
+        '''
+        Is run in background thread.
+        Race joined after user left the screen is left at once.
+        '''
+        race.connect()
+        if task.cancelled:
+            race.close()
+            raise TaskCancelled()
+        return race
+
+    def __poll_joining(self):
+        '''
+        Switches to RaceLobby when connection to race server
+        is established, shows error if it failed.
+        '''
+        if self.joining is None or not self.joining.done:
+            return
+        joining = self.joining
+        self.joining = None
+        self.__updated_since = False
+        try:
+            race = joining.result()
+        except RaceError as error:
+            self.prev_error = str(error)
+            return
+        self.switch(RaceLobby(self.program, race,
+                              self.gamemode_switch.get_current_option(),
+                              self.timeout.int_input()))
+
+    def __cancel_joining(self):
+        '''
+        Stops joining race, if it is being joined.
+        '''
+        if self.joining is not None:
+            self.joining.cancel()
+            self.joining = None
+
+    def __continue_training(self):
+        '''
+        Continues training from saved checkpoint.
+        '''
+        self.__begin_training(True)
+
     def __main_menu(self):
         '''
         Returns to main menu
         '''
+        self.__cancel_joining()
         self.switch(MainMenu(self.program))
 
     def __init__(self, program: Program):
@@ -422,38 +1115,167 @@ class BeforeTraining(State):
         timeout_title = 'Input timeout (seconds, leave 0 for no timeout):'
         self.timeout = NumberInput(50, timeout_title, '0')
 
+        race_server_title = 'Race server (host:port, blank for solo):'
+        self.race_server = TextInput(50, race_server_title)
+
+        word_filter_title = 'Word filter (e. g. len=5-8 chars=home diff=0-0.3):'
+        self.word_filter = TextInput(50, word_filter_title)
+
         gamemode_switch_title = 'Choose gamemode(z/x):'
         self.gamemode_switch = Switch(Gamemode, gamemode_switch_title)
 
         textgentype_switch_title = 'Choose text type(z/x):'
-        self.textgentype_switch = Switch(TextgenType, textgentype_switch_title)
+        self.textgentype_switch = Switch(get_registry().names(),
+                                         textgentype_switch_title)
+        self.__directory_of: Tuple[str, str] = (None, '')
+        # (selected source, its directory), see __directory()
 
         begin_button_title = 'Begin'
         self.begin_button = Button(self.__begin_training, begin_button_title)
 
+        continue_button_title = 'Continue'
+        self.continue_button = Button(self.__continue_training,
+                                      continue_button_title)
+
         return_button_title = 'Main menu'
         self.return_button = Button(self.__main_menu, return_button_title)
 
         self.prev_error: str = ''
         # A property for displaying errors if occured.
+        self.joining: Task = None
+        # Connection to race server, see __join_race()
 
         self.grid: List[List[Widget]] = [
             [self.player_name, self.gamemode_switch],
             [self.text_filepath, self.textgentype_switch],
-            [self.timeout],
-            [self.begin_button, self.return_button],
+            [self.timeout, self.race_server],
+            [self.word_filter],
+            [self.begin_button, self.continue_button, self.return_button],
         ]
         self.active_widget_x: int = 0
         self.active_widget_y: int = 0
 
+        self.__prefill(self.program.profiles.last_profile())
+
+        self.program.library.refresh()
+        # Files are scanned once per screen, not on every key
+        self.analyzing: Task = Task(self.__analyze).start()
+        # Changed files are analyzed in background, suggestions
+        # are redrawn with their speed factors when it is done
+        self.suggestions: List[LibraryItem] = []
+        self.__suggestions_for: Tuple[str, str] = ('', '')
+        # (directory, query) for which suggestions were found
+        self.__query: str = self.text_filepath.input
+        # What user typed, Tab replaces input but not query
+        self.__suggestion_index: int = -1
+        self.__file_missing: bool = False
+        self.__update_suggestions()
+
         self.__updated_since: bool = False
 
+    def __analyze(self, task: Task) -> int:
+        '''
+        Is run in background thread.
+        '''
+        return self.program.analyzer.refresh(self.program.library)
+
+    def __poll_analyzing(self):
+        '''
+        Redraws suggestions when analysis is done.
+        Analysis is only a hint, so its errors are ignored,
+        whatever they are.
+        '''
+        if self.analyzing is None or not self.analyzing.done:
+            return
+        try:
+            self.analyzing.result()
+        except Exception:
+            pass
+        self.analyzing = None
+        self.__updated_since = False
+
+    def __prefill(self, profile: Profile):
+        '''
+        Fills inputs with settings of the last training, if there was one.
+        '''
+        if profile is None:
+            return
+        self.player_name.input = profile.user
+        if profile.last_text != '':
+            self.text_filepath.input = profile.last_text
+        if profile.gamemode in Gamemode.__members__:
+            self.gamemode_switch.select(Gamemode[profile.gamemode])
+        self.textgentype_switch.select(profile.text_type)
+        if profile.timeout != 0:
+            self.timeout.input = str(int(profile.timeout))
+        self.word_filter.input = profile.vocab_filter
+
     def active_widget(self) -> Tuple[int, int]:
         '''
         Returns active widget coordinates in grid.
         '''
         return (self.active_widget_x, self.active_widget_y)
 
+    def __update_suggestions(self):
+        '''
+        Checks if inputted file is in library.
+        Searches library if query or directory changed since last search.
+        '''
+        filename = self.__directory() + '/' + self.text_filepath.input
+        self.__file_missing = self.program.library.get(filename) is None
+        if not self.__file_missing:
+            get_registry().prefetch(
+                self.textgentype_switch.get_current_option(), filename
+            )
+            # Text files are read in background while user is choosing
+
+        key = (self.__directory(), self.__query)
+        if key == self.__suggestions_for:
+            return
+        self.__suggestions_for = key
+        self.suggestions = list(self.program.library.search(
+            key[0], key[1], self.MAX_SUGGESTIONS
+        ))
+        self.__suggestion_index = -1
+        self.__updated_since = False
+
+    def __pick_suggestion(self):
+        '''
+        Replaces text file input with next suggestion.
+        '''
+        if len(self.suggestions) == 0:
+            return
+        self.__suggestion_index += 1
+        self.__suggestion_index %= len(self.suggestions)
+        self.text_filepath.input = \
+            self.suggestions[self.__suggestion_index].name
+
+    def __suggestions_text(self) -> str:
+        '''
+        Returns suggestions, one per row, picked one is highlighted.
+        If input does not match any file, says so.
+        '''
+        term = self.program.term
+        rows = []
+        if self.__file_missing:
+            rows.append(term.red('No such file, Tab to pick:'))
+        else:
+            rows.append('Tab to pick:')
+
+        for index, item in enumerate(self.suggestions):
+            factor = self.program.analyzer.speed_factor(item.path)
+            row = f'{item.name} ({item.word_count} words, ' + \
+                  f'difficulty {format(item.difficulty, '.2f')}, ' + \
+                  f'wpm x{format(factor, '.2f')})'
+            if index == self.__suggestion_index:
+                row = term.on_cyan3(row)
+            rows.append('  ' + row)
+
+        text = ''
+        for row in rows:
+            text += term.ljust(row) + '\n'
+        return text
+
     def visualize(self):
         '''
         Prints all widgets except buttons in center left and center right.
@@ -495,32 +1317,58 @@ class BeforeTraining(State):
                 self.active_widget() == (0, 2)
             )
             text_to_print += term.ljust(timeout)
+
+            race_server = self.race_server.visualize_str(
+                self.active_widget() == (1, 2)
+            )
+            text_to_print += term.rjust(race_server)
             text_to_print += '\n'
 
+            word_filter = self.word_filter.visualize_str(
+                self.active_widget() == (0, 3)
+            )
+            text_to_print += term.ljust(word_filter)
+            text_to_print += '\n\n'
+
+            text_to_print += self.__suggestions_text()
+
             text_to_print += term.move_xy(0, term.height - 3)
 
-            error_vis = term.bold(term.red(self.prev_error))
+            if self.joining is not None:
+                error_vis = 'Connecting to race server...'
+            else:
+                error_vis = term.bold(term.red(self.prev_error))
             text_to_print += term.center(error_vis)
             text_to_print += '\n'
 
+            button_width = term.width // 3
             begin_button = self.begin_button.visualize_str(
-                self.active_widget() == (0, 3)
+                self.active_widget() == (0, 4)
+            )
+            text_to_print += term.ljust(begin_button, button_width)
+
+            continue_button = self.continue_button.visualize_str(
+                self.active_widget() == (1, 4)
             )
-            text_to_print += term.ljust(begin_button)
+            text_to_print += term.center(continue_button,
+                                         term.width - 2 * button_width)
 
             return_button = self.return_button.visualize_str(
-                self.active_widget() == (1, 3)
+                self.active_widget() == (2, 4)
             )
-            text_to_print += term.rjust(return_button)
+            text_to_print += term.rjust(return_button, button_width)
 
-            print(term.clear + text_to_print)
+            term.write(term.clear + text_to_print)
 
     def handle_key(self, key: Keystroke):
         '''
         If navigational key is pressed, changes active widget.
+        If Tab is pressed on text file input, picks next suggestion.
         Otherwise passes key to active widget.
         '''
         match key.name:
+            case 'KEY_TAB' if self.active_widget() == (0, 1):
+                self.__pick_suggestion()
             case 'KEY_LEFT':
                 self.active_widget_x -= 1
                 self.active_widget_x += len(self.grid[self.active_widget_y])
@@ -538,19 +1386,21 @@ class BeforeTraining(State):
             case _:
                 widget = self.grid[self.active_widget_y][self.active_widget_x]
                 widget.handle_key(key)
+                if widget is self.text_filepath:
+                    self.__query = self.text_filepath.input
 
         self.__updated_since = False
+        self.__update_suggestions()
 
     def tick(self):
         '''
         Just some cosmetic feature for less typing for user.
         Also we strictly forbid using paths other than assets/texts|vocabs.
         '''
-        match self.textgentype_switch.get_current_option():
-            case TextgenType.FILE:
-                self.text_filepath.title = 'Input text file:assets/texts/'
-            case TextgenType.RANDOM:
-                self.text_filepath.title = 'Input text file:assets/vocabs/'
+        self.text_filepath.title = 'Input text file:' + \
+            self.__directory() + '/'
+        self.__poll_analyzing()
+        self.__poll_joining()
 
 
 class MainMenu(State):
@@ -610,17 +1460,17 @@ class MainMenu(State):
             self.__updated_since = True
 
             term = self.program.term
-            print(term.clear + term.move_y(2))
+            term.write(term.clear + term.move_y(2))
 
-            print('\n'.join(list(map(term.center, self.greeting_rows))))
+            term.write('\n'.join(list(map(term.center, self.greeting_rows))))
 
-            print(term.move_y(term.height - 2))
+            term.write(term.move_y(term.height - 2))
 
             btns_vis = []
             for idx, btn in enumerate(self.buttons):
                 btns_vis.append(btn.visualize_str(idx == self.active_button))
 
-            print(term.center('  '.join(btns_vis)))
+            term.write(term.center('  '.join(btns_vis)))
 
     def handle_key(self, key: Keystroke):
         '''
@@ -647,70 +1497,222 @@ class StatsScreen(State):
     '''
     Screen for displaying locally saved statistics.
     Has three TextInputs: Stats file, Username, Training text file.
-    One switch for TextgenType.
+    One switch for text source.
     Also a button to load statistics that match given input.
     And a button to return to menu.
     Right beneath all those inputs it displays all matching stats
-    sorted by decreasing wpm.
+    sorted by decreasing wpm in a ScrollList, which can be scrolled
+    with PgUp/PgDown/Home/End. Every entry also has wpm normalized
+    by speed factor of its text from program.analyzer.
     '''
+    GRID_TOP = 1
+    # Row where widget grid starts
+
+    RESULTS_MARGIN = 2
+    # Number of empty rows between widget grid and results
+
+    PROGRESS_WEEKS = 20
+    # Number of last weeks in progress line
+
+    MERGE_INTERVAL = 0.5
+    # Seconds between sorted snapshots of results while loading,
+    # every merge copies the whole list
     def __main_menu(self):
         '''
         Returns to main menu.
         '''
+        self.__cancel_loading()
         self.switch(MainMenu(self.program))
 
     def __display_stats(self):
         '''
-        Reloads stats_rows using parameters from inputs.
+        Starts loading stats which match parameters from inputs
+        in background task, previous loading is cancelled.
+        Entries are shown by tick() as they arrive.
         '''
+        self.__cancel_loading()
         self.error_message = ''
-        self.entries.clear()
-        try:
-            fs = FileStatistics()
-            fs.add_file('stats/' + self.stats_file.input)
-        except (FileNotFoundError, IsADirectoryError):
-            self.error_message = f'File stats/{self.stats_file.input} \
-                not found'
-            return
-        except TypeError:
-            self.error_message = 'Wrong file format'
-            return
+        self.progress = ''
+        self.entries = []
+        self.results.set_items(self.entries)
 
         username = self.username.input
         text_tag = self.training_file.input
         if text_tag != '':
-            match self.textgen_type.get_current_option():
-                case TextgenType.RANDOM:
-                    text_tag = 'RANDOM.assets/vocabs/' + text_tag
-                case TextgenType.FILE:
-                    text_tag = 'assets/texts/' + text_tag
-
-        if username != '':
-            if username not in fs.by_user.keys():
-                self.error_message = 'No entries for such user'
+            try:
+                source = get_registry().get(
+                    self.textgen_type.get_current_option()
+                )
+            except TextSourceError as error:
+                self.error_message = str(error)
                 return
-            entries = fs.by_user[username]
-
-        else:
-            entries = fs.entries
-
-        if text_tag != '':
-            entries = list(filter(
-                lambda entry: entry.text_tag == text_tag,
-                entries
-            ))
+            text_tag = source.text_tag(source.directory + '/' + text_tag)
+
+        self.__loading_file = self.stats_file.input
+        self.loading = Task(self.__load_stats,
+                            'stats/' + self.stats_file.input,
+                            username, text_tag).start()
+
+    def __directory(self) -> str:
+        '''
+        Returns assets directory for selected text source,
+        or empty string if it can not be loaded.
+        Source is only looked up when selection changes.
+        '''
+        option = self.textgen_type.get_current_option()
+        if self.__directory_of[0] != option:
+            try:
+                directory = get_registry().get(option).directory
+            except TextSourceError:
+                directory = ''
+            self.__directory_of = (option, directory)
+        return self.__directory_of[1]
+
+    def __cancel_loading(self):
+        if self.loading is not None:
+            self.loading.cancel()
+            self.loading = None
+
+    def __load_stats(self, task: Task, stats_path: str, username: str,
+                     text_tag: str) -> Tuple[bool, List]:
+        '''
+        Is run in background thread.
+        Reads stats file chunk by chunk and merges matching entries
+        into list sorted by decreasing wpm. Every MERGE_INTERVAL and
+        at the end puts new sorted list into task, so UI thread
+        only replaces its list. Returns whether username has any entries
+        and weekly rollups of user for progress line.
+        Rollups of stats/stats.csv are kept by program,
+        others are loaded from their own files.
+        '''
+        total = os.path.getsize(stats_path)
+        user_found = username == ''
+        entries = []
+        keys = array('d')
+        # Negated wpm of entries
+        pending = []
+        merged_at = 0.0
+        for chunk, position in FileStatistics.iter_chunks(stats_path):
+            task.check_cancelled()
+            if username != '':
+                chunk = [entry for entry in chunk if entry.user == username]
+                user_found = user_found or len(chunk) > 0
+            if text_tag != '':
+                chunk = [entry for entry in chunk
+                         if entry.text_tag == text_tag]
+            pending += chunk
+            if len(pending) > 0 and \
+               time.monotonic() - merged_at >= self.MERGE_INTERVAL:
+                entries, keys = self.merge_sorted(entries, keys, pending)
+                task.put(entries)
+                pending = []
+                merged_at = time.monotonic()
+            task.set_progress(position, total)
+        if len(pending) > 0:
+            entries, keys = self.merge_sorted(entries, keys, pending)
+            task.put(entries)
+
+        series = []
+        if username != '':
+            rollups = self.program.rollups
+            if stats_path != rollups.stats_path:
+                rollups = Rollups(stats_path)
+            try:
+                rollups.update()
+                series = rollups.series(username, text_tag, 'week')
+            except OSError:
+                pass
+        return user_found, series
+
+    def __poll_loading(self):
+        '''
+        Adds entries loaded since last tick, keeping them sorted
+        by decreasing wpm, and shows result when loading is done.
+        '''
+        if self.loading is None:
+            return
+        done = self.loading.done
+        # Is checked before taking entries, so none are lost
+        snapshots = self.loading.take()
+        if len(snapshots) > 0:
+            self.entries = snapshots[-1]
+            # Every snapshot contains all entries loaded before it
+            self.results.set_items(self.entries, keep_offset=True)
+            self.__updated_since = False
 
-        if len(entries) == 0:
-            self.error_message = 'No entries for such user and text'
+        percent = int(100 * self.loading.progress)
+        if percent != self.__loading_percent:
+            self.__loading_percent = percent
+            self.__updated_since = False
+        if not done:
             return
 
+        loading = self.loading
+        self.loading = None
+        self.__updated_since = False
         try:
-            entries.sort(key=lambda entry: -(entry.word_count / entry.time))
-        except ZeroDivisionError:
+            user_found, series = loading.result()
+        except (FileNotFoundError, IsADirectoryError):
+            self.error_message = f'File stats/{self.__loading_file} \
+                not found'
+        except TypeError:
             self.error_message = 'Wrong file format'
+        except TaskCancelled:
+            pass
+        else:
+            if not user_found:
+                self.error_message = 'No entries for such user'
+            elif len(self.entries) == 0:
+                self.error_message = 'No entries for such user and text'
+            else:
+                self.__update_progress(series)
+        if self.error_message != '':
+            self.entries = []
+            self.results.set_items(self.entries)
+
+    @staticmethod
+    def merge_sorted(entries: List, keys: array,
+                     new_entries: List) -> Tuple[List, array]:
+        '''
+        Returns new lists of entries and their keys (negated wpm)
+        with new_entries merged into sorted entries, does not change
+        given lists, which may still be shown.
+        Only new_entries are sorted with Python key, runs of old
+        entries between them are found by bisect in keys
+        and copied as slices. Entries with equal wpm stay in file order.
+        '''
+        new_entries = sorted(new_entries, key=lambda entry: -entry.wpm)
+        merged_entries = []
+        merged_keys = array('d')
+        start = 0
+        for entry in new_entries:
+            key = -entry.wpm
+            position = bisect.bisect_right(keys, key, start)
+            if position > start:
+                merged_entries += entries[start:position]
+                merged_keys += keys[start:position]
+                start = position
+            merged_entries.append(entry)
+            merged_keys.append(key)
+        merged_entries += entries[start:]
+        merged_keys += keys[start:]
+        return merged_entries, merged_keys
+
+    def __update_progress(self, series: List):
+        '''
+        Builds progress line of weekly mean wpm from rollups,
+        so whole history is not scanned again.
+        '''
+        series = series[-self.PROGRESS_WEEKS:]
+        if len(series) == 0:
             return
 
-        self.entries = entries
+        week, last = series[-1]
+        self.progress = 'Weekly mean wpm: '
+        self.progress += sparkline([bucket.mean_wpm() for _, bucket in series])
+        self.progress += f' {format(last.mean_wpm(), '.2f')} in {week}, '
+        self.progress += f'best {format(last.best_wpm, '.2f')}, '
+        self.progress += f'{format(100.0 * last.error_rate(), '.1f')}% errors'
 
     def __init__(self, program: Program):
         '''
@@ -718,6 +1720,7 @@ class StatsScreen(State):
         '''
         super().__init__(program)
         self.entries: List[FileStatistics.Entry] = []
+        self.results = ScrollList(self.__text_by_entry)
 
         stats_title = 'Input stats file:stats/'
         self.stats_file = TextInput(50, stats_title)
@@ -730,7 +1733,9 @@ class StatsScreen(State):
         self.training_file = TextInput(50, train_title)
 
         textgen_type_title = 'Choose type of text(z/x):'
-        self.textgen_type = Switch(TextgenType, textgen_type_title)
+        self.textgen_type = Switch(get_registry().names(), textgen_type_title)
+        self.__directory_of: Tuple[str, str] = (None, '')
+        # (selected source, its directory), see __directory()
 
         self.display_button = Button(self.__display_stats, 'Show')
         self.menu_button = Button(self.__main_menu, 'Main menu')
@@ -744,6 +1749,13 @@ class StatsScreen(State):
         self.__active_widget_y: int = 0
 
         self.error_message: str = ''
+        self.progress: str = ''
+        # Line with user progress over last weeks
+
+        self.loading: Task = None
+        # Background loading of stats, None if nothing is loading
+        self.__loading_file: str = ''
+        self.__loading_percent: int = 0
 
         self.__updated_since: bool = False
 
@@ -761,12 +1773,11 @@ class StatsScreen(State):
         ans = ''
         ans += f'user {term.bold(entry.user)} '
         ans += f'on text {term.bold(entry.text_tag)}: '
-        ans += f'{term.bold(format(entry.time / Statistics.NANOSECONDS_IN_SECOND, '.2f'))} s, '
-        wpm = term.bold(format(
-            entry.word_count * Statistics.NANOSECONDS_IN_MINUTE / entry.time,
-            '.2f'
-        ))
-        ans += f'{wpm} wpm, '
+        ans += f'{term.bold(format(entry.seconds, '.2f'))} s, '
+        ans += f'{term.bold(format(entry.wpm, '.2f'))} wpm '
+        _, filename = get_registry().parse_text_tag(entry.text_tag)
+        normalized = self.program.analyzer.normalize_wpm(entry.wpm, filename)
+        ans += f'({format(normalized, '.2f')} normalized), '
         ans += term.red(f'{term.bold(str(entry.error_count))} errors')
         return term.center(ans)
 
@@ -791,25 +1802,44 @@ class StatsScreen(State):
                         grid_text += term.rjust(vis)
                 grid_text += '\n'
 
-            print(term.clear + term.move_y(0))
-            print(grid_text + '\n')
+            results_top = self.GRID_TOP + len(self.grid) + self.RESULTS_MARGIN
+            # Layout is known beforehand, so there is no need
+            # to ask terminal for cursor location
 
             below_text = ''
             if self.error_message != '':
                 below_text += term.center(term.red(term.bold(self.error_message)))
             else:
-                max_entries = term.height - term.get_location()[0] - 1
-                entries = self.entries[:max_entries]
-                below_text += '\n'.join(map(self.__text_by_entry, entries))
-
-            print(below_text)
+                results_height = term.height - results_top - 1
+                # Last row is left for the position of the results
+                if self.loading is not None:
+                    below_text += term.center(
+                        f'Loading stats... {self.__loading_percent}%'
+                    ) + '\n'
+                    results_height -= 1
+                if self.progress != '':
+                    below_text += term.center(self.progress) + '\n'
+                    results_height -= 1
+                self.results.set_height(results_height)
+                below_text += self.results.visualize_str(False)
+                if len(self.results.items) > 0:
+                    below_text += term.move_y(term.height - 1)
+                    below_text += term.rjust(
+                        self.results.position_str() + ' (PgUp/PgDown)'
+                    )
+
+            term.write(term.clear + term.move_y(self.GRID_TOP) + grid_text +
+                  term.move_y(results_top) + below_text)
 
     def handle_key(self, key: Keystroke):
         '''
         If key is arrow, changes active widget.
+        If key is PgUp/PgDown/Home/End, scrolls results.
         Otherwise passes it to active widget.
         '''
         match key.name:
+            case 'KEY_PGUP' | 'KEY_PGDOWN' | 'KEY_HOME' | 'KEY_END':
+                self.results.handle_key(key)
             case 'KEY_LEFT':
                 self.__active_widget_x -= 1
                 self.__active_widget_x += len(self.grid[self.__active_widget_y])
@@ -832,11 +1862,9 @@ class StatsScreen(State):
         '''
         Just some cosmetic feature for less typing for user.
         Also we strictly forbid using paths other than assets/texts|vocabs.
+        Takes entries loaded in background.
         '''
-        new_title = ''
-        match self.textgen_type.get_current_option():
-            case TextgenType.FILE:
-                new_title = 'Input training file (leave blank for all files):assets/texts/'
-            case TextgenType.RANDOM:
-                new_title = 'Input training file (leave blank for all files):assets/vocabs/'
+        self.__poll_loading()
+        new_title = 'Input training file (leave blank for all files):' + \
+            self.__directory() + '/'
         self.training_file.title = new_title
@@ -1,6 +1,91 @@
 import time
-from typing import NamedTuple, List, Dict
+from array import array
+from typing import NamedTuple, List, Dict, Tuple, Iterator
 from harmonikey_mmmity.gamemodes import Gamemode
+from harmonikey_mmmity.graphemes import split_graphemes
+from harmonikey_mmmity.telemetry import EventSink
+
+
+class RollingRate:
+    '''
+    Counts words and characters typed during last seconds,
+    for live wpm and cpm.
+    Counters are kept in fixed-size circular array of time buckets:
+    slot of bucket is reused when its id is outdated, so adding words
+    and computing rates take constant time however long training is.
+    Times are in perf_counter_ns.
+    '''
+    BUCKET_NS = 500000000
+    N_BUCKETS = 20
+    # Longest window is N_BUCKETS * BUCKET_NS = 10 seconds
+
+    def __init__(self, start: int, bucket_ns: int = BUCKET_NS,
+                 n_buckets: int = N_BUCKETS):
+        self.start: int = start
+        self.bucket_ns: int = bucket_ns
+        self.n_buckets: int = n_buckets
+        self.ids: array = array('q', [-1] * n_buckets)
+        # Number of bucket since start stored in every slot
+        self.words: array = array('I', [0] * n_buckets)
+        self.characters: array = array('I', [0] * n_buckets)
+
+    def __bucket(self, now: int) -> int:
+        return max(0, now - self.start) // self.bucket_ns
+
+    def add(self, words: int, characters: int, now: int) -> None:
+        '''
+        Adds typed words and characters at moment now.
+        '''
+        bucket = self.__bucket(now)
+        slot = bucket % self.n_buckets
+        if self.ids[slot] != bucket:
+            self.ids[slot] = bucket
+            self.words[slot] = 0
+            self.characters[slot] = 0
+        self.words[slot] += words
+        self.characters[slot] += characters
+
+    def rates(self, window_s: float, now: int) -> Tuple[float, float]:
+        '''
+        Returns (wpm, cpm) during last window_s seconds before now.
+        Window is rounded up to whole buckets and limited by
+        N_BUCKETS buckets and by time since start.
+        '''
+        current = self.__bucket(now)
+        n_window = min(self.n_buckets,
+                       -(-int(window_s * Statistics.NANOSECONDS_IN_SECOND) //
+                         self.bucket_ns))
+        words = 0
+        characters = 0
+        for bucket in range(max(0, current - n_window + 1), current + 1):
+            slot = bucket % self.n_buckets
+            if self.ids[slot] == bucket:
+                words += self.words[slot]
+                characters += self.characters[slot]
+
+        elapsed = max(0, now - self.start)
+        span = min(elapsed, (n_window - 1) * self.bucket_ns +
+                   elapsed % self.bucket_ns)
+        if span == 0:
+            return 0.0, 0.0
+        return (Statistics.NANOSECONDS_IN_MINUTE * words / span,
+                Statistics.NANOSECONDS_IN_MINUTE * characters / span)
+
+    def history(self, now: int) -> List[float]:
+        '''
+        Returns wpm in every one of last N_BUCKETS buckets,
+        oldest first, for sparkline.
+        Buckets before start are not included.
+        '''
+        current = self.__bucket(now)
+        out = []
+        for bucket in range(max(0, current - self.n_buckets + 1),
+                            current + 1):
+            slot = bucket % self.n_buckets
+            words = self.words[slot] if self.ids[slot] == bucket else 0
+            out.append(Statistics.NANOSECONDS_IN_MINUTE * words /
+                       self.bucket_ns)
+        return out
 
 
 class Statistics:
@@ -11,21 +96,36 @@ class Statistics:
     NANOSECONDS_IN_SECOND = 1000000000.0
 
     def __init__(self, user: str, text_tag: str,
-                 mode: Gamemode, timeout: float):
+                 mode: Gamemode, timeout: float, events: EventSink = None):
         '''
-        Initialization for real-time statistics counting
+        Initialization for real-time statistics counting.
+        Completed words are reported to events.
         '''
         self.word_count: int = 0
         self.character_count: int = 0
         self.error_count: int = 0
         self.user: str = user
         self.start_timer: int = time.perf_counter_ns()
+        self.started_at: int = int(time.time())
+        # Wall-clock start time (unix seconds), is saved to stats file
         self.text_tag: str = text_tag
         self.mode: Gamemode = mode
         self.timeout: float = timeout
         self.frozen: bool = False
         self.frozen_timer: int = 0
 
+        self.deadline: int = 0
+        # Moment (in perf_counter_ns) when timed training ends,
+        # 0 if there is no timeout
+        if self.timeout != 0.0:
+            self.deadline = self.start_timer + \
+                int(self.timeout * self.NANOSECONDS_IN_SECOND)
+        self.overshoot: int = 0
+        # How late (in ns) the timer was actually frozen after deadline
+        self.rolling: RollingRate = RollingRate(self.start_timer)
+        # Words typed during last seconds, for live wpm
+        self.events: EventSink = events or EventSink()
+
     def get_current_time(self) -> int:
         '''
         Returns time elapsed since the beginning of Training
@@ -39,16 +139,80 @@ class Statistics:
     def freeze(self):
         '''
         Freezes timer. Is called when Training is ended.
+        If deadline has already passed, timer is frozen exactly
+        at deadline and the difference is saved into overshoot.
         '''
-        self.frozen_timer = self.get_current_time()
+        if self.frozen:
+            return
+        now = time.perf_counter_ns()
+        if self.deadline != 0 and now > self.deadline:
+            self.overshoot = now - self.deadline
+            now = self.deadline
+        self.frozen_timer = now
         self.frozen = True
 
-    def add_word(self, word: str) -> None:
+    def resume(self, word_count: int, character_count: int,
+               error_count: int, elapsed: int) -> None:
         '''
-        Adding word, which was successfully typed by user
+        Continues statistics of previous session:
+        adds its counters and moves timer back by its elapsed ns.
+        '''
+        self.word_count += word_count
+        self.character_count += character_count
+        self.error_count += error_count
+        self.start_timer -= elapsed
+        self.started_at -= int(elapsed / self.NANOSECONDS_IN_SECOND)
+        if self.deadline != 0:
+            self.deadline -= elapsed
+
+    def get_time_left_s(self) -> float:
         '''
+        Returns seconds left until deadline, never negative.
+        Returns infinity if there is no timeout.
+        '''
+        if self.deadline == 0:
+            return float('inf')
+        left = self.deadline - self.get_current_time()
+        return max(0.0, left / self.NANOSECONDS_IN_SECOND)
+
+    def is_time_up(self) -> bool:
+        '''
+        Returns True if deadline has come.
+        '''
+        return self.deadline != 0 and self.get_current_time() >= self.deadline
+
+    def get_overshoot_ms(self) -> float:
+        '''
+        Returns how many milliseconds after deadline the timer was frozen.
+        '''
+        return self.overshoot / 1000000.0
+
+    def add_word(self, word: str, separator: str = '') -> None:
+        '''
+        Adding word, which was successfully typed by user,
+        separator is whitespace typed before it.
+        Characters are counted as grapheme clusters.
+        Word is also added to rolling window of live rates.
+        '''
+        characters = len(split_graphemes(word)) + len(separator)
+        # Whitespace characters are clusters of their own
         self.word_count += 1
-        self.character_count += len(word)
+        self.character_count += characters
+        self.rolling.add(1, characters, time.perf_counter_ns())
+        self.events.emit('word', word=word, word_count=self.word_count,
+                         character_count=self.character_count)
+
+    def get_live_rates(self, window_s: float) -> Tuple[float, float]:
+        '''
+        Returns (wpm, cpm) during last window_s seconds.
+        '''
+        return self.rolling.rates(window_s, self.get_current_time())
+
+    def get_live_history(self) -> List[float]:
+        '''
+        Returns wpm during every of last RollingRate buckets.
+        '''
+        return self.rolling.history(self.get_current_time())
 
     def get_wpm(self) -> float:
         '''
@@ -85,6 +249,7 @@ class Statistics:
             str(self.get_current_time() - self.start_timer),
             str(self.timeout),
             str(self.error_count),
+            str(self.started_at),
         ])
 
     def save_to_file(self, path: str) -> None:
@@ -95,6 +260,93 @@ class Statistics:
             stats_file.write(str(self) + '\n')
 
 
+class KeyStatistics:
+    '''
+    Per-character and per-bigram error and latency counters.
+    Keys of all dictionaries are either single characters or bigrams
+    (previous character + current one).
+    Is filled by TextOverseer on every typed character.
+    '''
+    MAX_LATENCY_NS = 2 * 1000000000
+    # Longer pauses are not counted as latency, user was just thinking
+
+    ERROR_WEIGHT = 4.0
+    # Error rate is weighted heavier than slow typing in weakness()
+
+    def __init__(self):
+        '''
+        Initializes all counters with empty ones.
+        '''
+        self.hits: Dict[str, int] = dict()
+        self.errors: Dict[str, int] = dict()
+        self.latency_ns: Dict[str, int] = dict()
+        self.latency_count: Dict[str, int] = dict()
+        self.total_latency_ns: int = 0
+        self.total_latency_count: int = 0
+
+    @staticmethod
+    def __keys(char: str, prev_char: str) -> List[str]:
+        '''
+        Returns character and bigram keys for char typed after prev_char.
+        '''
+        if prev_char:
+            return [char, prev_char + char]
+        return [char]
+
+    def add_hit(self, char: str, prev_char: str, latency_ns: int) -> None:
+        '''
+        Is called when char was typed correctly after prev_char.
+        latency_ns is time since previous typed character.
+        '''
+        count_latency = 0 < latency_ns <= self.MAX_LATENCY_NS
+        if count_latency:
+            self.total_latency_ns += latency_ns
+            self.total_latency_count += 1
+
+        for key in self.__keys(char, prev_char):
+            self.hits[key] = self.hits.get(key, 0) + 1
+            if count_latency:
+                self.latency_ns[key] = self.latency_ns.get(key, 0) + latency_ns
+                self.latency_count[key] = self.latency_count.get(key, 0) + 1
+
+    def add_error(self, char: str, prev_char: str) -> None:
+        '''
+        Is called when something else was typed instead of char.
+        '''
+        for key in self.__keys(char, prev_char):
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def weakness(self, key: str) -> float:
+        '''
+        Returns how weak user is at typing key.
+        It is weighted error rate plus relative excess of mean latency
+        over mean latency of all keys. Zero means no problems.
+        '''
+        errors = self.errors.get(key, 0)
+        typed = self.hits.get(key, 0) + errors
+        if typed == 0:
+            return 0.0
+        out = self.ERROR_WEIGHT * errors / typed
+
+        if self.latency_count.get(key, 0) > 0 and \
+           self.total_latency_count > 0:
+            mean = self.latency_ns[key] / self.latency_count[key]
+            total_mean = self.total_latency_ns / self.total_latency_count
+            out += max(0.0, mean / total_mean - 1.0)
+        return out
+
+    def weak_keys(self, n_keys: int) -> List[Tuple[str, float]]:
+        '''
+        Returns up to n_keys (key, weakness) pairs with the largest
+        positive weakness, sorted by decreasing weakness.
+        '''
+        keys = set(self.hits.keys()) | set(self.errors.keys())
+        out = [(key, self.weakness(key)) for key in keys]
+        out = [pair for pair in out if pair[1] > 0.0]
+        out.sort(key=lambda pair: -pair[1])
+        return out[:n_keys]
+
+
 class FileStatistics:
     '''
     Class for loading and analyzing different statistics from file.
@@ -104,7 +356,13 @@ class FileStatistics:
     Also contains list of all loaded entries in self.entries
     Entry is a namedtuple with fields:
         user, text_tag, mode, word_count, character_count, time, error_count
+    and derived metrics, computed once when entry is parsed:
+        wpm, cpm, accuracy, seconds
+    and timestamp, wall-clock start time of run in unix seconds
+    (0 for rows saved before it was recorded)
     '''
+    CHUNK_ROWS = 1000
+    # Number of entries in one chunk of iter_chunks()
 
     class Entry(NamedTuple):
         '''
@@ -118,6 +376,49 @@ class FileStatistics:
         time: int
         timeout: float
         error_count: int
+        wpm: float
+        cpm: float
+        accuracy: float
+        seconds: float
+        timestamp: int = 0
+
+        @classmethod
+        def from_row(cls, row: List[str]):
+            '''
+            Creates entry from splitted csv row, computes derived metrics.
+            Timestamp column is optional, older files do not have it.
+            Raises ValueError if time is not positive or counts
+            are negative, IndexError if row is too short.
+            '''
+            word_count = int(row[3])
+            character_count = int(row[4])
+            time = int(row[5])
+            error_count = int(row[7])
+            if time <= 0:
+                raise ValueError('Time should be positive')
+            if min(word_count, character_count, error_count) < 0:
+                raise ValueError('Counts should not be negative')
+
+            typed_count = character_count + error_count
+            accuracy = 1.0
+            if typed_count > 0:
+                accuracy = character_count / typed_count
+
+            return cls(
+                user=row[0],
+                text_tag=row[1],
+                mode=row[2],
+                word_count=word_count,
+                character_count=character_count,
+                time=time,
+                timeout=float(row[6]),
+                error_count=error_count,
+                wpm=Statistics.NANOSECONDS_IN_MINUTE * word_count / time,
+                cpm=Statistics.NANOSECONDS_IN_MINUTE * character_count / time,
+                accuracy=accuracy,
+                seconds=time / Statistics.NANOSECONDS_IN_SECOND,
+                timestamp=int(row[8]) if len(row) > 8 else 0,
+            )
 
     def __init__(self):
         '''
@@ -127,29 +428,55 @@ class FileStatistics:
         self.by_user: Dict[str, List[self.Entry]] = dict()
         self.by_text_tag: Dict[str, List[self.Entry]] = dict()
 
-    def add_file(self, filename: str):
+    @classmethod
+    def iter_file(cls, filename: str) -> Iterator[Entry]:
         '''
-        Appends all entries from filename to containers.
-        If file is malformed (e. g. wrong line format), raises TypeError.
+        Yields entries from filename one by one without loading
+        the whole file, for streaming large files.
+        If file is malformed (e. g. wrong line format
+        or non-positive time), raises TypeError.
         '''
-        new_entries = []
         with open(filename, 'r') as stats_file:
-            for line in stats_file.readlines():
+            for line in stats_file:
                 splitted = line.rstrip().split(';')
                 try:
-                    entry = self.Entry(
-                        user=splitted[0],
-                        text_tag=splitted[1],
-                        mode=splitted[2],
-                        word_count=int(splitted[3]),
-                        character_count=int(splitted[4]),
-                        time=int(splitted[5]),
-                        timeout=float(splitted[6]),
-                        error_count=int(splitted[7])
-                    )
+                    entry = cls.Entry.from_row(splitted)
+                except (IndexError, TypeError, ValueError):
+                    raise TypeError("Wrong file format")
+                yield entry
+
+    @classmethod
+    def iter_chunks(cls, filename: str,
+                    rows: int = CHUNK_ROWS) -> Iterator[Tuple[List[Entry], int]]:
+        '''
+        Yields lists of up to rows entries from filename together with
+        number of bytes read so far, for loading with progress.
+        The last list may be empty, so read bytes reach file size.
+        If file is malformed, raises TypeError like iter_file().
+        '''
+        chunk = []
+        position = 0
+        with open(filename, 'rb') as stats_file:
+            for line in stats_file:
+                position += len(line)
+                try:
+                    splitted = line.decode().rstrip().split(';')
+                    chunk.append(cls.Entry.from_row(splitted))
                 except (IndexError, TypeError, ValueError):
                     raise TypeError("Wrong file format")
-                new_entries.append(entry)
+                if len(chunk) == rows:
+                    yield chunk, position
+                    chunk = []
+        yield chunk, position
+
+    def add_file(self, filename: str):
+        '''
+        Appends all entries from filename to containers.
+        If file is malformed (e. g. wrong line format
+        or non-positive time), raises TypeError
+        and nothing is appended.
+        '''
+        new_entries = list(self.iter_file(filename))
 
         self.entries += new_entries
         for entry in new_entries:
@@ -162,8 +489,7 @@ class FileStatistics:
             self.by_text_tag[entry.text_tag].append(entry)
 
         for text_tag_runs in self.by_text_tag.values():
-            text_tag_runs.sort(key=lambda entry:
-                               -(entry.word_count / entry.time))
+            text_tag_runs.sort(key=lambda entry: -entry.wpm)
 
     def user_best_stats(self, user: str) -> Dict[str, Entry]:
         '''
@@ -175,11 +501,8 @@ class FileStatistics:
             return out
 
         for entry in self.by_user[user]:
-            if entry.text_tag not in out.keys():
-                out[entry.text_tag] = entry
-            new_wpm = entry.word_count / entry.time
-            wpm = out[entry.text_tag].word_count / out[entry.text_tag].time
-            if new_wpm > wpm:
+            if entry.text_tag not in out.keys() or \
+               entry.wpm > out[entry.text_tag].wpm:
                 out[entry.text_tag] = entry
 
         return out
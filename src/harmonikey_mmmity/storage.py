@@ -0,0 +1,28 @@
+import json
+import os
+from typing import Any
+
+
+def load_json(path: str, default: Any) -> Any:
+    '''
+    Returns data loaded from json file at path.
+    If file does not exist or is malformed, returns default.
+    '''
+    try:
+        with open(path, 'r') as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path: str, data: Any) -> None:
+    '''
+    Saves data to json file at path atomically:
+    data is written to temporary file which then replaces path,
+    so file is never left half-written.
+    Raises OSError if file can not be written.
+    '''
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as json_file:
+        json.dump(data, json_file, ensure_ascii=False)
+    os.replace(tmp_path, path)
@@ -0,0 +1,106 @@
+import threading
+from collections import deque
+from typing import Callable, List
+
+
+class TaskCancelled(Exception):
+    '''
+    Is thrown inside work of Task by check_cancelled()
+    after cancel() was called, and by result() of such task.
+    '''
+
+
+class Task:
+    '''
+    Work done in background thread, so key loop is not blocked by I/O.
+    Work is a function called as work(task, *args), it may report
+    progress with set_progress(), give partial results with put()
+    and should call check_cancelled() between steps.
+    The state which started task polls it in tick():
+    take() returns partial results, done tells that work returned,
+    result() returns its value or raises its exception.
+    '''
+    def __init__(self, work: Callable, *args):
+        self.__work: Callable = work
+        self.__args: tuple = args
+        self.__cancelled = threading.Event()
+        self.__done = threading.Event()
+        self.__partial: deque = deque()
+        # Appending and popping from deque is atomic, so no lock is needed
+        self.__result = None
+        self.__error: BaseException = None
+        self.progress: float = 0.0
+        # Share of work done, from 0.0 to 1.0
+
+    def start(self):
+        '''
+        Starts work in daemon thread and returns self.
+        '''
+        threading.Thread(target=self.__run, daemon=True).start()
+        return self
+
+    def __run(self):
+        try:
+            self.__result = self.__work(self, *self.__args)
+        except BaseException as error:
+            self.__error = error
+        finally:
+            self.__done.set()
+
+    def cancel(self):
+        '''
+        Asks work to stop, it stops on next check_cancelled().
+        '''
+        self.__cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__cancelled.is_set()
+
+    def check_cancelled(self):
+        '''
+        Raises TaskCancelled if task was cancelled.
+        '''
+        if self.cancelled:
+            raise TaskCancelled()
+
+    @property
+    def done(self) -> bool:
+        return self.__done.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        '''
+        Blocks until work returns or timeout passes.
+        Returns True if work returned.
+        '''
+        return self.__done.wait(timeout)
+
+    def set_progress(self, done: int, total: int):
+        '''
+        Sets progress to done out of total.
+        '''
+        self.progress = min(1.0, done / total) if total > 0 else 1.0
+
+    def put(self, item):
+        '''
+        Gives partial result to the state which polls task.
+        '''
+        self.__partial.append(item)
+
+    def take(self) -> List:
+        '''
+        Returns partial results put since last call.
+        '''
+        items = []
+        while len(self.__partial) > 0:
+            items.append(self.__partial.popleft())
+        return items
+
+    def result(self):
+        '''
+        Returns value returned by work or raises exception raised by it.
+        Must be called only when task is done.
+        '''
+        if self.__error is not None:
+            raise self.__error
+        return self.__result
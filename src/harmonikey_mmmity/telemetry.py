@@ -0,0 +1,174 @@
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Tuple
+
+
+ENV_VARIABLE = 'HARMONIKEY_EVENTS'
+# Where to send events: path of file, or unix:path of socket.
+# If it is not set, events are not collected at all
+
+
+class EventSink:
+    '''
+    Receiver of training events (key accepted, error, word completed,
+    finish...). This one ignores everything, it is used when
+    telemetry is turned off, so emitting costs one method call.
+    '''
+    enabled: bool = False
+
+    def emit(self, event: str, **fields: Any) -> None:
+        '''
+        Records event with fields, which should be json serializable.
+        Never blocks and never raises.
+        '''
+
+    def close(self) -> None:
+        '''
+        Writes all recorded events and releases resources.
+        '''
+
+
+class FileWriter:
+    '''
+    Appends lines to file.
+    '''
+    def __init__(self, path: str):
+        self.path: str = path
+        self.file = None
+
+    def write(self, data: bytes) -> None:
+        '''
+        Raises OSError if file can not be written.
+        '''
+        if self.file is None:
+            self.file = open(self.path, 'ab')
+        self.file.write(data)
+        self.file.flush()
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SocketWriter:
+    '''
+    Sends lines to listening unix stream socket.
+    Connects on first write and after connection was lost.
+    '''
+    def __init__(self, path: str):
+        self.path: str = path
+        self.socket: socket.socket = None
+
+    def write(self, data: bytes) -> None:
+        '''
+        Raises OSError if socket is not available,
+        next write tries to connect again.
+        '''
+        try:
+            if self.socket is None:
+                self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.socket.connect(self.path)
+            self.socket.sendall(data)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+
+class QueueSink(EventSink):
+    '''
+    Puts events into bounded queue, background thread takes them out,
+    serializes into newline-delimited json and passes to writer.
+    emit() only appends to deque, which is atomic, so typing thread
+    never waits for a lock or for I/O. If queue is full (writer is
+    slow or unavailable), new events are dropped and counted in dropped.
+    Events which writer failed to write are counted in failed.
+    '''
+    enabled = True
+
+    CAPACITY = 4096
+    # Maximum number of events waiting to be written
+
+    FLUSH_INTERVAL = 0.1
+    # Seconds between writes of queued events
+
+    def __init__(self, writer, capacity: int = CAPACITY,
+                 flush_interval: float = FLUSH_INTERVAL):
+        '''
+        writer is FileWriter, SocketWriter or anything with
+        write(bytes) and close(). Starts background thread.
+        '''
+        self.writer = writer
+        self.capacity: int = capacity
+        self.flush_interval: float = flush_interval
+        self.queue: Deque[Tuple[float, str, dict]] = deque()
+        self.dropped: int = 0
+        self.failed: int = 0
+        self.written: int = 0
+        self.__closed = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def emit(self, event: str, **fields: Any) -> None:
+        if len(self.queue) >= self.capacity:
+            self.dropped += 1
+            return
+        self.queue.append((time.time(), event, fields))
+        # Serialization is left to the writer thread
+
+    def __drain(self) -> None:
+        '''
+        Writes all queued events in one batch.
+        If writer fails, the batch is dropped.
+        '''
+        lines = []
+        while len(self.queue) > 0:
+            timestamp, event, fields = self.queue.popleft()
+            lines.append(json.dumps({'time': timestamp, 'event': event,
+                                     **fields}, ensure_ascii=False))
+        if len(lines) == 0:
+            return
+        try:
+            self.writer.write(('\n'.join(lines) + '\n').encode())
+            self.written += len(lines)
+        except OSError:
+            self.failed += len(lines)
+
+    def __run(self) -> None:
+        while not self.__closed.wait(self.flush_interval):
+            self.__drain()
+        self.__drain()
+
+    def close(self) -> None:
+        '''
+        Stops background thread after it writes remaining events.
+        '''
+        if self.__closed.is_set():
+            return
+        self.__closed.set()
+        self.__thread.join()
+        self.writer.close()
+
+
+def create_sink(target: str = None) -> EventSink:
+    '''
+    Returns sink for target (ENV_VARIABLE by default):
+    unix:path sends events to unix socket, other paths are files.
+    Returns EventSink which ignores events if target is empty.
+    '''
+    if target is None:
+        target = os.environ.get(ENV_VARIABLE, '')
+    if target == '':
+        return EventSink()
+    if target.startswith('unix:'):
+        return QueueSink(SocketWriter(target[len('unix:'):]))
+    return QueueSink(FileWriter(target))
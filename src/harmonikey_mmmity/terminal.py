@@ -0,0 +1,246 @@
+import re
+import sys
+from typing import List, Optional, Tuple
+
+from blessed import Terminal
+from wcwidth import wcwidth
+
+
+class Screen(Terminal):
+    '''
+    Terminal which states and widgets draw on.
+    Formatting (colors, cursor movement, center, length) comes from
+    blessed, output goes through write() into stream,
+    so the same rendering code works with real and virtual terminals.
+    '''
+    def write(self, text: str = ''):
+        '''
+        Writes text and newline into stream, like print().
+        '''
+        self.stream.write(text + '\n')
+
+    def flush(self):
+        self.stream.flush()
+
+
+class VirtualScreen:
+    '''
+    In-memory terminal screen of fixed size. Consumes text with
+    escape sequences emitted by blessed for xterm-256color
+    and keeps characters and their SGR attributes in cells,
+    like real terminal would show them.
+    Supported: cursor positioning (CUP, VPA, HPA and relative moves),
+    clearing of screen and line, SGR attributes, newlines,
+    line wrapping and scrolling. Other sequences (hyperlinks,
+    charset selection) are ignored.
+    '''
+    SEQUENCE_REGEX = re.compile(r'\x1b\[([0-9;?]*)([@-~])'
+                                r'|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)'
+                                r'|\x1b[()][0-9A-Za-z]|\x1b.?|[^\x1b]+')
+    # CSI sequences with parameters and command, OSC sequences
+    # (e. g. hyperlinks), charset selection, other escapes and text
+
+    def __init__(self, width: int, height: int):
+        self.width: int = width
+        self.height: int = height
+        self.x: int = 0
+        self.y: int = 0
+        self.style: str = ''
+        # SGR parameters in effect, e. g. '38;5;220' for gold
+        self.chars: List[List[str]] = []
+        self.styles: List[List[str]] = []
+        self.writes: int = 0
+        # Number of write() calls, e. g. to check that nothing was redrawn
+        self.clear()
+
+    def __blank_row(self) -> Tuple[List[str], List[str]]:
+        return [' '] * self.width, [''] * self.width
+
+    def clear(self):
+        '''
+        Clears all cells, cursor stays where it is.
+        '''
+        self.chars = []
+        self.styles = []
+        for _ in range(self.height):
+            chars, styles = self.__blank_row()
+            self.chars.append(chars)
+            self.styles.append(styles)
+
+    def __newline(self):
+        self.x = 0
+        self.y += 1
+        if self.y == self.height:
+            self.chars.pop(0)
+            self.styles.pop(0)
+            chars, styles = self.__blank_row()
+            self.chars.append(chars)
+            self.styles.append(styles)
+            self.y -= 1
+            # Screen is scrolled up by one line
+
+    def __put(self, char: str):
+        '''
+        Puts printable character at cursor and moves cursor.
+        Zero-width characters are joined to the previous cell.
+        '''
+        width = wcwidth(char)
+        if width < 0:
+            return
+        if width == 0:
+            if self.x > 0:
+                self.chars[self.y][self.x - 1] += char
+            return
+        if self.x + width > self.width:
+            self.__newline()
+        self.chars[self.y][self.x] = char
+        self.styles[self.y][self.x] = self.style
+        for extra in range(1, width):
+            self.chars[self.y][self.x + extra] = ''
+            self.styles[self.y][self.x + extra] = self.style
+        self.x += width
+
+    def __clamp(self):
+        self.x = min(max(self.x, 0), self.width - 1)
+        self.y = min(max(self.y, 0), self.height - 1)
+
+    def __sgr(self, params: str):
+        '''
+        Applies Select Graphic Rendition parameters.
+        '''
+        if params in ('', '0'):
+            self.style = ''
+        elif self.style == '':
+            self.style = params
+        else:
+            self.style += ';' + params
+
+    def __csi(self, params: str, command: str):
+        '''
+        Applies Control Sequence Introducer sequence.
+        '''
+        numbers = [int(number) if number.isdigit() else 0
+                   for number in params.split(';')]
+        first = numbers[0] or 1
+        # Most commands treat missing or zero parameter as 1
+        match command:
+            case 'H' | 'f':
+                self.y = first - 1
+                self.x = (numbers[1] if len(numbers) > 1 else 1) - 1
+            case 'd':
+                self.y = first - 1
+            case 'G':
+                self.x = first - 1
+            case 'A':
+                self.y -= first
+            case 'B':
+                self.y += first
+            case 'C':
+                self.x += first
+            case 'D':
+                self.x -= first
+            case 'J':
+                if numbers[0] == 2:
+                    self.clear()
+            case 'K':
+                self.chars[self.y][self.x:] = [' '] * (self.width - self.x)
+                self.styles[self.y][self.x:] = [''] * (self.width - self.x)
+            case 'm':
+                self.__sgr(params)
+        self.__clamp()
+
+    def write(self, data: str):
+        '''
+        Interprets text with escape sequences.
+        '''
+        self.writes += 1
+        for match in self.SEQUENCE_REGEX.finditer(data):
+            part = match.group()
+            if match.group(2) is not None:
+                self.__csi(match.group(1), match.group(2))
+            elif part[0] == '\x1b':
+                continue
+            else:
+                for char in part:
+                    if char == '\n':
+                        self.__newline()
+                    elif char == '\r':
+                        self.x = 0
+                    else:
+                        self.__put(char)
+
+    def flush(self):
+        pass
+
+    def lines(self) -> List[str]:
+        '''
+        Returns text of every row without trailing spaces.
+        '''
+        return [''.join(chars).rstrip() for chars in self.chars]
+
+    def text(self) -> str:
+        '''
+        Returns text of the whole screen, rows are joined by newlines.
+        '''
+        return '\n'.join(self.lines())
+
+    def style_at(self, x: int, y: int) -> str:
+        '''
+        Returns SGR parameters of cell, '' for default style.
+        '''
+        return self.styles[y][x]
+
+    def find(self, text: str) -> Optional[Tuple[int, int]]:
+        '''
+        Returns (x, y) of the first occurence of text on screen,
+        None if it is not shown.
+        '''
+        for y, chars in enumerate(self.chars):
+            x = ''.join(chars).find(text)
+            if x != -1:
+                return x, y
+        return None
+
+
+class VirtualTerminal(Screen):
+    '''
+    Screen without TTY: formats for xterm-256color and writes
+    into VirtualScreen of given size, which can be inspected in tests.
+    Is also used to measure rendering in benchmarks.
+    '''
+    def __init__(self, width: int = 80, height: int = 24):
+        super().__init__(kind='xterm-256color', force_styling=True,
+                         stream=VirtualScreen(width, height))
+        self.screen: VirtualScreen = self.stream
+
+    @property
+    def width(self) -> int:
+        return self.screen.width
+
+    @property
+    def height(self) -> int:
+        return self.screen.height
+
+
+_terminal: Screen = None
+
+
+def get_terminal() -> Screen:
+    '''
+    Returns terminal shared by the whole program,
+    it is created on first call and writes to stdout.
+    Widgets format their output with it.
+    '''
+    global _terminal
+    if _terminal is None:
+        _terminal = Screen(stream=sys.stdout)
+    return _terminal
+
+
+def set_terminal(terminal: Screen = None):
+    '''
+    Replaces shared terminal, e. g. with VirtualTerminal.
+    None resets it, so next get_terminal() creates real one.
+    '''
+    global _terminal
+    _terminal = terminal
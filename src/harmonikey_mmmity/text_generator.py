@@ -1,9 +1,14 @@
 import abc
+import bisect
+import re
 import typing
 import random
+from array import array
 from enum import Enum
 
-from harmonikey_mmmity.exceptions import EndOfFile
+from harmonikey_mmmity.exceptions import EndOfFile, EmptyVocabulary
+from harmonikey_mmmity.statistics import KeyStatistics
+from harmonikey_mmmity.vocab import VocabFilter, get_vocabulary
 
 
 class TextgenType(Enum):
@@ -13,6 +18,13 @@ class TextgenType(Enum):
     FILE = 2
     # Words are consistently taken from text file
 
+    ADAPTIVE = 3
+    # Like RANDOM, but words with user's weak characters
+    # and bigrams are chosen more often
+
+    CODE = 4
+    # Tokens of source code file, newlines and indentation are kept
+
 
 class TextGenerator(abc.ABC):
     '''
@@ -51,18 +63,43 @@ class RandomTextGenerator(TextGenerator):
     Vocabulary from file, words are separated by whitespace characters.
     Has a pool of randomly generated words.
     '''
-    def __init__(self, filename: str, init_poolsize: int):
+    def __init__(self, filename: str, init_poolsize: int, seed: int = None,
+                 vocab_filter: VocabFilter = None):
         '''
         Initializes the vocabulary with words from file.
         Initializes the pool with init_poolsize random words.
+        Generators with the same seed give the same words.
+        If vocab_filter is given, only matching words are used:
+        words of shared Vocabulary are sampled through its cached
+        view (array of indices), so nothing is copied.
+        Raises EmptyVocabulary if no words are left.
         '''
-        with open(filename, 'r') as file:
-            self.vocab = file.read().split()
+        self.vocab: typing.List[str] = []
+        self.word_ids: typing.Sequence[int] = range(0)
+        # Indices of words in vocab which can be chosen
+        if vocab_filter is None or vocab_filter.is_empty():
+            with open(filename, 'r') as file:
+                self.vocab = file.read().split()
+            self.word_ids = range(len(self.vocab))
+        else:
+            vocabulary = get_vocabulary(filename)
+            self.vocab = vocabulary.words
+            self.word_ids = vocabulary.view(vocab_filter)
+        if len(self.word_ids) == 0:
+            raise EmptyVocabulary(filename)
+        self.random: random.Random = random.Random(seed)
         self.__poolsize: int = init_poolsize * 2 - 1
         self.__pool: list = []
 
         for _ in range(init_poolsize):
-            self.__pool.append(random.choice(self.vocab))
+            self.__pool.append(self._random_word())
+
+    def _random_word(self) -> str:
+        '''
+        Returns new random word from vocabulary.
+        Is overridden by generators with non-uniform choice.
+        '''
+        return self.vocab[self.random.choice(self.word_ids)]
 
     def next_word(self) -> str:
         '''
@@ -73,7 +110,7 @@ class RandomTextGenerator(TextGenerator):
         word_index = (self.__poolsize + 1) // 2
         out_word = self.__pool[-word_index]
 
-        self.__pool.append(random.choice(self.vocab))
+        self.__pool.append(self._random_word())
         if len(self.__pool) > self.__poolsize:
             self.__pool.pop(0)
 
@@ -105,18 +142,171 @@ class RandomTextGenerator(TextGenerator):
         return self.__pool[word_index+1:word_index+1+num_words]
 
 
+class AdaptiveTextGenerator(RandomTextGenerator):
+    '''
+    Random text generator that prefers words with characters and bigrams
+    user is weak at, according to KeyStatistics.
+    Has an inverted index from every character and bigram to ids
+    of vocabulary words containing it (once per occurrence),
+    so words with more weak characters are chosen more often.
+    New word is chosen in two steps: weak key by its weakness,
+    then uniformly random word from its index. Cost of this does not
+    depend on vocabulary size, so weights are updated after every word.
+    '''
+    N_WEAK_KEYS = 10
+    # Number of weakest keys that are trained at once
+
+    EXPLORATION = 0.3
+    # Probability to choose uniformly random word anyway,
+    # so statistics for other keys keep being collected
+
+    def __init__(self, filename: str, init_poolsize: int,
+                 key_stats: KeyStatistics, vocab_filter: VocabFilter = None):
+        '''
+        Initializes vocabulary and pool like RandomTextGenerator,
+        builds inverted index for the vocabulary.
+        '''
+        self.key_stats: KeyStatistics = key_stats
+        self.index: typing.Dict[str, array] = dict()
+        # Is empty while pool is initialized, so first words are uniform
+
+        super().__init__(filename, init_poolsize, vocab_filter=vocab_filter)
+        self.index = self.build_index(self.vocab, self.word_ids)
+
+    @staticmethod
+    def build_index(vocab: typing.List[str],
+                    word_ids: typing.Sequence[int] = None) \
+            -> typing.Dict[str, array]:
+        '''
+        Returns dictionary from character or bigram
+        to array of ids of words in vocab containing it.
+        Only words with word_ids are indexed (all by default).
+        '''
+        if word_ids is None:
+            word_ids = range(len(vocab))
+        index = dict()
+        for word_id in word_ids:
+            word = vocab[word_id]
+            for pos, char in enumerate(word):
+                if char not in index:
+                    index[char] = array('I')
+                index[char].append(word_id)
+                if pos > 0:
+                    bigram = word[pos - 1:pos + 1]
+                    if bigram not in index:
+                        index[bigram] = array('I')
+                    index[bigram].append(word_id)
+        return index
+
+    def _random_word(self) -> str:
+        '''
+        Returns random word containing one of the weak keys,
+        or uniformly random word if there are no weak keys yet.
+        '''
+        weak_keys = []
+        if random.random() >= self.EXPLORATION:
+            weak_keys = [(key, weakness) for key, weakness in
+                         self.key_stats.weak_keys(self.N_WEAK_KEYS)
+                         if key in self.index]
+
+        if len(weak_keys) == 0:
+            return self.vocab[random.choice(self.word_ids)]
+
+        keys, weights = zip(*weak_keys)
+        key = random.choices(keys, weights)[0]
+        return self.vocab[random.choice(self.index[key])]
+
+
 class FileTextGenerator(TextGenerator):
     '''
     Text generator that returns continuous words from text file.
     When no more words are left, raises EndOfFile.
+    File is read lazily by chunks of CHUNK_SIZE bytes when more words
+    are needed, so training on large file starts quickly.
+    Remembers byte offset of every word in file, so current position
+    can be saved and training can be resumed later.
+    Bytes that are not valid UTF-8 are shown as replacement characters,
+    but offsets are counted in original bytes.
     '''
-    def __init__(self, filename: str):
+    WORD_REGEX = re.compile(r'\S+')
+
+    CHUNK_SIZE = 65536
+
+    ASCII_WHITESPACE = b' \t\n\r\x0b\x0c'
+    # Chunks are cut after last of these bytes, they never occur
+    # inside of multibyte UTF-8 characters and words
+
+    def __init__(self, filename: str, offset: int = 0, first_index: int = 0):
         '''
-        Initializes text with text from file, split into words.
+        Initializes text with words from the first chunk of file.
+        If offset is given, file is read starting from this byte offset
+        and first_index is index of the word at offset in the whole text.
+        Is used to resume training without reading the beginning of file.
+        Raises OSError if file can not be read.
         '''
-        with open(filename, 'r') as file:
-            self.text: str = file.read().split()
+        self.filename: str = filename
+        self.text: typing.List[str] = []
+        # Words read so far
+        self.__starts: array = array('Q')
+        # Byte offset of every word in file
+        self.__read_offset: int = offset
+        # Byte offset of next chunk
+        self.__pending: bytes = b''
+        # Bytes after last whitespace of read chunks,
+        # beginning of word that continues in next chunk
+        self.__eof: bool = False
+        self.__first_index: int = first_index
         self.__index: int = 0
+        self.__read_chunk()
+
+    def __read_chunk(self):
+        '''
+        Reads next chunk of file and splits its complete words.
+        File is opened for every chunk, so no file stays open
+        while user is typing.
+        '''
+        with open(self.filename, 'rb') as file:
+            file.seek(self.__read_offset)
+            chunk = file.read(self.CHUNK_SIZE)
+        start = self.__read_offset - len(self.__pending)
+        self.__read_offset += len(chunk)
+        data = self.__pending + chunk
+        if len(chunk) < self.CHUNK_SIZE:
+            self.__eof = True
+            cut = len(data)
+        else:
+            cut = max(data.rfind(byte) for byte in self.ASCII_WHITESPACE) + 1
+        self.__pending = data[cut:]
+
+        data = data[:cut].decode('utf-8', errors='surrogateescape')
+        # Invalid bytes become lone surrogates and encode back
+        # to the same bytes, so offsets stay exact
+        end = 0
+        for match in self.WORD_REGEX.finditer(data):
+            start += len(data[end:match.start()].encode('utf-8'))
+            word = match.group()
+            try:
+                size = len(word.encode('utf-8'))
+            except UnicodeEncodeError:
+                encoded = word.encode('utf-8', errors='surrogateescape')
+                size = len(encoded)
+                word = encoded.decode('utf-8', errors='replace')
+            self.text.append(word)
+            self.__starts.append(start)
+            start += size
+            end = match.end()
+
+    def __read_words(self, count: int):
+        '''
+        Reads chunks until at least count words are read
+        or end of file is reached. File that can not be read
+        anymore, e. g. was deleted, ends like it was read fully.
+        '''
+        while len(self.text) < count and not self.__eof:
+            try:
+                self.__read_chunk()
+            except OSError:
+                self.__eof = True
 
     def next_word(self) -> str:
         '''
@@ -124,6 +314,7 @@ class FileTextGenerator(TextGenerator):
         If index > len(text) raises EndOfFile.
         Increases index by 1.
         '''
+        self.__read_words(self.__index + 1)
         if self.__index >= len(self.text):
             raise EndOfFile
         out_word = self.text[self.__index]
@@ -136,6 +327,7 @@ class FileTextGenerator(TextGenerator):
         Returns word from text on position index.
         Raises EndOfFile if end of file is reached.
         '''
+        self.__read_words(self.__index + 1)
         if self.__index >= len(self.text):
             raise EndOfFile
         return self.text[self.__index]
@@ -153,5 +345,126 @@ class FileTextGenerator(TextGenerator):
         Returns num_words after index.
         If num_words is greater than available amount, returns all.
         '''
+        self.__read_words(self.__index + num_words + 1)
         num_words = min(num_words, len(self.text) - self.__index - 1)
         return self.text[self.__index+1:self.__index+num_words+1]
+
+    def position(self) -> typing.Tuple[int, int]:
+        '''
+        Returns index of current word in the whole text
+        and byte offset of it in file.
+        Can be passed back to __init__ to continue from current word.
+        '''
+        self.__read_words(self.__index + 1)
+        if self.__index < len(self.text):
+            offset = self.__starts[self.__index]
+        else:
+            offset = self.__read_offset
+        return (self.__first_index + self.__index, offset)
+
+
+class CodeTextGenerator(TextGenerator):
+    '''
+    Text generator that returns consecutive tokens of source code file.
+    Layout is kept: whitespace between tokens (including newlines
+    and indentation) is returned by separator() and has to be typed too.
+    Trailing whitespace of lines is removed.
+    Token stream is computed once: whole text is kept in one string,
+    tokens and lines are arrays of offsets in it.
+    When no more tokens are left, raises EndOfFile.
+    '''
+    TOKEN_REGEX = re.compile(r'\w+|[^\w\s]+')
+    # Identifiers and numbers, or runs of punctuation
+
+    def __init__(self, filename: str):
+        '''
+        Reads whole file and splits it into tokens and lines.
+        '''
+        with open(filename, 'r', errors='replace') as file:
+            lines = [line.rstrip() for line in file.read().splitlines()]
+        self.data: str = '\n'.join(lines)
+        self.starts: array = array('L')
+        self.ends: array = array('L')
+        # Token i is data[starts[i]:ends[i]]
+        self.line_starts: array = array('L')
+        # Line j starts at data[line_starts[j]]
+
+        position = 0
+        for line in lines:
+            self.line_starts.append(position)
+            for match in self.TOKEN_REGEX.finditer(line):
+                self.starts.append(position + match.start())
+                self.ends.append(position + match.end())
+            position += len(line) + 1
+        self.__index: int = 0
+
+    def __token(self, index: int) -> str:
+        return self.data[self.starts[index]:self.ends[index]]
+
+    def next_word(self) -> str:
+        '''
+        Returns current token and moves to the next one.
+        If there are no more tokens, raises EndOfFile.
+        '''
+        out_word = self.current_word()
+        self.__index += 1
+        return out_word
+
+    def current_word(self) -> str:
+        '''
+        Returns current token.
+        Raises EndOfFile if end of file is reached.
+        '''
+        if self.__index >= len(self.starts):
+            raise EndOfFile
+        return self.__token(self.__index)
+
+    def separator(self) -> str:
+        '''
+        Returns whitespace between previous and current token,
+        empty string if they are adjacent (e. g. "f" and "(").
+        '''
+        if self.__index == 0 or self.__index >= len(self.starts):
+            return ''
+        return self.data[self.ends[self.__index - 1]:self.starts[self.__index]]
+
+    def words_before(self, num_words: int) -> typing.List[str]:
+        '''
+        Returns num_words tokens before current.
+        If num_words is greater than available amount, returns all.
+        '''
+        num_words = min(num_words, self.__index)
+        return [self.__token(index) for index
+                in range(self.__index - num_words, self.__index)]
+
+    def words_after(self, num_words: int) -> typing.List[str]:
+        '''
+        Returns num_words tokens after current.
+        If num_words is greater than available amount, returns all.
+        '''
+        last = min(len(self.starts), self.__index + 1 + num_words)
+        return [self.__token(index)
+                for index in range(self.__index + 1, last)]
+
+    def current_end(self) -> int:
+        '''
+        Returns position in data where current token ends.
+        '''
+        if self.__index >= len(self.starts):
+            return len(self.data)
+        return self.ends[self.__index]
+
+    def line_of(self, position: int) -> int:
+        '''
+        Returns number of line containing position in data.
+        '''
+        return max(0, bisect.bisect_right(self.line_starts, position) - 1)
+
+    def line_bounds(self, line: int) -> typing.Tuple[int, int]:
+        '''
+        Returns start and end (without newline) of line in data.
+        '''
+        start = self.line_starts[line]
+        if line + 1 < len(self.line_starts):
+            return start, self.line_starts[line + 1] - 1
+        return start, len(self.data)
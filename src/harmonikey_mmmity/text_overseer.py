@@ -1,4 +1,11 @@
+import time
+from typing import Callable, List
 from harmonikey_mmmity.text_generator import TextGenerator
+from harmonikey_mmmity.statistics import KeyStatistics
+from harmonikey_mmmity.telemetry import EventSink
+from harmonikey_mmmity.graphemes import GraphemeWord, analyze_word, \
+                                        split_graphemes, same_grapheme, \
+                                        is_grapheme_prefix
 from harmonikey_mmmity.state import Training
 from blessed import keyboard
 from harmonikey_mmmity.gamemodes import Gamemode
@@ -11,21 +18,89 @@ class TextOverseer:
     Contains TextGenerator for generating text.
     Also contains strings "input", "current_word", "error"
     and Training to which is bound.
+    Whitespace between words is not part of current_word: it is
+    expected separately as "separator" (from TextSource.separator,
+    e. g. space, or from textgen.separator() on multiline sources),
+    so typing goes through two states: separator is typed first
+    (separator_typed characters of it so far), then the word.
+    Every typed character is also counted in key_stats
+    (per-character and per-bigram errors and latency)
+    and reported to events of training.
+    Text is matched by grapheme clusters, not by code points:
+    word is analyzed once into clusters (see graphemes.py),
+    and cluster consisting of several code points (e. g. letter
+    with combining mark) can be typed either at once or piece by piece.
+    On multiline sources (code) and on sources whose separator
+    has newline or tab, Enter and Tab type newline and tab.
+    On multiline sources indentation after newline is typed automatically.
     '''
+    AUTO_INDENT = (' ', '\t')
+    # Clusters accepted automatically after newline on multiline sources
+
+    WHITESPACE_KEYS = {
+        'KEY_ENTER': keyboard.Keystroke('\n'),
+        'KEY_TAB': keyboard.Keystroke('\t'),
+    }
+    # Keys which type whitespace when it can be expected
+
     def __init__(self, textgen: TextGenerator, training: Training):
         self.textgen: TextGenerator = textgen
         self.training: Training = training
-        self.current_word: str = self.textgen.current_word()
+        self.key_stats: KeyStatistics = training.key_stats
+        self.events: EventSink = training.events
+        self.multiline: bool = training.source.multiline
+        if self.multiline:
+            self.__next_separator: Callable[[], str] = textgen.separator
+            # Layout of text, e. g. newline and indentation
+        else:
+            separator = training.source.separator.value
+            self.__next_separator = lambda: separator
+            # Same string for every word, nothing is built
+        self.whitespace_keys: bool = self.multiline or \
+            any(char in training.source.separator.value
+                for char in '\n\t')
+        # Terminal reports Enter and Tab as sequences,
+        # they are mapped to whitespace if it has to be typed
+        self.separator: str = ''
+        # Whitespace expected before current_word, first word has none
+        self.separator_typed: int = 0
+        # Number of characters of separator typed correctly
+        self.current_word: str = ''
+        self.word: GraphemeWord = None
+        # current_word split into clusters, with their display widths
+        self.typed_clusters: int = 0
+        # Number of clusters of current_word typed correctly
+        self.pending: str = ''
+        # Typed beginning of multi-code-point cluster
         self.input: str = ''
         self.error: str = ''
+        self.__last_key_ns: int = 0
+        # Time of last correctly typed character, for latency
+        self.__set_word(self.textgen.current_word(), '')
+
+    def __set_word(self, word: str, separator: str):
+        '''
+        Makes word current and clears input.
+        '''
+        self.separator = separator
+        self.separator_typed = 0
+        self.current_word = word
+        self.word = analyze_word(word)
+        self.typed_clusters = 0
+        self.pending = ''
+        self.input = ''
 
     def __handle_backspace(self):
         '''
         Tries to erase last character from error
-        if backspace was pressed
+        if backspace was pressed.
+        Unfinished multi-code-point cluster is erased first.
         '''
-        if len(self.error) > 0:
-            self.error = self.error[:-1]
+        if len(self.pending) > 0:
+            self.pending = ''
+        elif len(self.error) > 0:
+            last_cluster = split_graphemes(self.error)[-1]
+            self.error = self.error[:-len(last_cluster)]
 
     def __complete_word(self):
         '''
@@ -33,23 +108,88 @@ class TextOverseer:
         Modifies training.statistics and sets current_word to next word.
         Clears input.
         '''
-        self.training.statistics.add_word(self.current_word)
-        self.input = ''
+        self.training.statistics.add_word(self.current_word, self.separator)
         self.textgen.next_word()
-        self.current_word = ' ' + self.textgen.current_word()
+        separator = self.__next_separator()
+        self.__set_word(self.textgen.current_word(), separator)
+
+    def __auto_indent(self):
+        '''
+        Accepts indentation of the new line without typing.
+        '''
+        while self.separator_typed < len(self.separator) and \
+                self.separator[self.separator_typed] in self.AUTO_INDENT:
+            self.separator_typed += 1
+
+    def __hit(self, needed: str, prev: str):
+        '''
+        Records correctly typed character.
+        '''
+        now = time.perf_counter_ns()
+        latency = now - self.__last_key_ns if self.__last_key_ns else 0
+        self.__last_key_ns = now
+        self.key_stats.add_hit(needed, prev, latency)
+        self.events.emit('key', char=needed, latency_ns=latency)
+
+    def __miss(self, needed: str, prev: str, typed: str):
+        '''
+        Records wrong character.
+        '''
+        self.key_stats.add_error(needed, prev)
+        self.events.emit('error', expected=needed, typed=str(typed))
+
+    def __try_add_separator(self, key: keyboard.Keystroke) -> bool:
+        '''
+        Tries to add character of separator.
+        Returns True if added, False otherwise
+        '''
+        needed = self.separator[self.separator_typed]
+        prev = self.separator[self.separator_typed - 1] \
+            if self.separator_typed > 0 else ''
+        if key != needed:
+            self.__miss(needed, prev, key)
+            return False
+
+        self.__hit(needed, prev)
+        self.separator_typed += 1
+        if needed == '\n' and self.multiline:
+            self.__auto_indent()
+        return True
 
     def __try_add(self, key: keyboard.Keystroke) -> bool:
         '''
         Tries to add character into input if it is correct.
+        While separator is not typed, character is matched against it.
+        If it is a correct beginning of current cluster,
+        it is kept in pending until the cluster is complete.
         Returns True if added, False otherwise
         '''
-        needed_char = self.current_word[len(self.input)]
-        if needed_char == key:
-            self.input += key
-            if self.input == self.current_word:
+        if self.separator_typed < len(self.separator):
+            return self.__try_add_separator(key)
+
+        needed_cluster = self.word.clusters[self.typed_clusters]
+        if self.typed_clusters > 0:
+            prev_cluster = self.word.clusters[self.typed_clusters - 1]
+        else:
+            prev_cluster = self.separator[-1:]
+        typed = self.pending + key
+
+        if same_grapheme(typed, needed_cluster):
+            self.__hit(needed_cluster, prev_cluster)
+            self.pending = ''
+            self.input += needed_cluster
+            self.typed_clusters += 1
+            if self.typed_clusters == len(self.word.clusters):
                 self.__complete_word()
 
             return True
+
+        if is_grapheme_prefix(typed, needed_cluster):
+            self.pending = typed
+            return True
+
+        self.pending = ''
+        self.__miss(needed_cluster, prev_cluster, typed)
         return False
 
     def __handle_no_errors(self, key: keyboard.Keystroke):
@@ -63,14 +203,16 @@ class TextOverseer:
         Is called if gamemode is FIX_ERRORS.
         Adds key to error if error is not empty
         or key does not match with current key from text.
+        Unfinished cluster which turned out wrong goes to error with key.
         '''
         if self.training.gamemode == Gamemode.FIX_ERRORS and \
            len(self.error) > 0:
             self.error += key
             return
 
+        pending = self.pending
         if not self.__try_add(key):
-            self.error += key
+            self.error += pending + key
 
     def __handle_die_errors(self, key):
         '''
@@ -80,26 +222,40 @@ class TextOverseer:
         if not self.__try_add(key):
             raise WrongCharacter
 
-    def handle_char(self, key: keyboard.Keystroke):
+    def __char_handler(self) -> Callable[[keyboard.Keystroke], None]:
         '''
-        Handles character from keyboard.
-        Ignores everything except backspace, delete and printable.
-        If backspace or delete, calls __handle_backspace().
-        Otherwise calls respective handler for current gamemode.
+        Returns handler of printable characters for current gamemode.
         '''
-        if key.name == 'KEY_BACKSPACE' or key.name == 'KEY_DELETE':
-            self.__handle_backspace()
-            return
-
-        if key.is_sequence:
-            return
-
         match self.training.gamemode:
             case Gamemode.NO_ERRORS:
-                self.__handle_no_errors(key)
+                return self.__handle_no_errors
             case Gamemode.DIE_ERRORS:
-                self.__handle_die_errors(key)
+                return self.__handle_die_errors
             case Gamemode.FIX_ERRORS:
-                self.__handle_fix_errors(key)
+                return self.__handle_fix_errors
             case _:
                 raise ValueError("Unknown gamemode")
+
+    def handle_char(self, key: keyboard.Keystroke):
+        '''
+        Handles character from keyboard.
+        Ignores everything except backspace, delete and printable.
+        If backspace or delete, calls __handle_backspace().
+        Otherwise calls respective handler for current gamemode.
+        '''
+        self.handle_chars([key])
+
+    def handle_chars(self, keys: List[keyboard.Keystroke]):
+        '''
+        Handles several characters typed at once (fast typing or paste),
+        same as calling handle_char() for each of them,
+        but gamemode handler is chosen once for the whole batch.
+        '''
+        handler = self.__char_handler()
+        for key in keys:
+            if key.name == 'KEY_BACKSPACE' or key.name == 'KEY_DELETE':
+                self.__handle_backspace()
+            elif self.whitespace_keys and key.name in self.WHITESPACE_KEYS:
+                handler(self.WHITESPACE_KEYS[key.name])
+            elif not key.is_sequence:
+                handler(key)
@@ -0,0 +1,292 @@
+import abc
+import threading
+from enum import Enum
+from importlib.metadata import entry_points, EntryPoint
+from typing import Dict, List, Set, Tuple
+
+from harmonikey_mmmity.text_generator import TextGenerator, TextgenType, \
+                                             RandomTextGenerator, \
+                                             AdaptiveTextGenerator, \
+                                             FileTextGenerator, \
+                                             CodeTextGenerator
+from harmonikey_mmmity.statistics import KeyStatistics
+from harmonikey_mmmity.checkpoints import Checkpoint
+from harmonikey_mmmity.vocab import VocabFilter
+from harmonikey_mmmity.exceptions import TextSourceError
+
+
+class SourceCost(Enum):
+    BLOCKING = 1
+    # Generator reads all its input when created,
+    # nothing can be done before training starts
+
+    PREFETCHABLE = 2
+    # Generator reads input lazily, its file can be
+    # prefetched in background while user is choosing parameters
+
+
+class Separator(Enum):
+    '''
+    What is typed between words.
+    '''
+    NONE = ''
+    # Words follow each other, e. g. drills of single characters
+
+    SPACE = ' '
+
+    NEWLINE = '\n'
+    # Enter after every word, e. g. lists of words
+
+
+class TextSource(abc.ABC):
+    '''
+    Kind of text for training, e. g. random words from vocabulary
+    or consecutive text from file. Creates TextGenerator for a file.
+    Plugins subclass it and register the class (or its instance)
+    in entry point group TextSourceRegistry.ENTRY_POINT_GROUP.
+    Class attributes:
+        name - name in text type switch, also prefix of text_tag
+        directory - assets directory with its files
+        cost - SourceCost of creating generator
+        resumable - if True, training can be paused and continued,
+            generator should then be FileTextGenerator-like
+            and support position() and resume offsets
+        separator - Separator typed between words
+        multiline - if True, text keeps its layout: words are separated
+            by generator's separator() instead of separator
+            and shown as lines of text,
+            generator should then be CodeTextGenerator-like
+        seedable - if True, create() accepts seed, and generators
+            with the same seed give the same text, e. g. for races
+        filterable - if True, create() accepts vocab_filter,
+            and only words of vocabulary matching it are used
+    '''
+    name: str = ''
+    directory: str = 'assets/vocabs'
+    cost: SourceCost = SourceCost.BLOCKING
+    resumable: bool = False
+    separator: Separator = Separator.SPACE
+    multiline: bool = False
+    seedable: bool = False
+    filterable: bool = False
+
+    POOLSIZE = 4
+    # Size of word pool for generators of random words
+
+    @abc.abstractmethod
+    def create(self, filename: str, key_stats: KeyStatistics,
+               resume: Checkpoint = None) -> TextGenerator:
+        '''
+        Returns new generator of text from filename.
+        key_stats are statistics of current training,
+        resume is saved checkpoint for resumable sources.
+        '''
+
+    def text_tag(self, filename: str) -> str:
+        '''
+        Returns text_tag under which results are saved.
+        '''
+        return self.name + '.' + filename
+
+    def prefetch(self, filename: str) -> None:
+        '''
+        Warms up reading of filename before training starts.
+        Is called in background thread for PREFETCHABLE sources.
+        '''
+
+
+class RandomSource(TextSource):
+    '''
+    Random words from vocabulary.
+    '''
+    name = TextgenType.RANDOM.name
+    seedable = True
+    filterable = True
+
+    def create(self, filename: str, key_stats: KeyStatistics,
+               resume: Checkpoint = None, seed: int = None,
+               vocab_filter: VocabFilter = None) -> TextGenerator:
+        return RandomTextGenerator(filename, self.POOLSIZE, seed,
+                                   vocab_filter)
+
+
+class AdaptiveSource(TextSource):
+    '''
+    Random words with user's weak keys.
+    '''
+    name = TextgenType.ADAPTIVE.name
+    filterable = True
+
+    def create(self, filename: str, key_stats: KeyStatistics,
+               resume: Checkpoint = None,
+               vocab_filter: VocabFilter = None) -> TextGenerator:
+        return AdaptiveTextGenerator(filename, self.POOLSIZE, key_stats,
+                                     vocab_filter)
+
+
+class FileSource(TextSource):
+    '''
+    Consecutive words from text file, read lazily.
+    '''
+    name = TextgenType.FILE.name
+    directory = 'assets/texts'
+    cost = SourceCost.PREFETCHABLE
+    resumable = True
+
+    PREFETCH_SIZE = FileTextGenerator.CHUNK_SIZE
+    # Generator reads only its first chunk when created
+
+    def create(self, filename: str, key_stats: KeyStatistics,
+               resume: Checkpoint = None) -> TextGenerator:
+        if resume is None:
+            return FileTextGenerator(filename)
+        return FileTextGenerator(filename, resume.offset, resume.word_index)
+        # Seeks directly to saved word
+
+    def text_tag(self, filename: str) -> str:
+        '''
+        Text files are saved without prefix.
+        '''
+        return filename
+
+    def prefetch(self, filename: str) -> None:
+        '''
+        Reads beginning of file, so it is in OS cache when training starts.
+        '''
+        try:
+            with open(filename, 'rb') as text_file:
+                text_file.read(self.PREFETCH_SIZE)
+        except OSError:
+            pass
+
+
+class CodeSource(TextSource):
+    '''
+    Tokens of source code file with its newlines and indentation.
+    Whole file is tokenized when training starts.
+    '''
+    name = TextgenType.CODE.name
+    directory = 'assets/code'
+    multiline = True
+
+    def create(self, filename: str, key_stats: KeyStatistics,
+               resume: Checkpoint = None) -> TextGenerator:
+        return CodeTextGenerator(filename)
+
+
+class TextSourceRegistry:
+    '''
+    All known text sources: built-in ones and plugins
+    from entry points of ENTRY_POINT_GROUP.
+    Plugins are only listed on startup, their modules are imported
+    when the source is selected for the first time.
+    Plugins which failed to load are not imported again.
+    '''
+    ENTRY_POINT_GROUP = 'harmonikey.text_sources'
+
+    BUILTIN = [RandomSource, FileSource, AdaptiveSource, CodeSource]
+    # Same order as in TextgenType
+
+    def __init__(self, discover: bool = True):
+        '''
+        Registers built-in sources and, if discover is True,
+        entry points of installed plugins without loading them.
+        '''
+        self.__sources: Dict[str, TextSource] = dict()
+        self.__entry_points: Dict[str, EntryPoint] = dict()
+        self.__prefetched: Set[Tuple[str, str]] = set()
+        self.__errors: Dict[str, str] = dict()
+        # Messages of plugins which failed to load
+        for source_class in self.BUILTIN:
+            self.__sources[source_class.name] = source_class()
+        if discover:
+            for entry_point in entry_points(group=self.ENTRY_POINT_GROUP):
+                self.add_entry_point(entry_point)
+
+    def add_entry_point(self, entry_point: EntryPoint):
+        '''
+        Registers plugin which is loaded on first use.
+        Built-in sources can not be replaced.
+        '''
+        if entry_point.name not in self.__sources:
+            self.__entry_points[entry_point.name] = entry_point
+
+    def names(self) -> List[str]:
+        '''
+        Returns names of all sources, built-in first.
+        '''
+        return list(self.__sources.keys()) + \
+            sorted(name for name in self.__entry_points.keys()
+                   if name not in self.__sources)
+
+    def get(self, name) -> TextSource:
+        '''
+        Returns source by name, loads plugin if needed.
+        TextgenType members are accepted as names of built-in sources.
+        Raises TextSourceError if there is no such source
+        or plugin can not be loaded.
+        '''
+        if isinstance(name, TextgenType):
+            name = name.name
+        source = self.__sources.get(name)
+        if source is not None:
+            return source
+        if name not in self.__entry_points:
+            raise TextSourceError(f'Unknown text source {name}')
+        if name in self.__errors:
+            raise TextSourceError(self.__errors[name])
+
+        try:
+            loaded = self.__entry_points[name].load()
+            if isinstance(loaded, type):
+                loaded = loaded()
+        except Exception as error:
+            self.__errors[name] = f'Can not load text source {name}: {error}'
+            raise TextSourceError(self.__errors[name])
+        if not isinstance(loaded, TextSource):
+            self.__errors[name] = f'{name} is not a TextSource'
+            raise TextSourceError(self.__errors[name])
+        loaded.name = name
+        self.__sources[name] = loaded
+        return loaded
+
+    def parse_text_tag(self, text_tag: str) -> Tuple[str, str]:
+        '''
+        Returns (source name, filename) of saved text_tag.
+        Tags without known prefix belong to text files.
+        Plugins are not loaded for this.
+        '''
+        for name in self.names():
+            if text_tag.startswith(name + '.'):
+                return name, text_tag[len(name) + 1:]
+        return FileSource.name, text_tag
+
+    def prefetch(self, name: str, filename: str) -> None:
+        '''
+        Starts prefetching filename in background thread
+        if source is PREFETCHABLE. Every file is prefetched once.
+        '''
+        try:
+            source = self.get(name)
+        except TextSourceError:
+            return
+        if source.cost != SourceCost.PREFETCHABLE or \
+           (source.name, filename) in self.__prefetched:
+            return
+        self.__prefetched.add((source.name, filename))
+        threading.Thread(target=source.prefetch, args=(filename,),
+                         daemon=True).start()
+
+
+_registry: TextSourceRegistry = None
+
+
+def get_registry() -> TextSourceRegistry:
+    '''
+    Returns registry shared by the whole program,
+    entry points are discovered on first call.
+    '''
+    global _registry
+    if _registry is None:
+        _registry = TextSourceRegistry()
+    return _registry
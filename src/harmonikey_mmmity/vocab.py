@@ -0,0 +1,222 @@
+import hashlib
+import os
+from array import array
+from typing import Dict, FrozenSet, List, NamedTuple
+
+from harmonikey_mmmity.library import estimate_difficulty
+
+
+CHARSETS = {
+    'home': 'asdfghjkl',
+    'top': 'qwertyuiop',
+    'bottom': 'zxcvbnm',
+    'left': 'qwertasdfgzxcvb',
+    'right': 'yuiophjklnm',
+}
+# Named character sets of QWERTY rows and hands for filters
+
+
+class VocabFilter(NamedTuple):
+    '''
+    Which words of vocabulary are used.
+    Lengths are in characters, max_length 0 means no limit.
+    Empty charset allows any characters, otherwise every character
+    of word must be in it. Difficulty of single word is estimated
+    like difficulty of text in library, from 0 to 1.
+    '''
+    min_length: int = 0
+    max_length: int = 0
+    charset: str = ''
+    min_difficulty: float = 0.0
+    max_difficulty: float = 1.0
+
+    @classmethod
+    def parse(cls, text: str):
+        '''
+        Returns filter from string like "len=5-8 chars=home diff=0-0.3".
+        Missing parts are not limited, a single number means
+        the lower bound of range, chars is either name of
+        one of CHARSETS or allowed characters themselves.
+        Raises ValueError if text is malformed.
+        '''
+        fields = dict()
+        for part in text.split():
+            key, separator, value = part.partition('=')
+            if separator == '' or value == '':
+                raise ValueError(f'Wrong filter part {part}')
+            match key:
+                case 'len':
+                    low, _, high = value.partition('-')
+                    fields['min_length'] = int(low)
+                    fields['max_length'] = int(high) if high != '' else 0
+                case 'chars':
+                    fields['charset'] = CHARSETS.get(value, value)
+                case 'diff':
+                    low, _, high = value.partition('-')
+                    fields['min_difficulty'] = float(low)
+                    if high != '':
+                        fields['max_difficulty'] = float(high)
+                case _:
+                    raise ValueError(f'Unknown filter {key}')
+        return cls(**fields)
+
+    def is_empty(self) -> bool:
+        '''
+        Returns True if filter lets every word through.
+        '''
+        return self == VocabFilter()
+
+    def signature(self) -> str:
+        '''
+        Returns string which is equal for filters with equal effect,
+        e. g. order of characters in charset does not matter.
+        '''
+        charset = ''.join(sorted(set(self.charset)))
+        return f'len={self.min_length}-{self.max_length};' + \
+               f'chars={charset};' + \
+               f'diff={self.min_difficulty:g}-{self.max_difficulty:g}'
+
+
+def word_difficulty(word: str) -> float:
+    '''
+    Returns difficulty of word as if it was a text of one word.
+    '''
+    symbol_count = 0
+    upper_count = 0
+    for char in word:
+        if not char.isalpha():
+            symbol_count += 1
+        elif char.isupper():
+            upper_count += 1
+    return estimate_difficulty(1, len(word), symbol_count, upper_count)
+
+
+class Vocabulary:
+    '''
+    Words of vocabulary file and its filtered views.
+    A view is array of indices of matching words, it is computed once
+    per filter signature: then it is kept in memory and saved
+    into CACHE_DIRECTORY, keyed by signature and by size and mtime
+    of vocabulary file, so view of changed file is computed again.
+    Lengths and difficulties of words are computed once
+    for all filters, when the first view is built.
+    '''
+    CACHE_DIRECTORY = 'assets/.vocab_cache'
+    TYPECODE = 'I'
+
+    def __init__(self, filename: str, cache_directory: str = None):
+        '''
+        Reads words of filename, views are cached
+        in CACHE_DIRECTORY by default.
+        Raises OSError if it can not be read.
+        '''
+        self.filename: str = filename
+        self.cache_directory: str = cache_directory or self.CACHE_DIRECTORY
+        stat = os.stat(filename)
+        self.version: str = f'{stat.st_size}:{stat.st_mtime_ns}'
+        # Views of other versions of file are not used
+        with open(filename, 'r') as file:
+            self.words: List[str] = file.read().split()
+        self.__views: Dict[str, array] = dict()
+        self.__lengths: array = None
+        self.__difficulties: array = None
+
+    def __cache_path(self, signature: str) -> str:
+        key = '\0'.join([os.path.abspath(self.filename), self.version,
+                         signature])
+        name = hashlib.sha1(key.encode()).hexdigest() + '.idx'
+        return os.path.join(self.cache_directory, name)
+
+    def __load_view(self, path: str) -> array:
+        '''
+        Returns view saved at path, or None if it is missing or broken.
+        '''
+        view = array(self.TYPECODE)
+        try:
+            with open(path, 'rb') as view_file:
+                view.frombytes(view_file.read())
+        except (OSError, ValueError):
+            return None
+        if len(view) > 0 and max(view) >= len(self.words):
+            return None
+        return view
+
+    def __save_view(self, path: str, view: array):
+        '''
+        Saves view atomically, views are only a cache,
+        so errors are ignored.
+        '''
+        try:
+            os.makedirs(self.cache_directory, exist_ok=True)
+            with open(path + '.tmp', 'wb') as view_file:
+                view.tofile(view_file)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            pass
+
+    def __compile(self, vocab_filter: VocabFilter) -> array:
+        '''
+        Returns indices of words matching vocab_filter.
+        '''
+        if self.__lengths is None:
+            self.__lengths = array('I', map(len, self.words))
+            self.__difficulties = array('d', map(word_difficulty, self.words))
+
+        max_length = vocab_filter.max_length or max(self.__lengths, default=0)
+        allowed: FrozenSet[str] = frozenset(vocab_filter.charset)
+        view = array(self.TYPECODE)
+        for index, word in enumerate(self.words):
+            if not vocab_filter.min_length <= self.__lengths[index] \
+                    <= max_length:
+                continue
+            if not vocab_filter.min_difficulty <= \
+                    self.__difficulties[index] <= vocab_filter.max_difficulty:
+                continue
+            if len(allowed) > 0 and not allowed.issuperset(word):
+                continue
+            view.append(index)
+        return view
+
+    def view(self, vocab_filter: VocabFilter) -> array:
+        '''
+        Returns array of indices of words matching vocab_filter,
+        from memory, from disk cache or computed.
+        '''
+        signature = vocab_filter.signature()
+        if signature in self.__views:
+            return self.__views[signature]
+
+        path = self.__cache_path(signature)
+        view = self.__load_view(path)
+        if view is None:
+            view = self.__compile(vocab_filter)
+            self.__save_view(path, view)
+        self.__views[signature] = view
+        return view
+
+    def filtered(self, vocab_filter: VocabFilter) -> List[str]:
+        '''
+        Returns words matching vocab_filter.
+        '''
+        if vocab_filter.is_empty():
+            return self.words
+        return [self.words[index] for index in self.view(vocab_filter)]
+
+
+_vocabularies: Dict[str, Vocabulary] = dict()
+
+
+def get_vocabulary(filename: str) -> Vocabulary:
+    '''
+    Returns vocabulary of filename shared by the whole program,
+    so its views are reused by next trainings.
+    It is read again if file has changed.
+    Raises OSError if file can not be read.
+    '''
+    vocabulary = _vocabularies.get(filename)
+    stat = os.stat(filename)
+    if vocabulary is None or \
+       vocabulary.version != f'{stat.st_size}:{stat.st_mtime_ns}':
+        vocabulary = Vocabulary(filename)
+        _vocabularies[filename] = vocabulary
+    return vocabulary
@@ -1,7 +1,7 @@
-from blessed import Terminal
+from harmonikey_mmmity.terminal import get_terminal
 from blessed.keyboard import Keystroke
 from abc import ABC, abstractmethod
-from typing import Callable
+from typing import Callable, Dict, List
 from enum import EnumType
 from typing_extensions import override
 from string import digits
@@ -43,7 +43,7 @@ class Button(Widget):
         Returns title.
         If button is active, text is highlighted with cyan.
         '''
-        term = Terminal()
+        term = get_terminal()
         if is_active:
             return term.on_cyan3(self.title)
         return self.title
@@ -77,7 +77,7 @@ class TextInput(Widget):
         If active, text is highlighted with cyan
         and the cursor is also highlighted.
         '''
-        term = Terminal()
+        term = get_terminal()
         text = self.title + self.input
         if is_active:
             return term.on_cyan3(text) + term.on_white(' ')
@@ -136,7 +136,7 @@ class NumberInput(TextInput):
         If active, text is highlighted with cyan
         and the cursor is also highlighted.
         '''
-        term = Terminal()
+        term = get_terminal()
         if self.input == '':
             text = self.title + self.default
         else:
@@ -158,14 +158,16 @@ class NumberInput(TextInput):
 class Switch(Widget):
     '''
     This class represents switch widget.
-    Has Enum of options and current option.
+    Has list of options and current option.
+    Options are members of Enum or any values, e. g. names.
     Can switch back and forth using keys 'z' and 'x'
     '''
-    def __init__(self, options: EnumType, title: str = ''):
+    def __init__(self, options: EnumType | List, title: str = ''):
         '''
         Initializes options and current_option
+        (index of option starting from 1)
         '''
-        self.options: EnumType = options
+        self.options: List = list(options)
         self.current_option: int = 1
         self.title: str = title
 
@@ -174,8 +176,8 @@ class Switch(Widget):
         Returns name of current_option.
         If is_active == True, it is highlighted with cyan
         '''
-        term = Terminal()
-        text = self.title + str(self.options(self.current_option))
+        term = get_terminal()
+        text = self.title + str(self.get_current_option())
         if is_active:
             return term.on_cyan3(text)
         return text
@@ -207,4 +209,107 @@ class Switch(Widget):
             self.__move_forth()
 
     def get_current_option(self):
-        return self.options(self.current_option)
+        return self.options[self.current_option - 1]
+
+    def select(self, option) -> bool:
+        '''
+        Makes option current.
+        Returns False if there is no such option.
+        '''
+        if option not in self.options:
+            return False
+        self.current_option = self.options.index(option) + 1
+        return True
+
+
+class ScrollList(Widget):
+    '''
+    Represents a scrollable list of rows.
+    Only rows that fit into height are formatted with format_item,
+    and formatted rows are cached by their index in items,
+    so browsing long lists costs only as much as one screen.
+    Can be scrolled with PgUp/PgDown by pages and Home/End.
+    '''
+    def __init__(self, format_item: Callable, height: int = 1):
+        '''
+        Initializes empty list, format_item is called as format_item(item)
+        and should return one formatted row.
+        '''
+        self.format_item: Callable = format_item
+        self.items: List = []
+        self.height: int = max(1, height)
+        self.offset: int = 0
+        self.__cache: Dict[int, str] = dict()
+
+    def set_items(self, items: List, keep_offset: bool = False):
+        '''
+        Replaces all items, scrolls to the top and drops cached rows.
+        If keep_offset is True, scroll position is kept,
+        e. g. when items grow while they are loaded.
+        '''
+        self.items = items
+        if keep_offset:
+            self.__clamp_offset()
+        else:
+            self.offset = 0
+        self.__cache.clear()
+
+    def set_height(self, height: int):
+        '''
+        Sets number of visible rows.
+        '''
+        self.height = max(1, height)
+        self.__clamp_offset()
+
+    def __clamp_offset(self):
+        '''
+        Keeps offset inside the list, so the last page is always full.
+        '''
+        max_offset = max(0, len(self.items) - self.height)
+        self.offset = min(max(self.offset, 0), max_offset)
+
+    def __row(self, index: int) -> str:
+        '''
+        Returns formatted row for items[index], formats it only once.
+        '''
+        if index not in self.__cache:
+            self.__cache[index] = self.format_item(self.items[index])
+        return self.__cache[index]
+
+    def visible_rows(self) -> List[str]:
+        '''
+        Returns formatted rows which are currently visible.
+        '''
+        end = min(len(self.items), self.offset + self.height)
+        return [self.__row(index) for index in range(self.offset, end)]
+
+    def position_str(self) -> str:
+        '''
+        Returns string like "rows 1-20 of 1000".
+        '''
+        if len(self.items) == 0:
+            return 'no rows'
+        end = min(len(self.items), self.offset + self.height)
+        return f'rows {self.offset + 1}-{end} of {len(self.items)}'
+
+    def visualize_str(self, is_active: bool) -> str:
+        '''
+        Returns visible rows separated by newlines.
+        '''
+        return '\n'.join(self.visible_rows())
+
+    def handle_key(self, key: Keystroke):
+        '''
+        PgUp/PgDown scroll by one page, Home/End to the first/last page.
+        Otherwise does nothing.
+        '''
+        match key.name:
+            case 'KEY_PGUP':
+                self.offset -= self.height
+            case 'KEY_PGDOWN':
+                self.offset += self.height
+            case 'KEY_HOME':
+                self.offset = 0
+            case 'KEY_END':
+                self.offset = len(self.items)
+        self.__clamp_offset()
@@ -0,0 +1,91 @@
+import unittest
+from harmonikey_mmmity.aggregate import Aggregate, aggregate_files, \
+                                        find_files, percentile, write_csv, \
+                                        main
+import io
+import os
+import random
+import shutil
+from contextlib import redirect_stdout, redirect_stderr
+
+
+class TestAggregate(unittest.TestCase):
+    NANOSECONDS_IN_SECOND = 1000000000
+
+    def write_rows(self, filename: str, rows: list):
+        with open(os.path.join(self.dirname, filename), 'w') as stats_file:
+            for row in rows:
+                stats_file.write(';'.join(map(str, row)) + '\n')
+
+    def setUp(self):
+        # Adding random bytes to dirname
+        # so no collisions with existing files happen
+        self.dirname = random.randbytes(8).hex() + 'stats'
+        os.makedirs(os.path.join(self.dirname, 'machine2'))
+        second = self.NANOSECONDS_IN_SECOND
+        self.write_rows('stats.csv', [
+            ['mmmity', 'text', 'Gamemode.NO_ERRORS', 10, 50, 60 * second, 0.0, 1],
+            ['mmmity', 'text', 'Gamemode.NO_ERRORS', 20, 90, 60 * second, 0.0, 0],
+            ['rom4ik', 'text', 'Gamemode.NO_ERRORS', 30, 150, 60 * second, 0.0, 2],
+        ])
+        self.write_rows('machine2/stats.csv', [
+            ['mmmity', 'text', 'Gamemode.NO_ERRORS', 40, 200, 60 * second, 0.0, 3],
+            ['leha', 'other', 'Gamemode.FIX_ERRORS', 5, 20, 30 * second, 0.0, 0],
+        ])
+        with open(os.path.join(self.dirname, 'bad.csv'), 'w') as bad_file:
+            bad_file.write(';;;;;;;;;;;')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 90), 90)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_find_files(self):
+        files = find_files([self.dirname])
+        self.assertEqual(len(files), 3)
+        files = find_files([os.path.join(self.dirname, 's*.csv')])
+        self.assertEqual(len(files), 1)
+
+    def test_merge(self):
+        files = find_files([self.dirname])
+        serial = aggregate_files(files, 1)
+        parallel = aggregate_files(files, 2)
+
+        for aggregate in [serial, parallel]:
+            self.assertEqual(aggregate.files, 2)
+            self.assertEqual(len(aggregate.errors), 1)
+            self.assertEqual(aggregate.counts[('mmmity', 'text')], 3)
+            self.assertEqual(aggregate.best[('mmmity', 'text')].word_count, 40)
+            self.assertEqual(aggregate.wpms['text'], [10, 20, 30, 40])
+            self.assertEqual(aggregate.wpms['other'], [10])
+
+            leaderboard = aggregate.leaderboard('text')
+            self.assertEqual([entry.user for entry in leaderboard],
+                             ['mmmity', 'rom4ik'])
+
+    def test_missing_file(self):
+        aggregate = Aggregate.from_file(self.dirname + '/nonexistent.csv')
+        self.assertEqual(aggregate.files, 0)
+        self.assertEqual(len(aggregate.errors), 1)
+
+    def test_csv(self):
+        aggregate = aggregate_files(find_files([self.dirname]), 1)
+        out = io.StringIO()
+        write_csv(aggregate, out)
+        rows = out.getvalue().splitlines()
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1].split(';')[:4], ['leha', 'other', '1', '10.00'])
+
+    def test_main(self):
+        out = io.StringIO()
+        with redirect_stdout(out), redirect_stderr(io.StringIO()):
+            self.assertEqual(main(['-j', '1', self.dirname]), 0)
+        self.assertIn('mmmity: 40.00 wpm', out.getvalue())
+
+        with redirect_stderr(io.StringIO()):
+            self.assertEqual(main([self.dirname + '/nothing*.csv']), 1)
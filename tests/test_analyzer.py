@@ -0,0 +1,121 @@
+import unittest
+from harmonikey_mmmity.analyzer import TextAnalyzer, profile_file
+from harmonikey_mmmity.library import Library
+import os
+import random
+import json
+import shutil
+import threading
+
+
+class TestAnalyzer(unittest.TestCase):
+
+    def write_file(self, path: str, text: str):
+        with open(os.path.join(self.root, path), 'w') as out_file:
+            out_file.write(text)
+
+    def setUp(self):
+        self.root = random.randbytes(8).hex() + 'analyzer'
+        os.makedirs(os.path.join(self.root, 'assets/texts'))
+        os.makedirs(os.path.join(self.root, 'assets/vocabs'))
+        os.makedirs(os.path.join(self.root, 'assets/code'))
+        self.write_file('assets/texts/plain.txt',
+                        'the cat and the hat ' * 20)
+        self.write_file('assets/texts/hard.txt',
+                        'Quixotic, (zephyr)-jinx; vexed? ' * 20)
+        self.write_file('assets/vocabs/words.txt', 'the\nand\nthat\nhat\n')
+        self.write_file('assets/code/main.py', 'print(1)\n')
+        self.library = Library(self.root)
+        self.library.refresh()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_profile(self):
+        path = os.path.join(self.root, 'assets/vocabs/words.txt')
+        profile = profile_file(path, 'assets/vocabs/words.txt', 1, 2)
+        self.assertEqual(profile.word_count, 4)
+        self.assertAlmostEqual(profile.avg_word_length, 3.25)
+        self.assertAlmostEqual(profile.char_frequencies['h'], 3 / 13,
+                               places=5)
+        self.assertEqual(profile.bigram_counts['ha'], 2)
+        self.assertEqual(profile.punctuation_density, 0.0)
+        self.assertEqual((profile.size, profile.mtime), (1, 2))
+        self.assertIsNone(profile_file(path + '.missing', 'x', 0, 0))
+
+    def test_refresh(self):
+        analyzer = TextAnalyzer(self.root, max_workers=2)
+        self.assertEqual(analyzer.refresh(self.library), 3)
+        # Code is not analyzed, files are analyzed by pool
+        self.assertIsNone(analyzer.get('assets/code/main.py'))
+
+        hard = 'assets/texts/hard.txt'
+        plain = 'assets/texts/plain.txt'
+        self.assertGreater(analyzer.get(hard).punctuation_density, 0.2)
+        self.assertGreater(analyzer.bigram_rarity(hard),
+                           analyzer.bigram_rarity(plain))
+        self.assertGreater(analyzer.speed_factor(hard), 1.0)
+        self.assertLess(analyzer.speed_factor(plain), 1.0)
+        self.assertEqual(analyzer.speed_factor('assets/texts/none.txt'), 1.0)
+        self.assertAlmostEqual(analyzer.normalize_wpm(50.0, hard),
+                               50.0 * analyzer.speed_factor(hard))
+
+        self.assertEqual(analyzer.refresh(self.library), 0)
+        # Nothing changed, nothing is reanalyzed
+
+    def test_readers_not_blocked(self):
+        analyzer = TextAnalyzer(self.root)
+        started = threading.Event()
+        finish = threading.Event()
+
+        def slow_analyze(files):
+            started.set()
+            finish.wait(5)
+            return []
+
+        analyzer._TextAnalyzer__analyze = slow_analyze
+        refresh = threading.Thread(target=analyzer.refresh,
+                                   args=(self.library,))
+        refresh.start()
+        self.assertTrue(started.wait(5))
+        self.assertEqual(analyzer.speed_factor('assets/texts/hard.txt'), 1.0)
+        # Is answered while files are being analyzed
+        finish.set()
+        refresh.join(5)
+
+    def test_index(self):
+        TextAnalyzer(self.root).refresh(self.library)
+        self.assertTrue(os.path.exists(os.path.join(self.root,
+                                                    TextAnalyzer.INDEX)))
+        analyzer = TextAnalyzer(self.root)
+        self.assertGreater(analyzer.speed_factor('assets/texts/hard.txt'),
+                           1.0)
+        # Profiles are loaded from index
+        self.assertEqual(analyzer.refresh(self.library), 0)
+
+        self.write_file('assets/vocabs/words.txt', 'zebra')
+        os.remove(os.path.join(self.root, 'assets/texts/plain.txt'))
+        self.library.refresh()
+        self.assertEqual(analyzer.refresh(self.library), 1)
+        # Only changed file is analyzed, in this process
+        self.assertEqual(analyzer.get('assets/vocabs/words.txt').word_count,
+                         1)
+        self.assertIsNone(analyzer.get('assets/texts/plain.txt'))
+
+    def test_malformed_index(self):
+        TextAnalyzer(self.root).refresh(self.library)
+        index_path = os.path.join(self.root, TextAnalyzer.INDEX)
+        with open(index_path) as index_file:
+            index = json.load(index_file)
+        index['assets/texts/hard.txt']['bigram_counts'] = None
+        index['assets/texts/plain.txt']['size'] = 'big'
+        index['assets/vocabs/words.txt']['char_frequencies'] = {'a': []}
+        with open(index_path, 'w') as index_file:
+            json.dump(index, index_file)
+
+        analyzer = TextAnalyzer(self.root)
+        self.assertEqual(analyzer.speed_factor('assets/texts/hard.txt'), 1.0)
+        self.assertIsNone(analyzer.get('assets/texts/plain.txt'))
+        self.assertIsNone(analyzer.get('assets/vocabs/words.txt'))
+        # Malformed profiles are dropped and analyzed again
+        self.assertEqual(analyzer.refresh(self.library), 3)
@@ -0,0 +1,57 @@
+import unittest
+from harmonikey_mmmity.checkpoints import Checkpoint, CheckpointStore
+import os
+import random
+
+
+class TestCheckpointStore(unittest.TestCase):
+
+    def setUp(self):
+        # Adding random bytes to filename
+        # so no collisions with existing files happen
+        self.filename = random.randbytes(8).hex() + 'checkpoints.json'
+        self.checkpoint = Checkpoint(
+            user='mmmity',
+            text_tag='assets/texts/war_and_peace.txt',
+            word_index=1000,
+            offset=6000,
+            word_count=1000,
+            character_count=5500,
+            error_count=3,
+            elapsed=300 * 1000000000,
+        )
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_put_get(self):
+        store = CheckpointStore(self.filename)
+        self.assertIsNone(store.get('mmmity', self.checkpoint.text_tag))
+        store.put(self.checkpoint)
+        self.assertEqual(store.get('mmmity', self.checkpoint.text_tag),
+                         self.checkpoint)
+        self.assertIsNone(store.get('rom4ik', self.checkpoint.text_tag))
+
+        loaded = CheckpointStore(self.filename)
+        self.assertEqual(loaded.get('mmmity', self.checkpoint.text_tag),
+                         self.checkpoint)
+
+    def test_replace_remove(self):
+        store = CheckpointStore(self.filename)
+        store.put(self.checkpoint)
+        store.put(self.checkpoint._replace(word_index=2000))
+        self.assertEqual(len(store.checkpoints), 1)
+        self.assertEqual(store.get('mmmity', self.checkpoint.text_tag).word_index,
+                         2000)
+
+        store.remove('mmmity', self.checkpoint.text_tag)
+        store.remove('mmmity', self.checkpoint.text_tag)
+        self.assertIsNone(CheckpointStore(self.filename).get(
+            'mmmity', self.checkpoint.text_tag
+        ))
+
+    def test_malformed(self):
+        with open(self.filename, 'w') as bad_file:
+            bad_file.write('{"a": {"user": "x"}, "b": ')
+        self.assertEqual(CheckpointStore(self.filename).checkpoints, {})
@@ -0,0 +1,91 @@
+import unittest
+from harmonikey_mmmity.export import ColumnarWriter, ColumnarReader, \
+                                     export_files, main
+from harmonikey_mmmity.statistics import FileStatistics
+import io
+import os
+import random
+import shutil
+from contextlib import redirect_stderr
+
+
+class TestExport(unittest.TestCase):
+    NANOSECONDS_IN_SECOND = 1000000000
+
+    def write_rows(self, filename: str, rows: list):
+        with open(os.path.join(self.dirname, filename), 'w') as stats_file:
+            for row in rows:
+                stats_file.write(';'.join(map(str, row)) + '\n')
+
+    def setUp(self):
+        # Adding random bytes to dirname
+        # so no collisions with existing files happen
+        self.dirname = random.randbytes(8).hex() + 'export'
+        os.makedirs(self.dirname)
+        second = self.NANOSECONDS_IN_SECOND
+        self.write_rows('stats.csv', [
+            ['mmmity', 'text', 'Gamemode.NO_ERRORS', 10, 50, 60 * second, 0.0, 1],
+            ['rom4ik', 'text', 'Gamemode.NO_ERRORS', 30, 150, 60 * second, 0.0, 2],
+            ['mmmity', 'другой', 'Gamemode.FIX_ERRORS', 5, 20, 30 * second, 15.0, 0],
+        ])
+        self.output = os.path.join(self.dirname, 'stats.hkc')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_roundtrip(self):
+        stats_file = os.path.join(self.dirname, 'stats.csv')
+        entries = list(FileStatistics.iter_file(stats_file))
+        out = io.BytesIO()
+        with ColumnarWriter(out, chunk_size=2) as writer:
+            writer.write_all(entries)
+
+        out.seek(0)
+        reader = ColumnarReader(out)
+        chunks = list(reader.chunks())
+        self.assertEqual([len(chunk['wpm']) for chunk in chunks], [2, 1])
+        self.assertEqual(reader.dictionaries['user'], ['mmmity', 'rom4ik'])
+        self.assertEqual(list(chunks[1]['user']), [0])
+        self.assertEqual(list(chunks[0]['text_tag']), [0, 0])
+
+        out.seek(0)
+        self.assertEqual(list(ColumnarReader(out).entries()), entries)
+
+    def test_malformed(self):
+        with self.assertRaises(ValueError):
+            ColumnarReader(io.BytesIO(b'not a columnar file'))
+
+        out = io.BytesIO()
+        with ColumnarWriter(out) as writer:
+            writer.write_all(FileStatistics.iter_file(
+                os.path.join(self.dirname, 'stats.csv')
+            ))
+        truncated = io.BytesIO(out.getvalue()[:-20])
+        with self.assertRaises(ValueError):
+            list(ColumnarReader(truncated).chunks())
+
+    def test_export_files(self):
+        rows = export_files([os.path.join(self.dirname, 'stats.csv')],
+                            self.output)
+        self.assertEqual(rows, 3)
+        with open(self.output, 'rb') as in_file:
+            self.assertEqual(len(list(ColumnarReader(in_file).entries())), 3)
+
+        with open(os.path.join(self.dirname, 'bad.csv'), 'w') as bad_file:
+            bad_file.write(';;;;;;;;;;;')
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            self.assertEqual(main([self.dirname, '-o', self.output]), 1)
+        self.assertIn('Export failed', stderr.getvalue())
+        self.assertFalse(os.path.exists(self.output + '.tmp'))
+
+    def test_negative_counts(self):
+        self.write_rows('stats.csv', [
+            ['mmmity', 'text', 'Gamemode.NO_ERRORS', 10, -50,
+             self.NANOSECONDS_IN_SECOND, 0.0, 1],
+        ])
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            self.assertEqual(main([self.dirname, '-o', self.output]), 1)
+        self.assertIn('Wrong file format', stderr.getvalue())
+        self.assertFalse(os.path.exists(self.output))
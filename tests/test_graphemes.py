@@ -0,0 +1,35 @@
+import unittest
+from harmonikey_mmmity.graphemes import analyze_word, split_graphemes, \
+                                        display_width, same_grapheme, \
+                                        is_grapheme_prefix
+
+
+class TestGraphemes(unittest.TestCase):
+
+    def test_split(self):
+        self.assertEqual(split_graphemes(''), ())
+        self.assertEqual(split_graphemes('abc'), ('a', 'b', 'c'))
+        self.assertEqual(split_graphemes('éa'), ('é', 'a'))
+        self.assertEqual(split_graphemes('\r\nx'), ('\r\n', 'x'))
+        self.assertEqual(split_graphemes('👨‍👩‍👧!'),
+                         ('👨‍👩‍👧', '!'))
+        self.assertEqual(split_graphemes('🇷🇺🇬🇧'), ('🇷🇺', '🇬🇧'))
+
+    def test_width(self):
+        self.assertEqual(display_width('abc'), 3)
+        self.assertEqual(display_width('é'), 1)
+        self.assertEqual(display_width('日本'), 4)
+        self.assertEqual(display_width('👍🏽'), 2)
+        self.assertEqual(display_width('❤️'), 2)
+
+        word = analyze_word('a日')
+        self.assertEqual(word.boundaries, (0, 1, 2))
+        self.assertEqual(word.widths, (1, 2))
+
+    def test_matching(self):
+        self.assertTrue(same_grapheme('é', 'é'))
+        self.assertTrue(same_grapheme('é', 'é'))
+        self.assertFalse(same_grapheme('e', 'é'))
+        self.assertTrue(is_grapheme_prefix('e', 'é'))
+        self.assertTrue(is_grapheme_prefix('👍', '👍🏽'))
+        self.assertFalse(is_grapheme_prefix('a', 'é'))
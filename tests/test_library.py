@@ -0,0 +1,86 @@
+import unittest
+from harmonikey_mmmity.library import Library, fuzzy_score, \
+                                      estimate_difficulty
+import os
+import random
+import shutil
+
+
+class TestLibrary(unittest.TestCase):
+
+    def write_file(self, path: str, text: str):
+        with open(os.path.join(self.root, path), 'w') as out_file:
+            out_file.write(text)
+
+    def setUp(self):
+        # Adding random bytes to dirname
+        # so no collisions with existing files happen
+        self.root = random.randbytes(8).hex() + 'library'
+        os.makedirs(os.path.join(self.root, 'assets/texts/books'))
+        os.makedirs(os.path.join(self.root, 'assets/vocabs'))
+        self.write_file('assets/texts/lorem.txt', 'Lorem ipsum dolor')
+        self.write_file('assets/texts/books/war_and_peace.txt', 'a b c d')
+        self.write_file('assets/vocabs/top1000_english.txt', 'the\nof\nand')
+        self.write_file('assets/vocabs/top10000_english_long.txt', 'abcdefg')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_refresh(self):
+        library = Library(self.root)
+        self.assertEqual(library.refresh(), 4)
+        item = library.get('assets/texts/lorem.txt')
+        self.assertEqual(item.word_count, 3)
+        self.assertEqual(item.name, 'lorem.txt')
+        self.assertAlmostEqual(item.avg_word_length, 5.0)
+        self.assertEqual(library.get('assets/texts/books/war_and_peace.txt').name,
+                         'books/war_and_peace.txt')
+        self.assertIsNone(library.get('assets/texts/nonexistent.txt'))
+
+        self.assertEqual(library.refresh(), 0)
+        # Nothing changed, nothing is reanalyzed
+
+        self.write_file('assets/texts/lorem.txt', 'Lorem ipsum')
+        os.remove(os.path.join(self.root, 'assets/vocabs/top1000_english.txt'))
+        self.assertEqual(library.refresh(), 1)
+        self.assertEqual(library.get('assets/texts/lorem.txt').word_count, 2)
+        self.assertIsNone(library.get('assets/vocabs/top1000_english.txt'))
+
+    def test_manifest(self):
+        Library(self.root).refresh()
+        self.assertTrue(os.path.exists(os.path.join(self.root, Library.MANIFEST)))
+
+        library = Library(self.root)
+        self.assertEqual(library.refresh(), 0)
+        # Metadata is loaded from manifest
+        self.assertEqual(library.get('assets/texts/lorem.txt').word_count, 3)
+
+    def test_search(self):
+        library = Library(self.root)
+        library.refresh()
+
+        names = [item.name for item in library.search('assets/vocabs', 'long')]
+        self.assertEqual(names, ['top10000_english_long.txt'])
+
+        names = [item.name for item in library.search('assets/vocabs', 'top')]
+        self.assertEqual(names, ['top1000_english.txt',
+                                 'top10000_english_long.txt'])
+
+        names = [item.name for item in library.search('assets/texts', '')]
+        self.assertEqual(names, ['books/war_and_peace.txt', 'lorem.txt'])
+
+        self.assertEqual(library.search('assets/texts', 'xyz'), [])
+        self.assertEqual(len(library.search('assets/vocabs', 't', 1)), 1)
+
+    def test_fuzzy_score(self):
+        self.assertEqual(fuzzy_score('abc', 'xyz'), -1)
+        self.assertEqual(fuzzy_score('ba', 'ab'), -1)
+        self.assertGreater(fuzzy_score('lor', 'lorem.txt'),
+                           fuzzy_score('lor', 'a_long_roll.txt'))
+
+    def test_difficulty(self):
+        self.assertEqual(estimate_difficulty(0, 0, 0, 0), 0.0)
+        easy = estimate_difficulty(10, 30, 0, 0)
+        hard = estimate_difficulty(10, 100, 20, 10)
+        self.assertLess(easy, hard)
+        self.assertLessEqual(hard, 1.0)
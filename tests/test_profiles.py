@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import Mock
+from harmonikey_mmmity.profiles import ProfileStore, PersonalBest
+from harmonikey_mmmity.statistics import Statistics
+from harmonikey_mmmity.gamemodes import Gamemode
+import os
+import random
+
+
+class TestProfileStore(unittest.TestCase):
+
+    def setUp(self):
+        # Adding random bytes to filenames
+        # so no collisions with existing files happen
+        prefix = random.randbytes(8).hex()
+        self.filename = prefix + 'profiles.json'
+        self.stats_filename = prefix + 'stats.csv'
+
+    def tearDown(self):
+        for filename in (self.filename, self.stats_filename):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def stats(self, word_count: int, user: str = 'mmmity') -> Statistics:
+        stats = Statistics(user, 'RANDOM.vocab.txt', Gamemode.FIX_ERRORS,
+                           0.0, events=Mock())
+        stats.word_count = word_count
+        stats.character_count = word_count * 5
+        stats.freeze()
+        stats.frozen_timer = stats.start_timer + 60 * 1000000000
+        # Exactly one minute, so wpm is equal to word_count
+        return stats
+
+    def test_settings(self):
+        store = ProfileStore(self.filename, self.stats_filename)
+        self.assertIsNone(store.last_profile())
+        store.update_settings('mmmity', 'FILE', 'lorem.txt', 'NO_ERRORS', 30)
+
+        loaded = ProfileStore(self.filename, self.stats_filename)
+        profile = loaded.last_profile()
+        self.assertEqual(profile.user, 'mmmity')
+        self.assertEqual(profile.text_type, 'FILE')
+        self.assertEqual(profile.last_text, 'lorem.txt')
+        self.assertEqual(profile.gamemode, 'NO_ERRORS')
+        self.assertEqual(profile.timeout, 30.0)
+
+    def test_bests(self):
+        store = ProfileStore(self.filename, self.stats_filename)
+        self.assertTrue(store.add_result(self.stats(40)))
+        self.assertFalse(store.add_result(self.stats(30)))
+        self.assertTrue(store.add_result(self.stats(50)))
+        self.assertTrue(store.add_result(self.stats(10, 'rom4ik')))
+
+        loaded = ProfileStore(self.filename, self.stats_filename)
+        best = loaded.best('mmmity', 'RANDOM.vocab.txt')
+        self.assertAlmostEqual(best.wpm, 50.0)
+        self.assertAlmostEqual(best.cpm, 250.0)
+        self.assertIsNone(loaded.best('mmmity', 'RANDOM.other.txt'))
+        self.assertIsNone(loaded.best('nobody', 'RANDOM.vocab.txt'))
+
+    def test_collect_from_stats(self):
+        with open(self.stats_filename, 'w') as stats_file:
+            stats_file.write(str(self.stats(40)) + '\n')
+            stats_file.write(str(self.stats(60)) + '\n')
+        store = ProfileStore(self.filename, self.stats_filename)
+        self.assertAlmostEqual(
+            store.best('mmmity', 'RANDOM.vocab.txt').wpm, 60.0
+        )
+        self.assertFalse(store.add_result(self.stats(50)))
+        self.assertTrue(os.path.exists(self.filename))
+        # Stats file is read only when there are no saved profiles
+
+    def test_malformed(self):
+        with open(self.filename, 'w') as profiles_file:
+            profiles_file.write('{"last_user": "a", "profiles": '
+                                '{"a": {"bests": {}}, "b": {'
+                                '"text_type": "FILE", "last_text": "",'
+                                '"gamemode": "", "timeout": 0,'
+                                '"bests": {"t": [1, 2, 0.5, 0]}}}}')
+        store = ProfileStore(self.filename, self.stats_filename)
+        self.assertIsNone(store.last_profile())
+        self.assertEqual(store.best('b', 't'), PersonalBest(1, 2, 0.5, 0))
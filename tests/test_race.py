@@ -0,0 +1,251 @@
+import unittest
+from unittest.mock import Mock, patch
+from harmonikey_mmmity.race import RaceServer, RaceClient, RaceText, Racer, \
+                                   Message, PROGRESS, RACER_ID, WELCOME, \
+                                   MAX_UPDATE_ENTRIES, pack, pack_updates, \
+                                   unpack_updates, read_message
+from harmonikey_mmmity.exceptions import RaceError
+from harmonikey_mmmity.state import Training
+from harmonikey_mmmity.gamemodes import Gamemode
+from harmonikey_mmmity.telemetry import EventSink
+from blessed.keyboard import Keystroke
+import asyncio
+import os
+import random
+import threading
+import time
+
+
+class TestProtocol(unittest.TestCase):
+
+    def test_updates(self):
+        racers = [Racer(i, str(i), i, 5 * i, i % 2 == 0)
+                  for i in range(MAX_UPDATE_ENTRIES + 1)]
+        data = pack_updates(racers)
+
+        async def read_all():
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            return [await read_message(reader), await read_message(reader)]
+
+        messages = asyncio.run(read_all())
+        self.assertEqual([kind for kind, _ in messages],
+                         [Message.UPDATE, Message.UPDATE])
+        # Too many racers for one message are split
+        entries = [entry for _, payload in messages
+                   for entry in unpack_updates(payload)]
+        self.assertEqual(entries[3], (3, 3, 15, False))
+        self.assertEqual(len(entries), len(racers))
+
+
+class TestRaceServer(unittest.TestCase):
+    TEXT = RaceText('RANDOM', 'assets/vocabs/words.txt', 42)
+
+    async def connect(self, server: RaceServer, name: str):
+        reader, writer = await asyncio.open_connection('127.0.0.1',
+                                                       server.port)
+        writer.write(pack(Message.HELLO, name.encode()))
+        kind, payload = await read_message(reader)
+        self.assertEqual(kind, Message.WELCOME)
+        return reader, writer
+
+    async def skip_until(self, reader: asyncio.StreamReader, wanted: int):
+        while True:
+            kind, payload = await read_message(reader)
+            if kind == wanted:
+                return payload
+
+    def test_race(self):
+        async def race():
+            server = RaceServer(self.TEXT, min_racers=2, countdown=0.5)
+            server.BROADCAST_INTERVAL = 3600
+            # Broadcasts are made by hand
+            await server.start('127.0.0.1', 0)
+            first, first_writer = await self.connect(server, 'mmmity')
+            second, second_writer = await self.connect(server, 'rom4ik')
+            self.assertIsNotNone(server.start_at)
+
+            await self.skip_until(first, Message.JOINED)
+            joined = await self.skip_until(first, Message.JOINED)
+            self.assertEqual(joined[RACER_ID.size:], b'rom4ik')
+            start = await self.skip_until(first, Message.START)
+            self.assertLessEqual(int.from_bytes(start, 'little'), 500)
+
+            first_writer.write(pack(Message.PROGRESS, PROGRESS.pack(1, 5)))
+            first_writer.write(pack(Message.PROGRESS, PROGRESS.pack(2, 9)))
+            first_writer.write(pack(Message.FINISH))
+            await first_writer.drain()
+            await asyncio.sleep(0.1)
+            server.broadcast()
+            update = await self.skip_until(second, Message.UPDATE)
+            self.assertEqual(list(unpack_updates(update)),
+                             [(0, 3, 14, True)])
+            # Deltas are summed and sent once
+
+            first_writer.close()
+            second_writer.close()
+            await asyncio.sleep(0.1)
+            self.assertIn(0, server.racers)
+            self.assertNotIn(1, server.racers)
+            # Finished racer stays in standings
+            await server.close()
+
+        asyncio.run(race())
+
+    def test_fan_out(self):
+        async def race():
+            server = RaceServer(self.TEXT, min_racers=1000)
+            server.BROADCAST_INTERVAL = 3600
+            await server.start('127.0.0.1', 0)
+            connections = [await self.connect(server, f'racer{i}')
+                           for i in range(200)]
+            _, writer = connections[0]
+            writer.write(pack(Message.PROGRESS, PROGRESS.pack(1, 4)))
+            await writer.drain()
+            await asyncio.sleep(0.1)
+            server.broadcast()
+            server.broadcast()
+            # Nothing changed since first broadcast
+
+            for reader, _ in connections:
+                update = await self.skip_until(reader, Message.UPDATE)
+                self.assertEqual(list(unpack_updates(update)),
+                                 [(0, 1, 4, False)])
+            for _, writer in connections:
+                writer.close()
+            await server.close()
+
+        asyncio.run(race())
+
+
+    @patch('harmonikey_mmmity.race.MAX_RACER_ID', 1)
+    def test_ids_reused(self):
+        async def race():
+            server = RaceServer(self.TEXT, min_racers=1000)
+            await server.start('127.0.0.1', 0)
+            first, first_writer = await self.connect(server, 'mmmity')
+            second, second_writer = await self.connect(server, 'rom4ik')
+
+            reader, writer = await asyncio.open_connection('127.0.0.1',
+                                                           server.port)
+            writer.write(pack(Message.HELLO, b'late'))
+            kind, payload = await read_message(reader)
+            self.assertEqual((kind, payload),
+                             (Message.REJECTED, b'Race is full'))
+            self.assertEqual(await reader.read(), b'')
+            # No ids are left, so racer is disconnected
+            writer.close()
+
+            second_writer.close()
+            await asyncio.sleep(0.1)
+            reader, writer = await asyncio.open_connection('127.0.0.1',
+                                                           server.port)
+            writer.write(pack(Message.HELLO, b'late'))
+            kind, payload = await read_message(reader)
+            self.assertEqual(kind, Message.WELCOME)
+            self.assertEqual(WELCOME.unpack_from(payload)[0], 1)
+            # Id of racer who left is given to the new one
+            self.assertEqual(server.racers[1].name, 'late')
+
+            first_writer.close()
+            writer.close()
+            await server.close()
+
+        asyncio.run(race())
+
+
+class TestRaceClient(unittest.TestCase):
+
+    def setUp(self):
+        self.vocab = random.randbytes(8).hex() + 'vocab.txt'
+        with open(self.vocab, 'w') as vocab_file:
+            vocab_file.write(' '.join(f'word{i}' for i in range(100)))
+
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever,
+                                            daemon=True)
+        self.loop_thread.start()
+        self.server = RaceServer(RaceText('RANDOM', self.vocab, 42),
+                                 min_racers=2, countdown=0.0)
+        asyncio.run_coroutine_threadsafe(
+            self.server.start('127.0.0.1', 0), self.loop
+        ).result()
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.server.close(),
+                                         self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(5)
+        self.loop.close()
+        os.remove(self.vocab)
+
+    def wait_for(self, condition, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_standings(self):
+        first = RaceClient('127.0.0.1', self.server.port, 'mmmity')
+        second = RaceClient('127.0.0.1', self.server.port, 'rom4ik')
+        first.connect()
+        self.assertIsNone(first.seconds_to_start())
+        second.connect()
+        self.wait_for(lambda: first.seconds_to_start() == 0.0)
+        self.assertEqual(second.text.seed, 42)
+
+        second.report(3, 15)
+        second.report(4, 20)
+        second.finish()
+        self.wait_for(lambda: len(first.standings()) == 2 and
+                      first.standings()[0].finished)
+        self.assertEqual(first.standings()[0], Racer(1, 'rom4ik', 4, 20, True))
+        self.wait_for(lambda: second.closed)
+        first.close()
+        self.wait_for(lambda: first.closed)
+
+    def test_same_text(self):
+        race = Mock()
+        race.text = RaceText('RANDOM', self.vocab, 7)
+        program = Mock()
+        program.event_sink = EventSink()
+        texts = []
+        for _ in range(2):
+            training = Training(program, Gamemode.FIX_ERRORS, self.vocab,
+                                'user', 'RANDOM', 0.0, race=race)
+            textgen = training.text_overseer.textgen
+            texts.append([textgen.next_word() for _ in range(20)])
+        self.assertEqual(texts[0], texts[1])
+
+    def test_eliminated(self):
+        race = Mock()
+        race.text = RaceText('RANDOM', self.vocab, 7)
+        program = Mock()
+        program.event_sink = EventSink()
+        training = Training(program, Gamemode.DIE_ERRORS, self.vocab,
+                            'user', 'RANDOM', 0.0, race=race)
+        training.handle_keys([Keystroke('#')])
+        race.close.assert_called_once()
+        race.finish.assert_not_called()
+        # Eliminated racer leaves, it is not shown as finished
+
+    def test_no_server(self):
+        port = self.server.port
+        asyncio.run_coroutine_threadsafe(self.server.close(),
+                                         self.loop).result()
+        with self.assertRaises(RaceError):
+            RaceClient('127.0.0.1', port, 'mmmity').connect()
+        self.server = RaceServer(RaceText('RANDOM', self.vocab, 0))
+        asyncio.run_coroutine_threadsafe(
+            self.server.start('127.0.0.1', 0), self.loop
+        ).result()
+
+    @patch('harmonikey_mmmity.race.MAX_RACER_ID', 0)
+    def test_race_full(self):
+        first = RaceClient('127.0.0.1', self.server.port, 'mmmity')
+        first.connect()
+        with self.assertRaisesRegex(RaceError, 'Race is full'):
+            RaceClient('127.0.0.1', self.server.port, 'rom4ik').connect()
+        first.close()
+        self.wait_for(lambda: first.closed)
@@ -0,0 +1,90 @@
+import unittest
+from harmonikey_mmmity.rollups import Rollups, Bucket, period_key, sparkline
+import datetime
+import os
+import random
+import shutil
+
+
+class TestRollups(unittest.TestCase):
+    NANOSECONDS_IN_SECOND = 1000000000
+
+    def timestamp(self, year: int, month: int, day: int) -> int:
+        return int(datetime.datetime(year, month, day, 12).timestamp())
+
+    def row(self, user: str, words: int, timestamp: int) -> str:
+        return ';'.join(map(str, [
+            user, 'text', 'Gamemode.NO_ERRORS', words, 5 * words,
+            60 * self.NANOSECONDS_IN_SECOND, 0.0, 1, timestamp
+        ])) + '\n'
+
+    def append(self, text: str):
+        with open(self.stats_path, 'a') as stats_file:
+            stats_file.write(text)
+
+    def setUp(self):
+        # Adding random bytes to dirname
+        # so no collisions with existing files happen
+        self.dirname = random.randbytes(8).hex() + 'rollups'
+        os.makedirs(self.dirname)
+        self.stats_path = os.path.join(self.dirname, 'stats.csv')
+        self.append(self.row('mmmity', 10, self.timestamp(2024, 3, 11)))
+        self.append(self.row('mmmity', 20, self.timestamp(2024, 3, 12)))
+        self.append(self.row('rom4ik', 30, self.timestamp(2024, 3, 12)))
+        self.append('mmmity;text;Gamemode.NO_ERRORS;5;20;100;0.0;0\n')
+        # Row without timestamp is skipped
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_period_key(self):
+        timestamp = self.timestamp(2024, 3, 15)
+        self.assertEqual(period_key(timestamp, 'day'), '2024-03-15')
+        self.assertEqual(period_key(timestamp, 'week'), '2024-W11')
+        self.assertEqual(period_key(timestamp, 'month'), '2024-03')
+        with self.assertRaises(ValueError):
+            period_key(timestamp, 'year')
+
+    def test_update(self):
+        rollups = Rollups(self.stats_path)
+        self.assertEqual(rollups.update(), 4)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.dirname, 'stats.rollups.json')
+        ))
+
+        days = rollups.series('mmmity', 'text', 'day')
+        self.assertEqual([day for day, _ in days], ['2024-03-11', '2024-03-12'])
+        weeks = rollups.series('mmmity', '', 'week')
+        self.assertEqual(len(weeks), 1)
+        week = weeks[0][1]
+        self.assertEqual(week.count, 2)
+        self.assertAlmostEqual(week.mean_wpm(), 15.0)
+        self.assertAlmostEqual(week.best_wpm, 20.0)
+        self.assertAlmostEqual(week.error_rate(), 2 / 152)
+
+        self.assertEqual(rollups.update(), 0)
+        self.append(self.row('mmmity', 40, self.timestamp(2024, 4, 1)))
+        self.append('mmmity;text')
+        # Unfinished row is not counted yet
+        rollups = Rollups(self.stats_path)
+        self.assertEqual(rollups.update(), 1)
+        self.assertEqual(len(rollups.series('mmmity', 'text', 'month')), 2)
+
+    def test_rewritten(self):
+        rollups = Rollups(self.stats_path)
+        rollups.update()
+        with open(self.stats_path, 'w') as stats_file:
+            stats_file.write(self.row('leha', 1, self.timestamp(2024, 1, 1)))
+        self.assertEqual(rollups.update(), 1)
+        self.assertEqual(rollups.series('mmmity', '', 'day'), [])
+
+    def test_bucket(self):
+        bucket = Bucket()
+        self.assertEqual(bucket.mean_wpm(), 0.0)
+        self.assertEqual(bucket.error_rate(), 0.0)
+        self.assertEqual(Bucket(*Bucket(1, 2.0, 2.0, 3, 4).to_list()).count, 1)
+
+    def test_sparkline(self):
+        self.assertEqual(sparkline([]), '')
+        self.assertEqual(sparkline([1.0, 1.0]), '▁▁')
+        self.assertEqual(sparkline([0.0, 7.0, 3.5]), '▁█▅')
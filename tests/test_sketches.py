@@ -0,0 +1,110 @@
+import unittest
+from harmonikey_mmmity.sketches import QuantileSketch, SketchStore
+import os
+import random
+import shutil
+
+
+class TestQuantileSketch(unittest.TestCase):
+
+    def test_small_exact(self):
+        sketch = QuantileSketch()
+        for value in [5, 1, 4, 2, 3]:
+            sketch.add(value)
+        self.assertEqual(sketch.quantile(0.5), 3)
+        self.assertEqual(sketch.quantile(1.0), 5)
+        self.assertEqual(sketch.rank(2), 0.4)
+        self.assertEqual(sketch.rank(0), 0.0)
+        # Until first compaction all values are kept
+
+    def test_empty(self):
+        sketch = QuantileSketch()
+        self.assertEqual(sketch.quantile(0.5), 0.0)
+        self.assertEqual(sketch.rank(1.0), 0.0)
+
+    def test_accuracy_and_merge(self):
+        rng = random.Random(0)
+        values = [rng.uniform(0, 100) for _ in range(20000)]
+        first = QuantileSketch()
+        second = QuantileSketch()
+        for value in values[:10000]:
+            first.add(value)
+        for value in values[10000:]:
+            second.add(value)
+        first.merge(second)
+
+        self.assertEqual(first.count, 20000)
+        self.assertLess(sum(map(len, first.levels)), 1000)
+        # Memory does not grow with number of values
+        for q in (0.1, 0.5, 0.9):
+            self.assertAlmostEqual(first.quantile(q), 100 * q, delta=3)
+            self.assertAlmostEqual(first.rank(100 * q), q, delta=0.03)
+
+    def test_serialization(self):
+        sketch = QuantileSketch(16)
+        for value in range(100):
+            sketch.add(value)
+        loaded = QuantileSketch.from_dict(sketch.to_dict())
+        self.assertEqual(loaded.quantile(0.3), sketch.quantile(0.3))
+        self.assertEqual(loaded.count, 100)
+        with self.assertRaises(KeyError):
+            QuantileSketch.from_dict({'k': 16})
+
+
+class TestSketchStore(unittest.TestCase):
+    NANOSECONDS_IN_MINUTE = 60 * 1000000000
+
+    def row(self, user: str, words: int, errors: int = 0) -> str:
+        return ';'.join(map(str, [
+            user, 'text', 'Gamemode.NO_ERRORS', words, 5 * words,
+            self.NANOSECONDS_IN_MINUTE, 0.0, errors, 1700000000
+        ])) + '\n'
+
+    def append(self, text: str):
+        with open(self.stats_path, 'a') as stats_file:
+            stats_file.write(text)
+
+    def setUp(self):
+        # Adding random bytes to dirname
+        # so no collisions with existing files happen
+        self.dirname = random.randbytes(8).hex() + 'sketches'
+        os.makedirs(self.dirname)
+        self.stats_path = os.path.join(self.dirname, 'stats.csv')
+        for words in range(10, 110, 10):
+            self.append(self.row('mmmity', words))
+        self.append(self.row('rom4ik', 200, 250))
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_update(self):
+        store = SketchStore(self.stats_path)
+        self.assertEqual(store.update(), 11)
+        self.assertEqual(store.update(), 0)
+        mine = store.get('mmmity', 'text')
+        self.assertEqual(mine.wpm.rank(70), 0.7)
+        self.assertEqual(mine.error_rate.quantile(0.5), 0.0)
+        self.assertIsNone(store.get('mmmity', 'other'))
+
+        everyone = store.merged('text')
+        self.assertEqual(everyone.wpm.count, 11)
+        self.assertEqual(everyone.wpm.quantile(1.0), 200)
+        self.assertEqual(everyone.error_rate.quantile(1.0), 0.2)
+        self.assertIsNone(store.merged('other'))
+
+    def test_incremental(self):
+        store = SketchStore(self.stats_path)
+        store.update()
+        self.append(self.row('mmmity', 110))
+        self.append('mmmity;text')
+        # Unfinished row is left for later
+
+        loaded = SketchStore(self.stats_path)
+        self.assertEqual(loaded.update(), 1)
+        self.assertEqual(loaded.get('mmmity', 'text').wpm.count, 11)
+
+        with open(self.stats_path, 'w') as stats_file:
+            stats_file.write(self.row('mmmity', 10))
+        self.assertEqual(loaded.update(), 1)
+        self.assertEqual(loaded.get('mmmity', 'text').wpm.count, 1)
+        # Rewritten file is read from scratch
@@ -1,13 +1,27 @@
 import unittest
 from unittest.mock import patch, MagicMock, Mock
 from harmonikey_mmmity.state import Exit, Training, AfterTraining, \
-                      BeforeTraining, MainMenu, StatsScreen
+                      BeforeTraining, MainMenu, StatsScreen, RaceLobby
+from harmonikey_mmmity.race import RaceText, PORT as RACE_PORT
+from harmonikey_mmmity.exceptions import RaceError
 from harmonikey_mmmity.gamemodes import Gamemode
-from harmonikey_mmmity.text_generator import TextgenType
+from harmonikey_mmmity.text_generator import TextgenType, FileTextGenerator
+from harmonikey_mmmity.text_sources import TextSource, TextSourceRegistry
+from harmonikey_mmmity.checkpoints import Checkpoint
+from harmonikey_mmmity.tasks import Task
+from importlib.metadata import EntryPoint
+from harmonikey_mmmity.profiles import Profile, PersonalBest
+from harmonikey_mmmity.sketches import RunSketches
+from harmonikey_mmmity.statistics import Statistics
+from harmonikey_mmmity.vocab import Vocabulary, VocabFilter
 from blessed.keyboard import Keystroke
 import random
 import os
+import shutil
+import tempfile
+import threading
 import time
+from array import array
 
 
 class TestState(unittest.TestCase):
@@ -93,6 +107,7 @@ class TestTraining(unittest.TestCase):
 
     def test_handle_key_finish(self):
         self.training2.statistics = MagicMock()
+        self.training2.statistics.is_time_up.return_value = False
         program = self.training2.program
 
         self.training2.handle_key(Keystroke('a'))
@@ -101,7 +116,15 @@ class TestTraining(unittest.TestCase):
 
         self.assertIsInstance(program.state, AfterTraining)
         self.assertEqual(program.state.is_early, False)
+        self.assertTrue(program.state.saving.wait(5))
+        # Results are saved in background
         self.training2.statistics.save_to_file.assert_called_once()
+        program.sketches.update.assert_called_once()
+        program.rollups.update.assert_called_once()
+        program.profiles.add_result.return_value = True
+        program.state.tick()
+        self.assertIsNone(program.state.saving)
+        self.assertTrue(program.state.new_best)
 
     def test_updated_since(self):
         self.training1._Training__visualize_timer = Mock()
@@ -127,11 +150,90 @@ class TestTraining(unittest.TestCase):
         self.assertIn('/', str(callstr2))
         self.assertIn('.', str(callstr2))
 
+    def test_tick_timeout(self):
+        self.assertLessEqual(self.training2.tick_timeout(),
+                             self.training2.TICK_INTERVAL)
+        self.training1.TIMER_DIGITS = 0
+        self.assertGreater(self.training1.tick_timeout(),
+                           self.training1.TICK_INTERVAL)
+        self.assertLessEqual(self.training1.tick_timeout(), 0.5)
+        # Timer shows whole seconds, live rates are updated
+        # once per bucket
+
     def test_check_time(self):
         time.sleep(1)
         self.training2._Training__check_time()
         self.assertIsInstance(self.training2.program.state, AfterTraining)
 
+    def test_pause(self):
+        training = Training(
+            self.training2.program,
+            Gamemode.NO_ERRORS,
+            self.filename,
+            'user',
+            TextgenType.FILE,
+            0.0
+        )
+        program = training.program
+        training.handle_key(Keystroke('a'))
+        training.handle_key(Keystroke(' '))
+        training.handle_key(Keystroke('\x1b', code=361, name='KEY_ESCAPE'))
+        self.assertIsInstance(program.state, MainMenu)
+
+        checkpoint = program.checkpoints.put.call_args[0][0]
+        self.assertEqual(checkpoint.word_index, 1)
+        self.assertEqual(checkpoint.offset, 2)
+        self.assertEqual(checkpoint.word_count, 1)
+
+        resumed = Training(program, Gamemode.NO_ERRORS, self.filename,
+                           'user', TextgenType.FILE, 0.0, checkpoint)
+        self.assertEqual(resumed.text_overseer.current_word, 'b')
+        self.assertEqual(resumed.statistics.word_count, 1)
+        self.assertGreaterEqual(resumed.statistics.get_elapsed_s(),
+                                checkpoint.elapsed / 1e9)
+
+        resumed.handle_key(Keystroke('b'))
+        program.state.saving.wait(5)
+        program.checkpoints.remove.assert_called_once_with('user', self.filename)
+
+    def test_handle_keys(self):
+        training = Training(
+            self.training2.program,
+            Gamemode.NO_ERRORS,
+            self.filename,
+            'user',
+            TextgenType.FILE,
+            0.0
+        )
+        program = training.program
+        training.handle_keys([Keystroke('a'), Keystroke(' '),
+                              Keystroke('\x1b', code=361, name='KEY_ESCAPE'),
+                              Keystroke('b')])
+        # Keys after Escape are not typed
+        self.assertIsInstance(program.state, MainMenu)
+        self.assertEqual(training.statistics.word_count, 1)
+
+    def test_escape_random(self):
+        program = self.training1.program
+        self.training1.handle_key(Keystroke('\x1b', code=361, name='KEY_ESCAPE'))
+        self.assertIsInstance(program.state, AfterTraining)
+        program.checkpoints.put.assert_not_called()
+
+    def test_deadline(self):
+        self.assertLessEqual(self.training1.tick_timeout(), Training.TICK_INTERVAL)
+        self.training2.statistics.deadline = time.perf_counter_ns() + 10000000
+        self.assertLessEqual(self.training2.tick_timeout(), 0.01)
+
+        time.sleep(0.05)
+        self.training2.handle_key(Keystroke('a'))
+        # Key after deadline only finishes training
+        program = self.training2.program
+        self.assertIsInstance(program.state, AfterTraining)
+        self.assertEqual(program.state.stats.word_count, 0)
+        self.assertEqual(program.state.stats.frozen_timer,
+                         self.training2.statistics.deadline)
+        self.assertGreater(program.state.stats.get_overshoot_ms(), 30)
+
     def test_visualize_words(self):
         term = self.training2.program.term
         term.width = 10
@@ -142,6 +244,24 @@ class TestTraining(unittest.TestCase):
         )
 
 
+    @patch('harmonikey_mmmity.program.Program')
+    def test_visualize_code(self, mockProgram):
+        with open(self.filename, 'w') as out_file:
+            out_file.write('a = 1\nb = 2\n')
+        training = Training(mockProgram, Gamemode.FIX_ERRORS, self.filename,
+                            'user', TextgenType.CODE, 0.0)
+        training.handle_keys([Keystroke(c) for c in 'a = 1'])
+        term = mockProgram.term
+        term.height = 20
+        training.visualize()
+        self.assertEqual(term.move_xy.call_args_list[-2].args, (0, 10))
+        self.assertEqual(term.move_xy.call_args_list[-1].args, (0, 11))
+        # Line of cursor is at the center
+        term.gold.assert_any_call('a = 1')
+        term.mistyrose3_on_white.assert_called_with(' ')
+        # Newline is the next character
+
+
 class TestAfterTraining(unittest.TestCase):
 
     def create_text_file(self, text: str):
@@ -155,6 +275,9 @@ class TestAfterTraining(unittest.TestCase):
     @patch('harmonikey_mmmity.program.Program')
     @patch('harmonikey_mmmity.statistics.Statistics')
     def setUp(self, mockProgram, mockStats):
+        mockProgram.profiles.best.return_value = None
+        mockProgram.sketches.get.return_value = None
+        mockProgram.sketches.merged.return_value = None
         self.at1 = AfterTraining(mockProgram, mockStats, True)
         self.at2 = AfterTraining(mockProgram, mockStats, False)
         self.create_text_file('a b')
@@ -168,6 +291,24 @@ class TestAfterTraining(unittest.TestCase):
         self.at1._AfterTraining__restart()
         self.assertIsInstance(self.at1.program.state, Training)
 
+    def test_restart_filter(self):
+        cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache)
+        patcher = patch.object(Vocabulary, 'CACHE_DIRECTORY', cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        vocab_filter = VocabFilter(charset='a')
+        at = AfterTraining(self.at1.program, self.at1.stats, True,
+                           vocab_filter=vocab_filter)
+        at.program.state = at
+        at.stats.text_tag = 'RANDOM.' + self.filename
+        at._AfterTraining__restart()
+        training = at.program.state
+        self.assertEqual(training.vocab_filter, vocab_filter)
+        textgen = training.text_overseer.textgen
+        self.assertEqual({textgen.next_word() for _ in range(20)}, {'a'})
+
     def test_visualize(self):
         self.at1.stats.get_wpm = lambda: 0
         self.at2.stats.get_cpm = lambda: 0
@@ -175,6 +316,7 @@ class TestAfterTraining(unittest.TestCase):
         self.at2.stats.get_cpm = lambda: 0
         self.at1.stats.get_elapsed_s = lambda: 0
         self.at2.stats.get_elapsed_s = lambda: 0
+        self.at2.stats.get_overshoot_ms = lambda: 0
         self.at1.visualize()
         self.at2.visualize()
         self.at1.program.term.move_y.assert_any_call(self.at1.program.term.height // 2 - 3)
@@ -182,6 +324,55 @@ class TestAfterTraining(unittest.TestCase):
         self.at2.program.term.move_y.assert_any_call(self.at1.program.term.height // 2 - 3)
         self.at2.program.term.move_y.assert_any_call(self.at1.program.term.height - 2)
 
+    def overshoot_shown(self, timeout: float, duration: float) -> bool:
+        stats = Statistics('mmmity', 'text', Gamemode.NO_ERRORS, timeout)
+        time.sleep(duration)
+        stats.freeze()
+        at = AfterTraining(self.at2.program, stats, False)
+        term = at.program.term
+        term.center.reset_mock()
+        at.visualize()
+        return any('Timer stopped' in str(call.args[0])
+                   for call in term.center.call_args_list
+                   if len(call.args) > 0)
+
+    def test_overshoot(self):
+        self.assertTrue(self.overshoot_shown(0.01, 0.02))
+        self.assertFalse(self.overshoot_shown(60.0, 0.0))
+        # Text ended before time limit
+        self.assertFalse(self.overshoot_shown(0.0, 0.0))
+
+    def test_personal_best(self):
+        term = self.at2.program.term
+        self.at2.new_best = True
+        self.assertEqual(self.at2._AfterTraining__best_text(),
+                         term.center())
+        term.gold.assert_called_with('New personal best!')
+
+        self.at2.new_best = False
+        self.assertEqual(self.at2._AfterTraining__best_text(), '')
+        # No previous results
+        self.at2.program.profiles.best.return_value = \
+            PersonalBest(42.0, 200.0, 1.0, 0)
+        self.at2._AfterTraining__best_text()
+        term.bold.assert_called_with('42.00')
+
+    def test_distribution(self):
+        term = self.at2.program.term
+        self.assertEqual(self.at2._AfterTraining__distribution_text(), '')
+        # No sketches yet
+        sketches = RunSketches()
+        for wpm in (10.0, 20.0, 30.0, 40.0):
+            sketches.wpm.add(wpm)
+            sketches.error_rate.add(0.1)
+        self.at2.stats.get_wpm.return_value = 30.0
+        self.at2.program.sketches.get.return_value = sketches
+        self.at2.program.sketches.merged.return_value = sketches
+        self.at2._AfterTraining__distribution_text()
+        term.bold.assert_any_call('75')
+        term.bold.assert_any_call('20.00')
+        term.bold.assert_any_call('10.0%')
+
     def test_handle_key(self):
         self.at1.widgets = [1, 2, 2]
         self.assertEqual(self.at1.active_widget, 0)
@@ -200,10 +391,25 @@ class TestAfterTraining(unittest.TestCase):
         self.assertEqual(self.at1.active_widget, 0)
 
 
+class ResumableSource(TextSource):
+    '''
+    Resumable plugin for tests, its text_tag has prefix unlike FILE.
+    '''
+    directory = '.'
+    resumable = True
+
+    def create(self, filename, key_stats, resume=None):
+        if resume is None:
+            return FileTextGenerator(filename)
+        return FileTextGenerator(filename, resume.offset, resume.word_index)
+
+
 class TestBeforeTraining(unittest.TestCase):
 
     @patch('harmonikey_mmmity.program.Program')
     def setUp(self, mockProgram):
+        mockProgram.profiles.last_profile.return_value = None
+        mockProgram.analyzer.speed_factor.return_value = 1.25
         self.bt = BeforeTraining(mockProgram)
         self.bt.program.state = self.bt
 
@@ -213,6 +419,91 @@ class TestBeforeTraining(unittest.TestCase):
         self.bt._BeforeTraining__begin_training()
         self.assertEqual(self.bt.program.state, self.bt)
 
+    def test_continue_plugin(self):
+        registry = TextSourceRegistry(discover=False)
+        registry.add_entry_point(EntryPoint(
+            name='RESUMABLE', value='tests.test_state:ResumableSource',
+            group=TextSourceRegistry.ENTRY_POINT_GROUP,
+        ))
+        patcher = patch('harmonikey_mmmity.state.get_registry',
+                        return_value=registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        name = random.randbytes(8).hex() + '.txt'
+        self.addCleanup(os.remove, name)
+        with open(name, 'w') as text_file:
+            text_file.write('a b c')
+        text_tag = 'RESUMABLE../' + name
+        checkpoint = Checkpoint('user', text_tag, 1, 2, 1, 1, 0, 10 ** 9)
+        self.bt.program.checkpoints.get.side_effect = \
+            lambda user, tag: checkpoint if tag == text_tag else None
+
+        self.bt.textgentype_switch.get_current_option = lambda: 'RESUMABLE'
+        self.bt.player_name.input = 'user'
+        self.bt.text_filepath.input = name
+        self.bt._BeforeTraining__continue_training()
+        self.assertEqual(self.bt.prev_error, '')
+        self.assertIsInstance(self.bt.program.state, Training)
+        self.assertEqual(self.bt.program.state.text_overseer.textgen
+                         .current_word(), 'b')
+
+    def test_directory_cached(self):
+        with patch('harmonikey_mmmity.state.get_registry') as get_registry:
+            for _ in range(3):
+                self.bt.tick()
+            get_registry.return_value.get.assert_not_called()
+            # Directory of unchanged selection is not looked up again
+
+            self.bt.textgentype_switch.get_current_option = lambda: 'CODE'
+            self.bt.tick()
+            get_registry.return_value.get.assert_called_once_with('CODE')
+
+    def test_analysis_error(self):
+        self.bt.analyzing = Task(lambda task: {}['corrupt index']).start()
+        self.assertTrue(self.bt.analyzing.wait(5))
+        self.bt._BeforeTraining__poll_analyzing()
+        self.assertIsNone(self.bt.analyzing)
+        # Analysis is only a hint, its errors do not crash screen
+
+    def test_join_race_in_background(self):
+        connected = threading.Event()
+        with patch('harmonikey_mmmity.state.RaceClient') as race_client:
+            race_client.return_value.connect.side_effect = \
+                lambda: connected.wait(5)
+            self.bt.race_server.input = 'localhost:7777'
+            self.bt._BeforeTraining__begin_training()
+            self.assertIs(self.bt.program.state, self.bt)
+            # Keys are handled while connecting
+            self.bt.tick()
+            self.assertIsNotNone(self.bt.joining)
+
+            joining = self.bt.joining
+            connected.set()
+            self.assertTrue(joining.wait(5))
+            self.bt.tick()
+        self.assertIsInstance(self.bt.program.state, RaceLobby)
+        self.assertIs(self.bt.program.state.race, race_client.return_value)
+
+    def test_join_race_error(self):
+        with patch('harmonikey_mmmity.state.RaceClient') as race_client:
+            race_client.return_value.connect.side_effect = \
+                RaceError('Race server does not answer')
+            self.bt.race_server.input = 'localhost'
+            self.bt._BeforeTraining__begin_training()
+            self.assertTrue(self.bt.joining.wait(5))
+            self.bt.tick()
+        race_client.assert_called_once_with('localhost', RACE_PORT, 'user')
+        self.assertIsNone(self.bt.joining)
+        self.assertEqual(self.bt.prev_error, 'Race server does not answer')
+        self.assertIs(self.bt.program.state, self.bt)
+
+    def test_race_address(self):
+        self.bt.race_server.input = 'localhost:port'
+        self.bt._BeforeTraining__begin_training()
+        self.assertEqual(self.bt.prev_error, 'Race server should be host:port')
+        self.assertEqual(self.bt.program.state, self.bt)
+
     def test_visualize(self):
         self.bt.player_name = Mock()
         self.bt.gamemode_switch = Mock()
@@ -247,15 +538,71 @@ class TestBeforeTraining(unittest.TestCase):
 
         self.assertEqual(self.bt.active_widget_y, 0)
 
-        for i in range(1, 5):
+        for i in range(1, 6):
             self.bt.handle_key(Keystroke(name='KEY_DOWN'))
-            self.assertEqual(self.bt.active_widget_y, i % 4)
+            self.assertEqual(self.bt.active_widget_y, i % 5)
 
         for i in range(4, -1):
             self.bt.handle_key(Keystroke(name='KEY_UP'))
             self.assertEqual(self.bt.active_widget_y, i)
 
 
+    def test_suggestions(self):
+        item = Mock()
+        item.name = 'lorem.txt'
+        self.bt.program.library.search = Mock(return_value=[item])
+        self.bt.active_widget_y = 1
+
+        self.bt.handle_key(Keystroke('l'))
+        self.bt.program.library.search.assert_called_with(
+            'assets/vocabs', 'top1000_english.txtl', BeforeTraining.MAX_SUGGESTIONS
+        )
+        self.bt.handle_key(Keystroke('\t', code=512, name='KEY_TAB'))
+        self.assertEqual(self.bt.text_filepath.input, 'lorem.txt')
+
+    def test_analyzing(self):
+        self.assertTrue(self.bt.analyzing.wait(5))
+        self.bt.program.analyzer.refresh.assert_called_once_with(
+            self.bt.program.library
+        )
+        self.bt.tick()
+        self.assertIsNone(self.bt.analyzing)
+
+        item = Mock()
+        item.name = 'lorem.txt'
+        item.word_count = 3
+        item.difficulty = 0.5
+        self.bt.suggestions = [item]
+        self.bt.program.term.ljust = lambda row: row
+        self.assertIn('wpm x1.25', self.bt._BeforeTraining__suggestions_text())
+
+    def test_prefill(self):
+        profile = Profile('mmmity', 'FILE', 'lorem.txt', 'NO_ERRORS', 30.0,
+                          'len=5')
+        self.bt.program.profiles.last_profile.return_value = profile
+        bt = BeforeTraining(self.bt.program)
+        self.assertEqual(bt.player_name.input, 'mmmity')
+        self.assertEqual(bt.text_filepath.input, 'lorem.txt')
+        self.assertEqual(bt.gamemode_switch.get_current_option(),
+                         Gamemode.NO_ERRORS)
+        self.assertEqual(bt.textgentype_switch.get_current_option(), 'FILE')
+        self.assertEqual(bt.timeout.int_input(), 30)
+        self.assertEqual(bt.word_filter.input, 'len=5')
+
+    def test_begin_filter(self):
+        self.bt.word_filter.input = 'size=5'
+        self.bt._BeforeTraining__begin_training()
+        self.assertEqual(self.bt.program.state, self.bt)
+        self.assertEqual(self.bt.prev_error, 'Unknown filter size')
+
+    def test_begin_missing(self):
+        self.bt.program.library.get = Mock(return_value=None)
+        self.bt._BeforeTraining__begin_training()
+        self.bt.program.library.refresh.assert_called()
+        self.assertIn('not found', self.bt.prev_error)
+        self.assertEqual(self.bt.program.state, self.bt)
+
+
 class TestMainMenu(unittest.TestCase):
 
     @patch('harmonikey_mmmity.program.Program')
@@ -306,3 +653,152 @@ class TestStatsScreen(unittest.TestCase):
         for i in range(2, -1):
             self.ss.handle_key(Keystroke(name='KEY_UP'))
             self.assertEqual(self.ss._StatsScreen__active_widget_y, i)
+
+    def test_scroll_results(self):
+        self.ss.program.term.height = 20
+        self.ss.results.set_items(list(range(100)))
+        self.ss.results.format_item = str
+        self.ss.visualize()
+        self.ss.program.term.get_location.assert_not_called()
+        self.assertEqual(self.ss.results.height, 13)
+
+        self.ss.handle_key(Keystroke(name='KEY_PGDOWN'))
+        self.assertEqual(self.ss.results.offset, 13)
+        self.ss.handle_key(Keystroke(name='KEY_END'))
+        self.assertEqual(self.ss.results.offset, 87)
+
+    def load(self, rows: str):
+        filename = random.randbytes(8).hex() + '.csv'
+        self.addCleanup(os.remove, 'stats/' + filename)
+        with open('stats/' + filename, 'w') as stats_file:
+            stats_file.write(rows)
+        self.ss.stats_file.input = filename
+        self.ss._StatsScreen__display_stats()
+        self.assertTrue(self.ss.loading.wait(5))
+        self.ss.tick()
+        self.assertIsNone(self.ss.loading)
+
+    def test_load_stats(self):
+        minute = 60 * 1000000000
+        rows = ''
+        for user, words in (('mmmity', 40), ('rom4ik', 90), ('mmmity', 60)):
+            rows += f'{user};text;Gamemode.NO_ERRORS;{words};{5 * words};'
+            rows += f'{minute};0.0;0;1700000000\n'
+        self.ss.username.input = 'mmmity'
+        self.load(rows)
+        self.addCleanup(os.remove, os.path.splitext(
+            'stats/' + self.ss.stats_file.input)[0] + '.rollups.json')
+        self.assertEqual(self.ss.error_message, '')
+        self.assertEqual([entry.wpm for entry in self.ss.entries],
+                         [60.0, 40.0])
+        self.assertIs(self.ss.results.items, self.ss.entries)
+
+        self.ss.username.input = 'nobody'
+        self.ss._StatsScreen__display_stats()
+        self.ss.loading.wait(5)
+        self.ss.tick()
+        self.assertEqual(self.ss.error_message, 'No entries for such user')
+
+    def test_merge_sorted(self):
+        first = [Mock(wpm=wpm) for wpm in (50, 90, 10, 70, 50)]
+        entries, keys = StatsScreen.merge_sorted([], array('d'), first)
+        self.assertEqual([entry.wpm for entry in entries],
+                         [90, 70, 50, 50, 10])
+        self.assertEqual(list(keys), [-90, -70, -50, -50, -10])
+
+        merged, keys = StatsScreen.merge_sorted(
+            entries, keys, [Mock(wpm=wpm) for wpm in (5, 50, 100)]
+        )
+        self.assertEqual([entry.wpm for entry in merged],
+                         [100, 90, 70, 50, 50, 50, 10, 5])
+        self.assertEqual(merged[3:5], entries[2:4])
+        # Equal results stay in file order
+        self.assertEqual(len(entries), 5)
+        # Shown list is not changed
+
+    def test_program_rollups(self):
+        row = 'mmmity;text;Gamemode.NO_ERRORS;10;50;60000000000;0.0;0;1700000000'
+        self.ss.username.input = 'mmmity'
+        self.load(row + '\n')
+        self.addCleanup(os.remove, os.path.splitext(
+            'stats/' + self.ss.stats_file.input)[0] + '.rollups.json')
+        self.ss.program.rollups.update.assert_not_called()
+        # Other stats files have their own rollups
+
+        self.ss.program.rollups.stats_path = \
+            'stats/' + self.ss.stats_file.input
+        self.ss.program.rollups.series.return_value = []
+        self.ss._StatsScreen__display_stats()
+        self.assertTrue(self.ss.loading.wait(5))
+        self.ss.tick()
+        self.ss.program.rollups.update.assert_called_once()
+        self.ss.program.rollups.series.assert_called_once_with(
+            'mmmity', '', 'week'
+        )
+
+    def test_normalized_wpm(self):
+        self.ss.program.analyzer.normalize_wpm.return_value = 75.0
+        self.ss.program.term.bold = str
+        self.ss.program.term.red = str
+        entry = Mock()
+        entry.text_tag = 'RANDOM.assets/vocabs/words.txt'
+        entry.wpm = 60.0
+        entry.seconds = 60.0
+        self.ss._StatsScreen__text_by_entry(entry)
+        self.ss.program.analyzer.normalize_wpm.assert_called_once_with(
+            60.0, 'assets/vocabs/words.txt'
+        )
+        self.assertIn('75.00 normalized',
+                      self.ss.program.term.center.call_args[0][0])
+
+    def test_load_wrong_format(self):
+        self.load('not;a;row\n')
+        self.assertEqual(self.ss.error_message, 'Wrong file format')
+        self.assertEqual(self.ss.entries, [])
+
+    def test_progress_line(self):
+        self.ss.program.term.height = 20
+        self.ss.results.set_items(list(range(100)))
+        self.ss.results.format_item = str
+        self.ss.progress = 'Weekly mean wpm: ▁█ 50.00 in 2024-W11'
+        self.ss.visualize()
+        self.assertEqual(self.ss.results.height, 12)
+        self.ss.program.term.center.assert_any_call(self.ss.progress)
+
+
+class TestRaceLobby(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = random.randbytes(8).hex() + 'vocab.txt'
+        with open(self.filename, 'w') as vocab_file:
+            vocab_file.write('a b c')
+        self.race = Mock()
+        self.race.name = 'mmmity'
+        self.race.closed = False
+        self.race.text = RaceText('RANDOM', self.filename, 1)
+        self.race.seconds_to_start.return_value = None
+        self.program = MagicMock()
+        self.lobby = RaceLobby(self.program, self.race,
+                               Gamemode.FIX_ERRORS, 0.0)
+        self.program.state = self.lobby
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_start(self):
+        self.lobby.tick()
+        self.assertIs(self.program.state, self.lobby)
+        self.assertEqual(self.lobby.tick_timeout(), RaceLobby.TICK_INTERVAL)
+
+        self.race.seconds_to_start.return_value = 0.0
+        self.lobby.tick()
+        self.assertIsInstance(self.program.state, Training)
+        self.assertIs(self.program.state.race, self.race)
+
+    def test_closed(self):
+        self.race.closed = True
+        self.lobby.tick()
+        self.assertEqual(self.lobby.error, 'Race server closed connection')
+        self.lobby.handle_key(Keystroke('\x1b', code=361, name='KEY_ESCAPE'))
+        self.assertIsInstance(self.program.state, MainMenu)
+        self.race.close.assert_called()
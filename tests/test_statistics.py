@@ -1,5 +1,6 @@
 import unittest
-from harmonikey_mmmity.statistics import Statistics, FileStatistics
+from harmonikey_mmmity.statistics import Statistics, FileStatistics, \
+                                         KeyStatistics, RollingRate
 from harmonikey_mmmity.gamemodes import Gamemode
 import time
 import random
@@ -94,6 +95,16 @@ class TestStatistics(unittest.TestCase):
             else:
                 self.assertEqual(expected_2[i], real_2[i])
 
+    def test_timestamp(self):
+        stats = Statistics('mmmity', 'test_text', Gamemode.NO_ERRORS, 0.0)
+        stats.add_word('Lorem')
+        stats.freeze()
+        row = str(stats).split(';')
+        self.assertAlmostEqual(int(row[8]), time.time(), delta=2)
+        self.assertEqual(FileStatistics.Entry.from_row(row).timestamp,
+                         int(row[8]))
+        self.assertEqual(FileStatistics.Entry.from_row(row[:8]).timestamp, 0)
+
     def test_freeze(self):
         stats = Statistics('mmmity', 'test_text', Gamemode.NO_ERRORS, 0.0)
         stats.freeze()
@@ -101,6 +112,50 @@ class TestStatistics(unittest.TestCase):
         self.assertAlmostEqual(stats.get_elapsed_s(), 0,
                                delta=0.5 * self.NANOSECONDS_IN_SECOND)
 
+    def test_deadline(self):
+        stats = Statistics('mmmity', 'test_text', Gamemode.NO_ERRORS, 0.5)
+        self.assertFalse(stats.is_time_up())
+        self.assertLessEqual(stats.get_time_left_s(), 0.5)
+        time.sleep(0.6)
+        self.assertTrue(stats.is_time_up())
+        self.assertEqual(stats.get_time_left_s(), 0.0)
+
+        stats.freeze()
+        self.assertEqual(stats.get_elapsed_s(), 0.5)
+        self.assertGreater(stats.get_overshoot_ms(), 50)
+        self.assertIn(';500000000;', str(stats))
+
+        no_timeout = Statistics('mmmity', 'test_text', Gamemode.NO_ERRORS, 0.0)
+        self.assertEqual(no_timeout.get_time_left_s(), float('inf'))
+        self.assertFalse(no_timeout.is_time_up())
+
+
+class TestKeyStatistics(unittest.TestCase):
+
+    def test_counters(self):
+        key_stats = KeyStatistics()
+        key_stats.add_hit('a', '', 100)
+        key_stats.add_hit('b', 'a', 100)
+        key_stats.add_error('b', 'a')
+
+        self.assertEqual(key_stats.hits, {'a': 1, 'b': 1, 'ab': 1})
+        self.assertEqual(key_stats.errors, {'b': 1, 'ab': 1})
+        self.assertEqual(key_stats.weakness('a'), 0.0)
+        self.assertAlmostEqual(key_stats.weakness('b'),
+                               KeyStatistics.ERROR_WEIGHT / 2)
+        self.assertEqual(key_stats.weakness('z'), 0.0)
+
+    def test_latency(self):
+        key_stats = KeyStatistics()
+        key_stats.add_hit('a', '', 100)
+        key_stats.add_hit('b', '', 300)
+        key_stats.add_hit('c', '', KeyStatistics.MAX_LATENCY_NS + 1)
+        # Too long pause is ignored
+
+        self.assertEqual(key_stats.weakness('a'), 0.0)
+        self.assertAlmostEqual(key_stats.weakness('b'), 0.5)
+        self.assertEqual(key_stats.weak_keys(10), [('b', 0.5)])
+
 
 class TestFileStatistics(unittest.TestCase):
     NANOSECONDS_IN_SECOND = 1000000000.0
@@ -139,10 +194,15 @@ class TestFileStatistics(unittest.TestCase):
         with open(self.badfile_name, 'w') as badfile:
             badfile.write(';;;;;;;;;;;;;;')
 
+        self.zerofile_name = random.randbytes(8).hex() + 'zerostats.csv'
+        with open(self.zerofile_name, 'w') as zerofile:
+            zerofile.write('mmmity;test_text;Gamemode.NO_ERRORS;5;26;0;0.0;0\n')
+
     def clean_up(self):
         os.remove(self.file1_name)
         os.remove(self.file2_name)
         os.remove(self.badfile_name)
+        os.remove(self.zerofile_name)
 
     def setUp(self):
         self.create_files()
@@ -243,3 +303,67 @@ class TestFileStatistics(unittest.TestCase):
 
         nonexistent_top1 = fs.text_best_stats('nonexistent', 1)
         self.assertEqual(len(nonexistent_top1), 0)
+
+    def test_derived_metrics(self):
+        entry = FileStatistics.Entry.from_row(
+            ['mmmity', 'test_text', 'Gamemode.FIX_ERRORS',
+             '10', '45', str(int(30 * self.NANOSECONDS_IN_SECOND)), '0.0', '5']
+        )
+        self.assertAlmostEqual(entry.wpm, 20.0)
+        self.assertAlmostEqual(entry.cpm, 90.0)
+        self.assertAlmostEqual(entry.accuracy, 0.9)
+        self.assertAlmostEqual(entry.seconds, 30.0)
+
+        fs = FileStatistics()
+        fs.add_file(self.file1_name)
+        for entry in fs.entries:
+            self.assertAlmostEqual(entry.wpm, 5 * 60 / entry.seconds)
+
+    def test_zero_time(self):
+        fs = FileStatistics()
+        with self.assertRaises(TypeError):
+            fs.add_file(self.zerofile_name)
+        self.assertEqual(len(fs.entries), 0)
+
+
+class TestRollingRate(unittest.TestCase):
+    NANOSECONDS_IN_SECOND = 1000000000
+
+    def test_rates(self):
+        second = self.NANOSECONDS_IN_SECOND
+        rolling = RollingRate(0)
+        self.assertEqual(rolling.rates(5, 0), (0.0, 0.0))
+        for i in range(20):
+            rolling.add(1, 5, i * second)
+        # One word of 5 characters every second
+
+        wpm, cpm = rolling.rates(5, 20 * second)
+        self.assertAlmostEqual(wpm, 60.0, delta=15.0)
+        self.assertAlmostEqual(cpm, 5 * wpm)
+        wpm, _ = rolling.rates(10, 20 * second)
+        self.assertAlmostEqual(wpm, 60.0, delta=10.0)
+
+        self.assertEqual(rolling.rates(10, 100 * second), (0.0, 0.0))
+        # Old buckets are not counted after they are out of window
+
+        history = rolling.history(19 * second)
+        self.assertEqual(len(history), RollingRate.N_BUCKETS)
+        self.assertEqual(history[-1], 120.0)
+        self.assertEqual(history[-2], 0.0)
+
+    def test_short_session(self):
+        second = self.NANOSECONDS_IN_SECOND
+        rolling = RollingRate(0)
+        rolling.add(1, 5, second // 10)
+        wpm, _ = rolling.rates(10, 2 * second)
+        self.assertAlmostEqual(wpm, 30.0)
+        # Window is limited by time since start
+        self.assertEqual(len(rolling.history(second)), 3)
+
+    def test_statistics(self):
+        stats = Statistics('mmmity', 'test_text', Gamemode.NO_ERRORS, 0.0)
+        stats.add_word('Lorem')
+        wpm, cpm = stats.get_live_rates(5)
+        self.assertGreater(wpm, 0.0)
+        self.assertAlmostEqual(cpm, 5 * wpm)
+        self.assertGreater(sum(stats.get_live_history()), 0.0)
@@ -0,0 +1,50 @@
+import unittest
+import threading
+from harmonikey_mmmity.tasks import Task, TaskCancelled
+
+
+class TestTask(unittest.TestCase):
+
+    def test_result_and_partial(self):
+        def work(task: Task, count: int) -> int:
+            for i in range(count):
+                task.put(i)
+                task.set_progress(i + 1, count)
+            return count
+
+        task = Task(work, 3).start()
+        self.assertTrue(task.wait(5))
+        self.assertTrue(task.done)
+        self.assertEqual(task.result(), 3)
+        self.assertEqual(task.progress, 1.0)
+        self.assertEqual(task.take(), [0, 1, 2])
+        self.assertEqual(task.take(), [])
+
+    def test_error(self):
+        def work(task: Task):
+            raise OSError('disk is full')
+
+        task = Task(work).start()
+        task.wait(5)
+        with self.assertRaises(OSError):
+            task.result()
+
+    def test_cancel(self):
+        started = threading.Event()
+        resume = threading.Event()
+
+        def work(task: Task):
+            started.set()
+            resume.wait(5)
+            task.check_cancelled()
+            return 'finished'
+
+        task = Task(work).start()
+        started.wait(5)
+        self.assertFalse(task.done)
+        task.cancel()
+        self.assertTrue(task.cancelled)
+        resume.set()
+        task.wait(5)
+        with self.assertRaises(TaskCancelled):
+            task.result()
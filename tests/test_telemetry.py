@@ -0,0 +1,106 @@
+import unittest
+from harmonikey_mmmity.telemetry import EventSink, QueueSink, FileWriter, \
+                                        SocketWriter, create_sink
+from harmonikey_mmmity.text_generator import TextgenType
+from harmonikey_mmmity.gamemodes import Gamemode
+from harmonikey_mmmity.state import Training
+from blessed.keyboard import Keystroke
+from unittest.mock import Mock
+import json
+import os
+import random
+import socket
+import threading
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        # Adding random bytes to filename
+        # so no collisions with existing files happen
+        self.filename = random.randbytes(8).hex() + 'events.ndjson'
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def read_events(self) -> list:
+        with open(self.filename, 'r') as events_file:
+            return [json.loads(line) for line in events_file]
+
+    def test_null_sink(self):
+        sink = create_sink('')
+        self.assertFalse(sink.enabled)
+        sink.emit('key', char='a')
+        sink.close()
+
+    def test_file_sink(self):
+        sink = create_sink(self.filename)
+        self.assertTrue(sink.enabled)
+        sink.emit('key', char='ы', latency_ns=10)
+        sink.emit('finish', wpm=60.0)
+        sink.close()
+
+        events = self.read_events()
+        self.assertEqual([event['event'] for event in events], ['key', 'finish'])
+        self.assertEqual(events[0]['char'], 'ы')
+        self.assertIn('time', events[1])
+
+    def test_drop_on_full(self):
+        writer = Mock()
+        sink = QueueSink(writer, capacity=3, flush_interval=60.0)
+        for i in range(5):
+            sink.emit('key', index=i)
+        self.assertEqual(sink.dropped, 2)
+        sink.close()
+        self.assertEqual(sink.written, 3)
+        writer.close.assert_called_once()
+
+    def test_writer_failure(self):
+        sink = QueueSink(SocketWriter(self.filename + '.sock'))
+        sink.emit('key')
+        sink.close()
+        # Nobody listens on socket, event is lost but nothing raises
+        self.assertEqual(sink.failed, 1)
+
+    def test_socket_sink(self):
+        path = self.filename + '.sock'
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+        received = []
+
+        def accept():
+            connection, _ = server.accept()
+            with connection:
+                while True:
+                    data = connection.recv(4096)
+                    if not data:
+                        break
+                    received.append(data)
+
+        thread = threading.Thread(target=accept)
+        thread.start()
+        sink = create_sink('unix:' + path)
+        sink.emit('word', word='Lorem')
+        sink.close()
+        thread.join()
+        server.close()
+        os.remove(path)
+
+        event = json.loads(b''.join(received))
+        self.assertEqual(event['word'], 'Lorem')
+
+    def test_training_events(self):
+        with open(self.filename, 'w') as text_file:
+            text_file.write('ab c d')
+        program = Mock()
+        program.event_sink = Mock()
+        training = Training(program, Gamemode.NO_ERRORS, self.filename,
+                            'user', TextgenType.FILE, 0.0)
+        training.handle_keys([Keystroke(c) for c in 'axb c'] +
+                             [Keystroke('\x1b', code=361, name='KEY_ESCAPE')])
+
+        events = [call.args[0] for call in program.event_sink.emit.call_args_list]
+        self.assertEqual(events, ['start', 'key', 'error', 'key', 'word',
+                                  'key', 'key', 'word', 'pause'])
@@ -0,0 +1,114 @@
+import unittest
+from unittest.mock import Mock
+from harmonikey_mmmity.terminal import VirtualTerminal, VirtualScreen, \
+                                       get_terminal, set_terminal
+from harmonikey_mmmity.state import Training, MainMenu
+from harmonikey_mmmity.gamemodes import Gamemode
+from harmonikey_mmmity.telemetry import EventSink
+from harmonikey_mmmity.text_generator import TextgenType
+from blessed.keyboard import Keystroke
+import random
+import os
+
+
+class TestVirtualScreen(unittest.TestCase):
+
+    def setUp(self):
+        self.term = VirtualTerminal(20, 5)
+        self.screen = self.term.screen
+
+    def test_move_and_colors(self):
+        self.term.write(self.term.home + self.term.clear)
+        self.term.write(self.term.move_xy(3, 2) + self.term.gold('ab') +
+                        self.term.mistyrose3_on_white('c') + 'd')
+        self.assertEqual(self.screen.lines()[2], '   abcd')
+        self.assertEqual(self.screen.find('abc'), (3, 2))
+        self.assertEqual(self.screen.style_at(3, 2), '38;5;220')
+        self.assertEqual(self.screen.style_at(5, 2), '38;5;181;47')
+        self.assertEqual(self.screen.style_at(6, 2), '')
+        self.assertEqual((self.screen.x, self.screen.y), (0, 3))
+        # write() ends with newline like print()
+
+    def test_clear(self):
+        self.term.write('first line')
+        self.term.write(self.term.move_xy(5, 0) + self.term.clear_eol + 'x')
+        self.assertEqual(self.screen.lines()[0], 'firstx')
+        self.term.write(self.term.clear)
+        self.assertEqual(self.screen.text(), '\n' * 4)
+
+    def test_wrap_and_scroll(self):
+        screen = VirtualScreen(4, 2)
+        screen.write('abcdef\nxyz\n')
+        self.assertEqual(screen.lines(), ['xyz', ''])
+        # 'abcd' and 'ef' were scrolled out
+
+    def test_wide_and_combining(self):
+        self.screen.write('日本é!')
+        self.assertEqual(self.screen.chars[0][:6],
+                         ['日', '', '本', '', 'é', '!'])
+
+    def test_ignored_sequences(self):
+        self.term.write(self.term.link('https://example.com', 'link') +
+                        self.term.hide_cursor + self.term.bold('b'))
+        self.assertEqual(self.screen.lines()[0], 'linkb')
+        self.assertEqual(self.screen.style_at(4, 0), '1')
+
+
+class TestVirtualRendering(unittest.TestCase):
+
+    def setUp(self):
+        self.term = VirtualTerminal(80, 12)
+        set_terminal(self.term)
+        self.program = Mock()
+        self.program.term = self.term
+        self.program.event_sink = EventSink()
+        self.filename = random.randbytes(8).hex() + '.txt'
+        with open(self.filename, 'w') as out_file:
+            out_file.write('alpha beta gamma')
+
+    def tearDown(self):
+        os.remove(self.filename)
+        set_terminal(None)
+
+    def test_shared_terminal(self):
+        self.assertIs(get_terminal(), self.term)
+
+    def test_training(self):
+        training = Training(self.program, Gamemode.FIX_ERRORS, self.filename,
+                            'user', TextgenType.FILE, 0.0)
+        training.handle_keys([Keystroke(c) for c in 'alpha b'])
+        training.visualize()
+
+        screen = self.term.screen
+        self.assertEqual(screen.lines()[2], '1 words')
+        x, y = screen.find('alpha beta gamma')
+        self.assertEqual(y, 6)
+        self.assertEqual(screen.style_at(x + len('alpha '), y), '38;5;220')
+        # Typed part of current word is gold
+        self.assertEqual(screen.style_at(x + len('alpha b'), y),
+                         '38;5;181;47')
+        # Next character is highlighted
+
+    def test_status_bar(self):
+        training = Training(self.program, Gamemode.FIX_ERRORS, self.filename,
+                            'user', TextgenType.FILE, 60.0)
+        training.statistics.freeze()
+        training.visualize()
+        screen = self.term.screen
+        self.assertTrue(screen.lines()[1].startswith(' 0.00 / 60.00 s'))
+        writes = screen.writes
+        training.visualize()
+        self.assertEqual(screen.writes, writes)
+        # Nothing changed, so nothing is written
+
+        training.statistics.frozen_timer += 10 ** 9
+        training.visualize()
+        self.assertEqual(screen.writes, writes + 1)
+        self.assertTrue(screen.lines()[1].startswith(' 1.00 / 60.00 s'))
+        # Only status bar is redrawn
+
+    def test_main_menu(self):
+        MainMenu(self.program).visualize()
+        lines = self.term.screen.lines()
+        self.assertEqual(lines[2].strip(), 'Harmonikey')
+        self.assertIn('Training', lines[-2])
@@ -1,8 +1,11 @@
 import unittest
-from harmonikey_mmmity.text_generator import RandomTextGenerator, FileTextGenerator
+from harmonikey_mmmity.text_generator import RandomTextGenerator, FileTextGenerator, \
+                                            AdaptiveTextGenerator, CodeTextGenerator
+from harmonikey_mmmity.statistics import KeyStatistics
 from harmonikey_mmmity.exceptions import EndOfFile
 import os
 import random
+from unittest.mock import patch
 
 
 class TestRandomTextGenerator(unittest.TestCase):
@@ -241,3 +244,144 @@ class TestFileTextGenerator(unittest.TestCase):
             self.assertEqual(len(gen.words_after(1000-7)), 59 - index_pos)
             self.assertEqual(len(gen.words_after(15)), min(15, 59 - index_pos))
             gen.next_word()
+
+    def test_position(self):
+        test_text = 'A b  стопицот\nd E; f'
+        self.create_text_file(test_text)
+        gen = FileTextGenerator(self.filename)
+
+        self.assertEqual(gen.position(), (0, 0))
+        for _ in range(3):
+            gen.next_word()
+        word_index, offset = gen.position()
+        self.assertEqual(word_index, 3)
+        self.assertEqual(offset, len('A b  стопицот\n'.encode('utf-8')))
+
+        resumed = FileTextGenerator(self.filename, offset, word_index)
+        self.clean_up()
+
+        self.assertEqual(resumed.text, ['d', 'E;', 'f'])
+        self.assertEqual(resumed.current_word(), 'd')
+        self.assertEqual(resumed.position(), (word_index, offset))
+        resumed.next_word()
+        self.assertEqual(resumed.position(), (4, offset + 2))
+        for _ in range(2):
+            resumed.next_word()
+        self.assertEqual(resumed.position(),
+                         (6, len(test_text.encode('utf-8'))))
+
+    def test_position_invalid_bytes(self):
+        self.filename = random.randbytes(8).hex() + 'text.txt'
+        with open(self.filename, 'wb') as text_file:
+            text_file.write('été\xff '.encode('latin-1') +
+                            'стопицот E'.encode('utf-8'))
+        gen = FileTextGenerator(self.filename)
+        self.assertEqual(gen.current_word(), '\ufffdt\ufffd\ufffd')
+
+        gen.next_word()
+        word_index, offset = gen.position()
+        self.assertEqual(offset, 5)
+        gen.next_word()
+        self.assertEqual(gen.position(),
+                         (2, 6 + len('стопицот'.encode('utf-8'))))
+
+        resumed = FileTextGenerator(self.filename, offset, word_index)
+        self.clean_up()
+        self.assertEqual(resumed.text, ['стопицот', 'E'])
+
+    @patch.object(FileTextGenerator, 'CHUNK_SIZE', 8)
+    def test_lazy_reading(self):
+        test_text = 'A стопицот  b\nCdEfGhIjKl m\u00a0n ' * 3
+        self.create_text_file(test_text)
+        gen = FileTextGenerator(self.filename)
+        self.assertLess(len(gen.text), len(test_text.split()))
+
+        encoded = test_text.encode('utf-8')
+        offset = 0
+        for word in test_text.split():
+            offset = encoded.index(word.encode('utf-8'), offset)
+            self.assertEqual(gen.position()[1], offset)
+            self.assertEqual(gen.next_word(), word)
+        self.clean_up()
+        self.assertEqual(gen.position(),
+                         (len(test_text.split()), len(encoded)))
+        with self.assertRaises(EndOfFile):
+            gen.next_word()
+
+
+class TestAdaptiveTextGenerator(unittest.TestCase):
+
+    def create_vocab_file(self, vocab: list) -> str:
+        # Adding random bytes to filename
+        # so no collisions with existing files happen
+        self.filename = random.randbytes(8).hex() + 'vocabulary.txt'
+        with open(self.filename, 'w') as vocab_file:
+            vocab_file.write('\n'.join(vocab))
+
+    def setUp(self):
+        self.create_vocab_file(['aaa', 'bbb', 'abc', 'qa', 'ccc'])
+        self.key_stats = KeyStatistics()
+        self.gen = AdaptiveTextGenerator(self.filename, 4, self.key_stats)
+        os.remove(self.filename)
+
+    def test_index(self):
+        self.assertEqual(list(self.gen.index['a']), [0, 0, 0, 2, 3])
+        self.assertEqual(list(self.gen.index['bc']), [2])
+        self.assertEqual(list(self.gen.index['qa']), [3])
+        self.assertNotIn('cq', self.gen.index)
+
+    def test_no_stats(self):
+        for _ in range(60):
+            self.assertIn(self.gen.next_word(), self.gen.vocab)
+
+    def test_weak_key(self):
+        for _ in range(5):
+            self.key_stats.add_error('q', '')
+            self.key_stats.add_hit('b', '', 0)
+
+        words = [self.gen.next_word() for _ in range(1000)]
+        self.assertGreater(words.count('qa'), 500)
+
+
+class TestCodeTextGenerator(unittest.TestCase):
+    def setUp(self):
+        self.filename = random.randbytes(8).hex() + 'code.py'
+        with open(self.filename, 'w') as code_file:
+            code_file.write('def f(x):  \n\treturn x+1\n\n# end\n')
+        self.gen = CodeTextGenerator(self.filename)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_tokens(self):
+        tokens = []
+        separators = []
+        with self.assertRaises(EndOfFile):
+            while True:
+                separator = self.gen.separator()
+                tokens.append(self.gen.next_word())
+                separators.append(separator)
+        self.assertEqual(tokens, ['def', 'f', '(', 'x', '):', 'return',
+                                  'x', '+', '1', '#', 'end'])
+        self.assertEqual(separators, ['', ' ', '', '', '', '\n\t',
+                                      ' ', '', '', '\n\n', ' '])
+        # Trailing whitespace is removed
+
+    def test_words_around(self):
+        for _ in range(3):
+            self.gen.next_word()
+        self.assertEqual(self.gen.words_before(2), ['f', '('])
+        self.assertEqual(self.gen.words_after(2), ['):', 'return'])
+        self.assertEqual(self.gen.words_before(10), ['def', 'f', '('])
+
+    def test_lines(self):
+        self.assertEqual(len(self.gen.line_starts), 4)
+        for _ in range(5):
+            self.gen.next_word()
+        end = self.gen.current_end()
+        self.assertEqual(self.gen.data[end - len('return'):end], 'return')
+        self.assertEqual(self.gen.line_of(end), 1)
+        start, line_end = self.gen.line_bounds(1)
+        self.assertEqual(self.gen.data[start:line_end], '\treturn x+1')
+        start, line_end = self.gen.line_bounds(3)
+        self.assertEqual(self.gen.data[start:line_end], '# end')
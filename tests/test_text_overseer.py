@@ -2,8 +2,10 @@ from unittest import TestCase
 from harmonikey_mmmity.text_generator import TextgenType
 from harmonikey_mmmity.gamemodes import Gamemode
 from harmonikey_mmmity.state import Training
+from harmonikey_mmmity.text_sources import FileSource, Separator
 from harmonikey_mmmity.exceptions import EndOfFile, WrongCharacter
 from blessed.keyboard import Keystroke
+from unittest.mock import patch
 import random
 import os
 
@@ -41,7 +43,8 @@ class TestTextOverseer(TestCase):
             overseer.handle_char(Keystroke(c))
 
         self.assertEqual(overseer.input, '')
-        self.assertEqual(overseer.current_word, ' ipsum')
+        self.assertEqual(overseer.current_word, 'ipsum')
+        self.assertEqual(overseer.separator, ' ')
         self.assertEqual(training.statistics.word_count, 1)
 
         for c in ' ipsu':
@@ -96,6 +99,22 @@ class TestTextOverseer(TestCase):
         overseer.handle_char(Keystroke(name='KEY_DELETE'))
         self.assertEqual(overseer.error, '')
 
+    def test_handle_chars(self):
+        training = Training(
+            program=None,
+            gamemode=Gamemode.FIX_ERRORS,
+            train_filename=self.filename,
+            user='mmmity',
+            textgen_type=TextgenType.FILE,
+            timeout=0.0
+        )
+        overseer = training.text_overseer
+        overseer.handle_chars([Keystroke(c) for c in 'LorxX'] +
+                              [Keystroke(name='KEY_BACKSPACE')] +
+                              [Keystroke(name='KEY_LEFT')])
+        self.assertEqual(overseer.input, 'Lor')
+        self.assertEqual(overseer.error, 'x')
+
     def test_die_errors(self):
         training = Training(
             program=None,
@@ -110,3 +129,178 @@ class TestTextOverseer(TestCase):
             overseer.handle_char(Keystroke(c))
         with self.assertRaises(WrongCharacter):
             overseer.handle_char(Keystroke('E'))
+
+    def test_key_stats(self):
+        training = Training(
+            program=None,
+            gamemode=Gamemode.FIX_ERRORS,
+            train_filename=self.filename,
+            user='mmmity',
+            textgen_type=TextgenType.FILE,
+            timeout=0.0
+        )
+        overseer = training.text_overseer
+        for c in 'Lo':
+            overseer.handle_char(Keystroke(c))
+        overseer.handle_char(Keystroke('E'))
+        overseer.handle_char(Keystroke('x'))
+        # Second wrong character goes to error buffer and is not counted
+
+        self.assertEqual(overseer.key_stats.hits['o'], 1)
+        self.assertEqual(overseer.key_stats.hits['Lo'], 1)
+        self.assertEqual(overseer.key_stats.errors, {'r': 1, 'or': 1})
+
+    def test_graphemes(self):
+        self.clean_up()
+        self.create_text_file('café 日本 👍🏽')
+        training = Training(
+            program=None,
+            gamemode=Gamemode.FIX_ERRORS,
+            train_filename=self.filename,
+            user='mmmity',
+            textgen_type=TextgenType.FILE,
+            timeout=0.0
+        )
+        overseer = training.text_overseer
+        self.assertEqual(len(overseer.word.clusters), 4)
+
+        for c in 'cafe':
+            overseer.handle_char(Keystroke(c))
+        self.assertEqual(overseer.pending, 'e')
+        # 'e' is only a beginning of 'e' with acute accent
+        overseer.handle_char(Keystroke('́'))
+        self.assertEqual(overseer.current_word, '日本')
+        self.assertEqual(training.statistics.character_count, 4)
+
+        overseer.handle_char(Keystroke(' '))
+        overseer.handle_char(Keystroke('x'))
+        overseer.handle_char(Keystroke('́'))
+        self.assertEqual(overseer.error, 'x́')
+        overseer.handle_char(Keystroke(name='KEY_BACKSPACE'))
+        # Letter with combining mark is erased at once
+        self.assertEqual(overseer.error, '')
+        self.assertEqual(overseer.word.width, 4)
+
+        overseer.handle_char(Keystroke('日'))
+        overseer.handle_char(Keystroke('本'))
+        overseer.handle_char(Keystroke(' '))
+        self.assertEqual(overseer.current_word, '👍🏽')
+
+        overseer.handle_char(Keystroke('👍'))
+        with self.assertRaises(EndOfFile):
+            overseer.handle_char(Keystroke('🏽'))
+
+    def test_wrong_pending(self):
+        self.clean_up()
+        self.create_text_file('café')
+        training = Training(
+            program=None,
+            gamemode=Gamemode.FIX_ERRORS,
+            train_filename=self.filename,
+            user='mmmity',
+            textgen_type=TextgenType.FILE,
+            timeout=0.0
+        )
+        overseer = training.text_overseer
+
+        for c in 'cafe':
+            overseer.handle_char(Keystroke(c))
+        overseer.handle_char(Keystroke('x'))
+        self.assertEqual(overseer.pending, '')
+        self.assertEqual(overseer.error, 'ex')
+        # Typed beginning of cluster is not lost from error
+        overseer.handle_char(Keystroke(name='KEY_BACKSPACE'))
+        overseer.handle_char(Keystroke(name='KEY_BACKSPACE'))
+        self.assertEqual(overseer.error, '')
+        self.assertEqual(overseer.input, 'caf')
+
+    def test_code(self):
+        with open(self.filename, 'w') as code_file:
+            code_file.write('if a:\n    b()\n')
+        training = Training(
+            program=None,
+            gamemode=Gamemode.FIX_ERRORS,
+            train_filename=self.filename,
+            user='mmmity',
+            textgen_type=TextgenType.CODE,
+            timeout=0.0
+        )
+        overseer = training.text_overseer
+
+        overseer.handle_chars([Keystroke(c) for c in 'if a:'])
+        self.assertEqual(overseer.current_word, 'b')
+        self.assertEqual(overseer.separator, '\n    ')
+        overseer.handle_char(Keystroke('\r', code=343, name='KEY_ENTER'))
+        self.assertEqual(overseer.separator_typed, 5)
+        # Indentation is typed automatically
+
+        overseer.handle_char(Keystroke('c'))
+        self.assertEqual(overseer.error, 'c')
+        overseer.handle_char(Keystroke('\x08', name='KEY_BACKSPACE'))
+        overseer.handle_char(Keystroke('b'))
+        self.assertEqual(overseer.current_word, '()')
+        with self.assertRaises(EndOfFile):
+            overseer.handle_chars([Keystroke('('), Keystroke(')')])
+
+    def test_separator(self):
+        training = Training(
+            program=None,
+            gamemode=Gamemode.FIX_ERRORS,
+            train_filename=self.filename,
+            user='mmmity',
+            textgen_type=TextgenType.FILE,
+            timeout=0.0
+        )
+        overseer = training.text_overseer
+        overseer.handle_chars([Keystroke(c) for c in 'Lorem'])
+
+        overseer.handle_char(Keystroke('i'))
+        self.assertEqual(overseer.error, 'i')
+        self.assertEqual(training.key_stats.errors[' '], 1)
+        # Space is expected before the next word
+        overseer.handle_char(Keystroke(name='KEY_BACKSPACE'))
+        overseer.handle_chars([Keystroke(c) for c in ' ip'])
+        self.assertEqual(overseer.separator_typed, 1)
+        self.assertEqual(overseer.input, 'ip')
+        self.assertEqual(training.statistics.character_count, 5)
+        with self.assertRaises(EndOfFile):
+            overseer.handle_chars([Keystroke(c) for c in 'sum'])
+        self.assertEqual(training.statistics.character_count, 11)
+        # Space is counted with the word after it
+
+    def test_enter_separator(self):
+        with patch.object(FileSource, 'separator', Separator.NEWLINE):
+            training = Training(
+                program=None,
+                gamemode=Gamemode.NO_ERRORS,
+                train_filename=self.filename,
+                user='mmmity',
+                textgen_type=TextgenType.FILE,
+                timeout=0.0
+            )
+        overseer = training.text_overseer
+        overseer.handle_chars([Keystroke(c) for c in 'Lorem'] +
+                              [Keystroke('\r', code=343, name='KEY_ENTER')] +
+                              [Keystroke(c) for c in 'ipsu'])
+        # Terminal reports Enter as sequence, not as newline
+        self.assertEqual(overseer.error, '')
+        with self.assertRaises(EndOfFile):
+            overseer.handle_char(Keystroke('m'))
+
+    def test_configured_separator(self):
+        for separator, typed in [(Separator.NONE, 'Loremipsum'),
+                                 (Separator.NEWLINE, 'Lorem\nipsum')]:
+            with patch.object(FileSource, 'separator', separator):
+                training = Training(
+                    program=None,
+                    gamemode=Gamemode.NO_ERRORS,
+                    train_filename=self.filename,
+                    user='mmmity',
+                    textgen_type=TextgenType.FILE,
+                    timeout=0.0
+                )
+            overseer = training.text_overseer
+            overseer.handle_chars([Keystroke(c) for c in typed[:-1]])
+            self.assertEqual(overseer.separator, separator.value)
+            with self.assertRaises(EndOfFile):
+                overseer.handle_char(Keystroke(typed[-1]))
@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch
+from importlib.metadata import EntryPoint
+from harmonikey_mmmity.text_sources import TextSourceRegistry, TextSource, \
+                                           SourceCost, FileSource
+from harmonikey_mmmity.text_generator import TextgenType, FileTextGenerator
+from harmonikey_mmmity.exceptions import TextSourceError
+
+
+class ReversedSource(TextSource):
+    '''
+    Plugin for tests, only registered under a different name.
+    '''
+    directory = 'assets/texts'
+
+    def create(self, filename, key_stats, resume=None):
+        return FileTextGenerator(filename)
+
+
+class TestTextSourceRegistry(unittest.TestCase):
+
+    def entry_point(self, name: str, value: str) -> EntryPoint:
+        return EntryPoint(name=name, value=value,
+                          group=TextSourceRegistry.ENTRY_POINT_GROUP)
+
+    def setUp(self):
+        self.registry = TextSourceRegistry(discover=False)
+
+    def test_builtin(self):
+        self.assertEqual(self.registry.names(),
+                         [textgen_type.name for textgen_type in TextgenType])
+        self.assertIsInstance(self.registry.get(TextgenType.FILE), FileSource)
+        self.assertEqual(self.registry.get('FILE').cost,
+                         SourceCost.PREFETCHABLE)
+        self.assertEqual(self.registry.get('RANDOM').cost, SourceCost.BLOCKING)
+        with self.assertRaises(TextSourceError):
+            self.registry.get('UNKNOWN')
+
+    def test_plugin(self):
+        self.registry.add_entry_point(self.entry_point(
+            'REVERSED', 'tests.test_text_sources:ReversedSource'
+        ))
+        self.registry.add_entry_point(self.entry_point(
+            'BROKEN', 'nonexistent_harmonikey_plugin:Source'
+        ))
+        self.registry.add_entry_point(self.entry_point(
+            'FILE', 'nonexistent_harmonikey_plugin:Source'
+        ))
+        # Built-in sources are not replaced
+
+        self.assertEqual(self.registry.names()[4:], ['BROKEN', 'REVERSED'])
+        # Plugins are listed without being loaded
+
+        source = self.registry.get('REVERSED')
+        self.assertIsInstance(source, ReversedSource)
+        self.assertEqual(source.name, 'REVERSED')
+        self.assertIs(self.registry.get('REVERSED'), source)
+        self.assertEqual(source.text_tag('a.txt'), 'REVERSED.a.txt')
+        self.assertIsInstance(self.registry.get('FILE'), FileSource)
+
+        with self.assertRaises(TextSourceError):
+            self.registry.get('BROKEN')
+
+    def test_broken_plugin_loaded_once(self):
+        entry_point = self.entry_point(
+            'BROKEN', 'nonexistent_harmonikey_plugin:Source'
+        )
+        self.registry.add_entry_point(entry_point)
+        with patch.object(EntryPoint, 'load',
+                          side_effect=ImportError('no module')) as load:
+            for _ in range(3):
+                with self.assertRaisesRegex(TextSourceError, 'no module'):
+                    self.registry.get('BROKEN')
+        load.assert_called_once()
+
+    def test_parse_text_tag(self):
+        self.assertEqual(self.registry.parse_text_tag('RANDOM.assets/vocabs/a'),
+                         ('RANDOM', 'assets/vocabs/a'))
+        self.assertEqual(self.registry.parse_text_tag('assets/texts/a'),
+                         ('FILE', 'assets/texts/a'))
+        self.registry.add_entry_point(self.entry_point(
+            'BROKEN', 'nonexistent_harmonikey_plugin:Source'
+        ))
+        self.assertEqual(self.registry.parse_text_tag('BROKEN.a'),
+                         ('BROKEN', 'a'))
@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import patch
+from harmonikey_mmmity.vocab import VocabFilter, Vocabulary, word_difficulty
+from harmonikey_mmmity.text_generator import RandomTextGenerator
+from harmonikey_mmmity.exceptions import EmptyVocabulary
+import os
+import random
+import shutil
+
+
+class TestVocabFilter(unittest.TestCase):
+
+    def test_parse(self):
+        vocab_filter = VocabFilter.parse('len=5-8 chars=home diff=0.1')
+        self.assertEqual(vocab_filter.min_length, 5)
+        self.assertEqual(vocab_filter.max_length, 8)
+        self.assertEqual(vocab_filter.charset, 'asdfghjkl')
+        self.assertEqual(vocab_filter.min_difficulty, 0.1)
+        self.assertEqual(vocab_filter.max_difficulty, 1.0)
+        self.assertTrue(VocabFilter.parse('').is_empty())
+        for text in ('len', 'len=a', 'size=5'):
+            with self.assertRaises(ValueError):
+                VocabFilter.parse(text)
+
+    def test_signature(self):
+        self.assertEqual(VocabFilter(charset='fdsa').signature(),
+                         VocabFilter(charset='asdf').signature())
+        self.assertNotEqual(VocabFilter(min_length=1).signature(),
+                            VocabFilter().signature())
+
+    def test_word_difficulty(self):
+        self.assertEqual(word_difficulty('cat'), 0.0)
+        self.assertLess(word_difficulty('letters'), word_difficulty("it's"))
+
+
+class TestVocabulary(unittest.TestCase):
+    WORDS = ['a', 'sad', 'flask', 'glass', 'keyboard', 'Dad', 'jazz']
+
+    def setUp(self):
+        # Adding random bytes to names
+        # so no collisions with existing files happen
+        prefix = random.randbytes(8).hex()
+        self.filename = prefix + 'vocab.txt'
+        self.cache = prefix + 'cache'
+        with open(self.filename, 'w') as vocab_file:
+            vocab_file.write(' '.join(self.WORDS))
+
+    def tearDown(self):
+        os.remove(self.filename)
+        shutil.rmtree(self.cache, ignore_errors=True)
+
+    def test_filters(self):
+        vocabulary = Vocabulary(self.filename, self.cache)
+        self.assertEqual(vocabulary.filtered(VocabFilter(3, 5)),
+                         ['sad', 'flask', 'glass', 'Dad', 'jazz'])
+        self.assertEqual(vocabulary.filtered(VocabFilter(charset='asdfghjkl')),
+                         ['a', 'sad', 'flask', 'glass'])
+        self.assertEqual(vocabulary.filtered(VocabFilter(max_difficulty=0.0)),
+                         ['a', 'sad'])
+        self.assertIs(vocabulary.filtered(VocabFilter()), vocabulary.words)
+
+    def test_cache(self):
+        vocab_filter = VocabFilter(min_length=5)
+        vocabulary = Vocabulary(self.filename, self.cache)
+        view = vocabulary.view(vocab_filter)
+        self.assertIs(vocabulary.view(vocab_filter), view)
+        # Is memoized
+        self.assertEqual(len(os.listdir(self.cache)), 1)
+
+        cached = Vocabulary(self.filename, self.cache)
+        path = os.path.join(self.cache, os.listdir(self.cache)[0])
+        with open(path, 'rb') as view_file:
+            self.assertEqual(view_file.read(), view.tobytes())
+        self.assertEqual(cached.view(vocab_filter), view)
+        # Is loaded from disk by another instance
+
+        with open(self.filename, 'a') as vocab_file:
+            vocab_file.write(' qwerty')
+        changed = Vocabulary(self.filename, self.cache)
+        self.assertEqual(changed.filtered(vocab_filter),
+                         ['flask', 'glass', 'keyboard', 'qwerty'])
+        self.assertEqual(len(os.listdir(self.cache)), 2)
+        # Changed file gets its own view
+
+    def test_generator(self):
+        patcher = patch.object(Vocabulary, 'CACHE_DIRECTORY', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        generator = RandomTextGenerator(self.filename, 4,
+                                        vocab_filter=VocabFilter(min_length=5))
+        for _ in range(10):
+            self.assertGreaterEqual(len(generator.next_word()), 5)
+        with self.assertRaises(EmptyVocabulary):
+            RandomTextGenerator(self.filename, 4,
+                                vocab_filter=VocabFilter(min_length=50))
@@ -1,7 +1,9 @@
 import unittest
 from blessed import Terminal
 from blessed.keyboard import Keystroke
-from harmonikey_mmmity.widgets import Button, TextInput, NumberInput, Switch
+from harmonikey_mmmity.widgets import Button, TextInput, NumberInput, Switch, \
+                                      ScrollList
+from unittest.mock import Mock
 from enum import Enum
 
 
@@ -124,3 +126,55 @@ class TestSwitch(unittest.TestCase):
         self.assertEqual(self.switch.get_current_option(), self.enum.opt2)
         self.switch.handle_key(Keystroke('z'))
         self.assertEqual(self.switch.get_current_option(), self.enum.opt1)
+
+
+    def test_list_options(self):
+        switch = Switch(['RANDOM', 'FILE'], 'type:')
+        self.assertEqual(switch.visualize_str(False), 'type:RANDOM')
+        switch.handle_key(Keystroke('x'))
+        self.assertEqual(switch.get_current_option(), 'FILE')
+
+    def test_select(self):
+        self.assertTrue(self.switch.select(self.enum.opt3))
+        self.assertEqual(self.switch.get_current_option(), self.enum.opt3)
+        self.assertFalse(self.switch.select('opt2'))
+        self.assertEqual(self.switch.get_current_option(), self.enum.opt3)
+
+
+class TestScrollList(unittest.TestCase):
+
+    def setUp(self):
+        self.format_item = Mock(side_effect=str)
+        self.scroll_list = ScrollList(self.format_item, 3)
+        self.scroll_list.set_items(list(range(10)))
+
+    def test_visualize(self):
+        self.assertEqual(self.scroll_list.visualize_str(False), '0\n1\n2')
+        self.assertEqual(self.scroll_list.position_str(), 'rows 1-3 of 10')
+        self.assertEqual(self.format_item.call_count, 3)
+
+        self.scroll_list.visualize_str(False)
+        self.assertEqual(self.format_item.call_count, 3)
+        # Rows are formatted only once
+
+    def test_handle_key(self):
+        self.scroll_list.handle_key(Keystroke(name='KEY_PGDOWN'))
+        self.assertEqual(self.scroll_list.visible_rows(), ['3', '4', '5'])
+        self.scroll_list.handle_key(Keystroke(name='KEY_END'))
+        self.assertEqual(self.scroll_list.visible_rows(), ['7', '8', '9'])
+        self.scroll_list.handle_key(Keystroke(name='KEY_PGDOWN'))
+        self.assertEqual(self.scroll_list.visible_rows(), ['7', '8', '9'])
+        self.scroll_list.handle_key(Keystroke(name='KEY_PGUP'))
+        self.assertEqual(self.scroll_list.visible_rows(), ['4', '5', '6'])
+        self.scroll_list.handle_key(Keystroke(name='KEY_HOME'))
+        self.assertEqual(self.scroll_list.offset, 0)
+        self.scroll_list.handle_key(Keystroke(name='KEY_PGUP'))
+        self.assertEqual(self.scroll_list.offset, 0)
+
+    def test_set_items(self):
+        self.scroll_list.handle_key(Keystroke(name='KEY_END'))
+        self.scroll_list.set_items(['a'])
+        self.assertEqual(self.scroll_list.offset, 0)
+        self.assertEqual(self.scroll_list.visible_rows(), ['a'])
+        self.scroll_list.set_items([])
+        self.assertEqual(self.scroll_list.position_str(), 'no rows')